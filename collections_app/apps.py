@@ -5,3 +5,6 @@ class CollectionsAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'collections_app'
     verbose_name = 'Коллекции'
+
+    def ready(self):
+        from . import signals  # noqa: F401 — подключаем обработчики сигналов
@@ -0,0 +1,19 @@
+"""Счётчик добавлений рецепта в коллекции (Recipe.collection_count)."""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from recipes.models import Recipe
+from .models import CollectionItem
+
+
+@receiver(post_save, sender=CollectionItem)
+def collection_item_saved(sender, instance, created=False, **kwargs):
+    # toggle_recipe_in_collection и API коллекций создают элементы через get_or_create
+    if created:
+        Recipe.apply_counter_delta(instance.recipe_id, "collection_count", 1)
+
+
+@receiver(post_delete, sender=CollectionItem)
+def collection_item_deleted(sender, instance, **kwargs):
+    # Приходит и при каскадном удалении коллекции, её владельца или рецепта
+    Recipe.apply_counter_delta(instance.recipe_id, "collection_count", -1)
@@ -1,7 +1,7 @@
 from django.urls import path
 from . import views
 from .views import collection_list, collection_create, collection_detail, toggle_recipe_in_collection, collection_edit, \
-    collection_delete, api_user_collections, api_add_recipe_to_collection, api_remove_recipe_from_collection
+    collection_delete, collection_shopping_list, api_user_collections, api_add_recipe_to_collection, api_remove_recipe_from_collection
 
 urlpatterns = [
     # коллекции
@@ -11,6 +11,7 @@ urlpatterns = [
     path("<int:collection_id>/toggle/<int:recipe_id>/", toggle_recipe_in_collection, name="toggle_recipe_in_collection"),
     path("<int:pk>/edit/", collection_edit, name="collection_edit"),
     path("<int:pk>/delete/", collection_delete, name="collection_delete"),
+    path("<int:pk>/shopping-list/", collection_shopping_list, name="collection_shopping_list"),
     
     # API endpoints
     path("api/user-collections/", api_user_collections, name="api_user_collections"),
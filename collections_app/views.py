@@ -3,7 +3,9 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.http import JsonResponse, HttpResponseForbidden
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
+from django.db.models import Prefetch
 import json
+from recipes import shopping
 from recipes.models import Recipe, Category
 from .models import Collection, CollectionItem
 from .forms import CollectionForm
@@ -76,15 +78,46 @@ def collection_delete(request, pk):
     })
 
 
+def _is_visible(collection, user):
+    """Публичную коллекцию видят все, приватную — только владелец."""
+    return collection.is_public or collection.owner_id == user.pk
+
+
 @login_required
 def collection_detail(request, pk):
     collection = get_object_or_404(Collection, pk=pk)
 
     # доступ:
-    if collection.owner != request.user and not collection.is_public:
+    if not _is_visible(collection, request.user):
         return HttpResponseForbidden("Эта коллекция приватная")
 
-    return render(request, "collections/collection_detail.html", {"collection": collection})
+    # Рецепты коллекции — одним запросом с полями карточки (см. RecipeQuerySet.for_cards)
+    items = collection.items.prefetch_related(Prefetch("recipe", queryset=Recipe.objects.for_cards()))
+
+    return render(request, "collections/collection_detail.html", {
+        "collection": collection,
+        "items": items,
+    })
+
+
+@require_http_methods(["GET"])
+def collection_shopping_list(request, pk):
+    """Список покупок по всем рецептам коллекции (JSON).
+
+    Вход не нужен: список публичной коллекции доступен и гостям.
+    """
+    collection = get_object_or_404(Collection, pk=pk)
+    if not _is_visible(collection, request.user):
+        return HttpResponseForbidden("Эта коллекция приватная")
+
+    # Один GROUP BY по ингредиентам рецептов коллекции (см. recipes.shopping)
+    items = shopping.for_collection(collection)
+    return JsonResponse({
+        'success': True,
+        'collection': {'id': collection.id, 'title': collection.title},
+        'items': [dict(item, amount=float(item['amount'])) for item in items],
+        'count': len(items),
+    })
 
 
 @login_required
@@ -75,6 +75,30 @@ DATABASES = {
     }
 }
 
+# ── Кеш ────────────────────────────────────────────
+# Поколения данных (recipes.cache) и поисковые кеши. LocMemCache живёт внутри
+# одного процесса; при нескольких воркерах нужен общий бэкенд
+# (см. settings_pythonanywhere.py)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# ── Поиск ──────────────────────────────────────────
+# "index" — инвертированный индекс search.SearchIndex,
+# "fts5" — полнотекстовая таблица SQLite FTS5 с ранжированием bm25
+SEARCH_BACKEND = os.environ.get('COOKBOOK_SEARCH_BACKEND', 'index')
+
+# Сортировка «по релевантности»: насколько подмешивать рейтинг рецепта
+# (0 — только BM25; 1 — рецепт с рейтингом 5 получает вдвое больший вес)
+SEARCH_RATING_BOOST = float(os.environ.get('COOKBOOK_SEARCH_RATING_BOOST', '0'))
+
+# Как часто (в секундах) индексы в памяти процесса (подсказки ингредиентов,
+# «Что приготовить», похожие рецепты, опечатки) сверяют поколение с базой:
+# столько же изменения из других процессов идут до этого процесса
+SEARCH_INDEX_CHECK_INTERVAL = float(os.environ.get('COOKBOOK_SEARCH_INDEX_CHECK_INTERVAL', '2'))
+
 # ── Валидаторы паролей ─────────────────────────────
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
@@ -100,6 +124,9 @@ STATIC_ROOT = BASE_DIR / "staticfiles"  # Для collectstatic
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# Сколько потоков строят миниатюры и WebP-копии загруженных изображений (recipes.derivatives)
+IMAGE_DERIVATIVE_WORKERS = int(os.environ.get('COOKBOOK_IMAGE_DERIVATIVE_WORKERS', '2'))
+
 # ── Настройки по умолчанию ─────────────────────────
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
@@ -25,6 +25,16 @@ DATABASES = {
     }
 }
 
+# Общий для всех воркеров кеш страниц, фрагментов и результатов поиска.
+# Поколения данных (recipes.cache) хранятся не здесь, а в базе: incr
+# файлового кеша неатомарен между процессами, а ключ может быть вытеснен
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': '/home/Viktor811/CookBook/cache',
+    }
+}
+
 # Настройки безопасности для PythonAnywhere
 SECURE_SSL_REDIRECT = False  # PythonAnywhere использует HTTPS на своем уровне
 SESSION_COOKIE_SECURE = False
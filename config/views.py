@@ -4,7 +4,7 @@ from recipes.models import Recipe, Category
 
 def home(request):
     # Получаем последние 5 рецептов
-    recipes = Recipe.objects.all()[:5]
+    recipes = Recipe.objects.for_cards()[:5]
     
     # Получаем все категории для поиска
     categories = Category.objects.all()
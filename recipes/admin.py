@@ -57,9 +57,8 @@ class RecipeImageInline(admin.TabularInline):
 class RecipeAdmin(admin.ModelAdmin):
     # на случай, если метод на модели ещё не подхватился — дублируем рендер миниатюры
     def image_tag(self, obj):
-        if obj.images.exists():
-            first_image = obj.images.first()
-            return format_html('<img src="{}" style="max-height:60px;"/>', first_image.image.url)
+        if obj.cover_url:
+            return format_html('<img src="{}" style="max-height:60px;"/>', obj.cover_url)
         return "—"
     image_tag.short_description = "Фото"
 
@@ -76,7 +75,9 @@ class RecipeAdmin(admin.ModelAdmin):
     list_filter = ("category", "difficulty")
     search_fields = ("title", "description")
     autocomplete_fields = ["author", "category"]
-    readonly_fields = ("rating", "image_tag")
+    readonly_fields = (
+        "rating", "rating_sum", "rating_count", "comment_count", "collection_count", "image_count", "image_tag",
+    )
     inlines = [RecipeIngredientInline, CommentInline, RatingInline, RecipeImageInline]
 
 
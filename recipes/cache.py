@@ -0,0 +1,67 @@
+"""Поколения (generation counters) данных.
+
+Поколение — число, которое увеличивается при каждом изменении данных.
+Кеши и структуры в памяти запоминают поколение, на котором построены,
+и считаются устаревшими, как только оно сменилось: никаких полных сбросов.
+
+Поколения хранятся в базе (модель Generation), а не в кеше: ``incr``
+файлового кеша — неатомарное чтение-запись между процессами, а вытеснение
+ключа сбрасывает счётчик. В базе поколение увеличивается одним
+``UPDATE … SET value = value + 1``; чтение — запрос по первичному ключу.
+Смена поколения внутри транзакции откатывается вместе с ней, и то же
+значение может быть выдано снова. Повторившееся поколение заставило бы
+индексы в памяти применять изменения к устаревшей копии или вовсе не
+перестраиваться, поэтому они меняют поколение только после фиксации
+(см. search.local_index). Строка создаётся только при первой смене
+поколения: пока её нет, поколение равно ``DEFAULT_GENERATION``, так что
+чтение ничего не пишет и не плодит строки для данных, которые не менялись.
+"""
+import time
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import Generation
+
+# Поколение данных рецептов: сами рецепты, их ингредиенты, изображения,
+# категории и оценки (на нём построены кеши поиска)
+RECIPES = "recipes"
+
+# Поколение данных, которые ещё ни разу не менялись (строки в Generation нет)
+DEFAULT_GENERATION = 0
+
+
+def _initial():
+    # Стартуем с текущего времени в микросекундах, а не с DEFAULT_GENERATION + 1:
+    # поколение, созданное заново (новая база, удалённая строка, откат транзакции
+    # в тестах), не совпадёт ни с одним из уже выданных
+    return time.time_ns() // 1000
+
+
+def _create(name):
+    try:
+        with transaction.atomic():
+            Generation.objects.create(name=name, value=_initial())
+    except IntegrityError:
+        pass  # строку успел создать другой процесс
+
+
+def get_generation(name):
+    """Текущее поколение данных ``name``."""
+    generation = Generation.objects.filter(name=name).values_list("value", flat=True).first()
+    return DEFAULT_GENERATION if generation is None else generation
+
+
+def forget_generation(name):
+    """Удалить поколение данных, которых больше нет (например, удалённого рецепта)."""
+    Generation.objects.filter(name=name).delete()
+
+
+def bump_generation(name):
+    """Сменить поколение данных ``name`` и вернуть новое значение."""
+    with transaction.atomic():
+        if not Generation.objects.filter(name=name).update(value=F("value") + 1):
+            _create(name)
+            Generation.objects.filter(name=name).update(value=F("value") + 1)
+        # Строка заблокирована нашим UPDATE до конца транзакции — читаем своё значение
+        return Generation.objects.filter(name=name).values_list("value", flat=True).get()
@@ -0,0 +1,54 @@
+"""Сверка счётчиков комментариев и коллекций рецепта с исходными таблицами.
+
+Счётчики сдвигаются сигналами при каждом создании и удалении комментария
+или элемента коллекции (см. Recipe.apply_counter_delta). Изменения мимо
+моделей — ``QuerySet.update()``, ``bulk_create``, правки базы вручную —
+оставляют их расходящимися; здесь их находят и чинят так же, как агрегаты
+рейтинга (см. recipes.ratings).
+"""
+from django.db.models import Count
+
+from collections_app.models import CollectionItem
+from .models import Comment, Recipe
+from .ratings import repair
+
+# Счётчик рецепта → модель, строки которой он считает
+COUNTERS = {
+    "comment_count": Comment,
+    "collection_count": CollectionItem,
+}
+FIELDS = list(COUNTERS)
+
+
+def counter_totals():
+    """По одному сгруппированному запросу на счётчик: поле → {recipe_id: число}."""
+    return {
+        field: dict(
+            model.objects.order_by().values("recipe_id").annotate(count=Count("id"))
+            .values_list("recipe_id", "count")
+        )
+        for field, model in COUNTERS.items()
+    }
+
+
+def find_drift():
+    """Рецепты, у которых счётчики не совпадают с таблицами.
+
+    Возвращает пару (проверено рецептов, список несохранённых рецептов
+    с исправленными полями ``comment_count`` и ``collection_count``).
+    """
+    totals = counter_totals()
+    drifted = []
+    checked = 0
+    rows = Recipe.objects.order_by().values_list("pk", *FIELDS).iterator(chunk_size=5000)
+    for pk, *stored in rows:
+        checked += 1
+        expected = [totals[field].get(pk, 0) for field in FIELDS]
+        if stored != expected:
+            drifted.append(Recipe(pk=pk, **dict(zip(FIELDS, expected))))
+    return checked, drifted
+
+
+def repair_counters(recipes, chunk_size=1000, progress=None):
+    """Сохранить исправленные счётчики (см. recipes.ratings.repair)."""
+    repair(recipes, chunk_size=chunk_size, progress=progress, fields=FIELDS)
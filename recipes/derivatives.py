@@ -0,0 +1,138 @@
+"""Уменьшенные копии загруженных изображений (миниатюры и WebP).
+
+Карточки и галереи показывают изображения рецептов и аватары в несколько
+сотен пикселей, а в хранилище лежат оригиналы на несколько мегабайт. Для
+каждого оригинала строятся копии фиксированной ширины из набора
+(``PRESETS``) в двух форматах — JPEG для старых браузеров и WebP — и
+сохраняются под детерминированными именами (``derivative_name``), так что
+шаблон находит их без обращения к базе (тег ``{% responsive_image %}``,
+см. recipes.templatetags.recipe_images).
+
+Кодирование идёт в ограниченном пуле потоков (``IMAGE_DERIVATIVE_WORKERS``)
+после фиксации транзакции: сохранение формы с десятком фотографий не
+ждёт Pillow. Pillow отпускает GIL при масштабировании и кодировании,
+поэтому потоков достаточно. Пока копии не готовы, страница показывает
+оригинал. Для уже загруженных изображений — manage.py rebuild_image_derivatives.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait as wait_futures
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# Ширины копий в пикселях: для фотографий рецептов и для аватаров
+PRESETS = {
+    "recipe": (320, 640, 1024),
+    "avatar": (64, 128, 256),
+}
+
+# Формат → (расширение, параметры Image.save)
+FORMATS = {
+    "JPEG": ("jpg", {"quality": 82, "optimize": True, "progressive": True}),
+    "WEBP": ("webp", {"quality": 80, "method": 4}),
+}
+
+DERIVATIVES_DIR = "derivatives"
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending = set()
+
+
+def derivative_name(name, width, image_format):
+    """Имя копии: recipe_images/pie.jpg → derivatives/recipe_images/pie.jpg-320w.webp.
+
+    Расширение оригинала остаётся в имени: иначе pie.jpg и pie.png
+    делили бы одни и те же копии.
+    """
+    extension, _ = FORMATS[image_format]
+    return f"{DERIVATIVES_DIR}/{name}-{width}w.{extension}"
+
+
+def derivative_names(name, preset):
+    return [
+        derivative_name(name, width, image_format)
+        for width in PRESETS[preset]
+        for image_format in FORMATS
+    ]
+
+
+def is_ready(name, preset):
+    """Готовы ли копии: последней пишется самая широкая WebP — достаточно проверить её."""
+    return default_storage.exists(derivative_name(name, PRESETS[preset][-1], "WEBP"))
+
+
+def generate(name, preset):
+    """Построить копии изображения ``name`` (синхронно). Возвращает число записанных файлов."""
+    if not name or is_ready(name, preset):
+        return 0
+    with default_storage.open(name, "rb") as file:
+        original = ImageOps.exif_transpose(Image.open(file))
+        original.load()
+    if original.mode not in ("RGB", "L"):
+        original = original.convert("RGB")
+
+    written = 0
+    # От узких к широким: самая широкая WebP — признак готовности (см. is_ready)
+    for width in PRESETS[preset]:
+        copy = original.copy()
+        # Не увеличиваем: узкий оригинал сохраняется в своей ширине
+        copy.thumbnail((width, width * 10), Image.LANCZOS)
+        for image_format, (_, options) in FORMATS.items():
+            target = derivative_name(name, width, image_format)
+            buffer = BytesIO()
+            copy.save(buffer, image_format, **options)
+            if default_storage.exists(target):
+                default_storage.delete(target)
+            default_storage.save(target, ContentFile(buffer.getvalue()))
+            written += 1
+    return written
+
+
+def delete(name, preset):
+    for target in derivative_names(name, preset):
+        default_storage.delete(target)
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, "IMAGE_DERIVATIVE_WORKERS", 2),
+                thread_name_prefix="image-derivatives",
+            )
+        return _executor
+
+
+def generate_or_log(name, preset):
+    try:
+        return generate(name, preset)
+    except Exception:
+        # Битый или неподдерживаемый файл не должен ронять пул; страница покажет оригинал
+        logger.exception("Не удалось построить копии изображения %s", name)
+        return 0
+
+
+def _submit(name, preset):
+    future = _get_executor().submit(generate_or_log, name, preset)
+    _pending.add(future)
+    future.add_done_callback(_pending.discard)
+
+
+def schedule(name, preset):
+    """Построить копии в фоне — после фиксации текущей транзакции."""
+    if name:
+        transaction.on_commit(lambda: _submit(name, preset))
+
+
+def wait(timeout=None):
+    """Дождаться всех запущенных построений (для команд и тестов)."""
+    wait_futures(_pending.copy(), timeout=timeout)
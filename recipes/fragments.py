@@ -0,0 +1,89 @@
+"""Кеш фрагментов страницы рецепта.
+
+Рецепт читают намного чаще, чем меняют, поэтому готовый HTML тела рецепта
+(ингредиенты, инструкция, галерея) и блока комментариев кешируется целиком
+(тег ``{% fragment_cache %}``, см. recipes.templatetags.recipe_fragments).
+
+Ключ фрагмента строится из его версии: для тела — ``Recipe.updated_at``
+(его сдвигают и правки ингредиентов, изображений и названий ингредиентов,
+см. recipes.signals), для комментариев — поколение комментариев рецепта (``comments_generation``)
+и номер страницы. Изменение данных меняет версию, и старая запись просто
+перестаёт читаться — явных сбросов нет. Части страницы, зависящие от
+пользователя (форма оценки, коллекции), в кеш не попадают.
+
+Для настройки ведётся статистика попаданий и промахов по каждому фрагменту
+(manage.py fragment_cache_stats). Счётчики лежат в кеше Django, так что
+с LocMemCache команда видит только свой процесс — нужен общий бэкенд.
+"""
+import hashlib
+
+from django.core.cache import cache
+
+from .cache import get_generation
+
+# Сколько секунд хранить фрагмент; актуальность обеспечивает версия в ключе
+FRAGMENT_TIMEOUT = 60 * 60 * 24
+
+# Фрагменты страницы рецепта (для отчёта по статистике)
+RECIPE_BODY = "recipe_body"
+RECIPE_COMMENTS = "recipe_comments"
+FRAGMENTS = (RECIPE_BODY, RECIPE_COMMENTS)
+
+HIT = "hits"
+MISS = "misses"
+
+
+def comments_generation_name(recipe_id):
+    return f"comments:{recipe_id}"
+
+
+def comments_generation(recipe_id):
+    """Текущее поколение комментариев рецепта — сменяется при любом их изменении (recipes.signals)."""
+    return get_generation(comments_generation_name(recipe_id))
+
+
+def fragment_key(name, vary_on):
+    raw = ":".join(str(value) for value in vary_on)
+    return f"fragment:{name}:{hashlib.md5(raw.encode()).hexdigest()}"
+
+
+def _stats_key(name, outcome):
+    return f"fragment-stats:{name}:{outcome}"
+
+
+def _count(name, outcome):
+    key = _stats_key(name, outcome)
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+
+def get_or_render(name, vary_on, render):
+    """HTML фрагмента ``name`` версии ``vary_on`` из кеша; при промахе — ``render()``."""
+    key = fragment_key(name, vary_on)
+    html = cache.get(key)
+    if html is not None:
+        _count(name, HIT)
+        return html
+    _count(name, MISS)
+    html = render()
+    cache.set(key, html, FRAGMENT_TIMEOUT)
+    return html
+
+
+def stats(names=FRAGMENTS):
+    """Попадания и промахи: {имя: {"hits": .., "misses": .., "hit_ratio": ..}}."""
+    values = cache.get_many([_stats_key(name, outcome) for name in names for outcome in (HIT, MISS)])
+    report = {}
+    for name in names:
+        hits = values.get(_stats_key(name, HIT), 0)
+        misses = values.get(_stats_key(name, MISS), 0)
+        total = hits + misses
+        report[name] = {HIT: hits, MISS: misses, "hit_ratio": round(hits / total, 3) if total else None}
+    return report
+
+
+def reset_stats(names=FRAGMENTS):
+    cache.delete_many([_stats_key(name, outcome) for name in names for outcome in (HIT, MISS)])
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from recipes.ratings import find_drift, repair
+
+
+class Command(BaseCommand):
+    help = "Сверить сумму, число оценок и рейтинг рецептов с таблицей оценок"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--fix", action="store_true",
+            help="Исправить найденные расхождения (по умолчанию только отчёт)",
+        )
+
+    def handle(self, *args, **options):
+        _, drifted = find_drift()
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS("Расхождений нет"))
+            return
+        for recipe in drifted[:20]:
+            self.stdout.write(
+                f"  #{recipe.pk}: должно быть — сумма {recipe.rating_sum}, оценок {recipe.rating_count}, рейтинг {recipe.rating}"
+            )
+        if len(drifted) > 20:
+            self.stdout.write(f"  … и ещё {len(drifted) - 20}")
+        if options["fix"]:
+            repair(drifted)
+            self.stdout.write(self.style.SUCCESS(f"Исправлено рецептов: {len(drifted)}"))
+        else:
+            self.stdout.write(self.style.WARNING(
+                f"Рецептов с расхождениями: {len(drifted)} (запустите с --fix, чтобы исправить)"
+            ))
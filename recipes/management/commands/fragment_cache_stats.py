@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from recipes.fragments import FRAGMENTS, reset_stats, stats
+
+
+class Command(BaseCommand):
+    help = "Попадания и промахи кеша фрагментов страницы рецепта"
+
+    def add_arguments(self, parser):
+        parser.add_argument("names", nargs="*", help=f"Фрагменты (по умолчанию: {', '.join(FRAGMENTS)})")
+        parser.add_argument("--reset", action="store_true", help="Обнулить статистику после отчёта")
+
+    def handle(self, *args, **options):
+        names = tuple(options["names"]) or FRAGMENTS
+        for name, row in stats(names).items():
+            ratio = "—" if row["hit_ratio"] is None else f"{row['hit_ratio']:.1%}"
+            self.stdout.write(f"  {name}: попаданий {row['hits']}, промахов {row['misses']}, доля попаданий {ratio}")
+        if options["reset"]:
+            reset_stats(names)
+            self.stdout.write(self.style.SUCCESS("Статистика обнулена"))
@@ -0,0 +1,40 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from recipes import derivatives
+from recipes.models import RecipeImage
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = "Построить миниатюры и WebP-копии для уже загруженных фотографий рецептов и аватаров"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers", type=int, default=4,
+            help="Сколько изображений кодировать параллельно (по умолчанию 4)",
+        )
+        parser.add_argument(
+            "--force", action="store_true",
+            help="Перестроить и готовые копии (например, после смены PRESETS или качества)",
+        )
+
+    def handle(self, *args, **options):
+        images = [(name, "recipe") for name in RecipeImage.objects.values_list("image", flat=True)]
+        images += [
+            (name, "avatar")
+            for name in User.objects.exclude(avatar="").exclude(avatar=None).values_list("avatar", flat=True)
+        ]
+        if options["force"]:
+            for name, preset in images:
+                derivatives.delete(name, preset)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(options["workers"], 1)) as pool:
+            written = sum(pool.map(lambda item: derivatives.generate_or_log(*item), images))
+        self.stdout.write(self.style.SUCCESS(
+            f"Изображений: {len(images)}, записано копий: {written} "
+            f"за {time.perf_counter() - started:.1f} с"
+        ))
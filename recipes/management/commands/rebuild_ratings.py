@@ -0,0 +1,55 @@
+import datetime
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from recipes.ratings import find_drift, repair
+
+
+def parse_watermark(value):
+    """Отметка времени для --since: дата или дата со временем в ISO-формате."""
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise CommandError(f"Не удалось разобрать дату --since: {value!r}")
+        moment = datetime.datetime.combine(day, datetime.time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+class Command(BaseCommand):
+    help = "Пересчитать рейтинги рецептов по таблице оценок (после импорта или восстановления)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size", type=int, default=1000,
+            help="Сколько рецептов записывать за одну транзакцию (по умолчанию 1000)",
+        )
+        parser.add_argument(
+            "--since",
+            help="Пересчитать только рецепты с оценками не старше этой даты (ISO, например 2026-10-01)",
+        )
+
+    def handle(self, *args, **options):
+        since = parse_watermark(options["since"]) if options["since"] else None
+        chunk_size = max(options["chunk_size"], 1)
+
+        started = time.perf_counter()
+        checked, changed = find_drift(since)
+        counted = time.perf_counter() - started
+        self.stdout.write(f"Проверено рецептов: {checked} за {counted:.2f} с, нужно обновить: {len(changed)}")
+
+        def progress(done, total):
+            elapsed = time.perf_counter() - started - counted
+            rate = done / elapsed if elapsed > 0 else 0
+            self.stdout.write(f"  {done}/{total} ({rate:.0f} рецептов/с)")
+
+        repair(changed, chunk_size=chunk_size, progress=progress)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Готово: обновлено рецептов {len(changed)} за {elapsed:.2f} с"
+        ))
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+
+from recipes import counters, ratings
+
+
+class Command(BaseCommand):
+    help = (
+        "Сверить счётчики рецептов — оценок, комментариев и добавлений в коллекции — "
+        "с исходными таблицами"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--fix", action="store_true",
+            help="Исправить найденные расхождения (по умолчанию только отчёт)",
+        )
+
+    def handle(self, *args, **options):
+        _, rating_drift = ratings.find_drift()
+        _, counter_drift = counters.find_drift()
+        if not rating_drift and not counter_drift:
+            self.stdout.write(self.style.SUCCESS("Расхождений нет"))
+            return
+        for recipe in rating_drift[:20]:
+            self.stdout.write(
+                f"  #{recipe.pk}: должно быть — оценок {recipe.rating_count}, рейтинг {recipe.rating}"
+            )
+        for recipe in counter_drift[:20]:
+            self.stdout.write(
+                f"  #{recipe.pk}: должно быть — комментариев {recipe.comment_count}, "
+                f"в коллекциях {recipe.collection_count}"
+            )
+        if len(rating_drift) > 20 or len(counter_drift) > 20:
+            self.stdout.write("  …")
+        if options["fix"]:
+            ratings.repair(rating_drift)
+            counters.repair_counters(counter_drift)
+            self.stdout.write(self.style.SUCCESS(
+                f"Исправлено: рейтингов {len(rating_drift)}, счётчиков {len(counter_drift)}"
+            ))
+        else:
+            self.stdout.write(self.style.WARNING(
+                f"Расхождений: рейтингов {len(rating_drift)}, счётчиков {len(counter_drift)} "
+                "(запустите с --fix, чтобы исправить)"
+            ))
@@ -0,0 +1,20 @@
+# Generated by Django 5.1.1 on 2026-10-18 03:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0003_recipe_difficulty_alter_recipe_category_and_more'),
+        ('recipes', '0005_remove_duplicate_image_field'),
+    ]
+
+    operations = [
+        # Ветки по-разному меняли точность рейтинга — фиксируем итоговое состояние
+        migrations.AlterField(
+            model_name='recipe',
+            name='rating',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=4, verbose_name='Рейтинг'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.1.1 on 2026-10-18 03:27
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def fill_rating_totals(apps, schema_editor):
+    """Заполнить сумму и число оценок и пересчитать рейтинг с тем же округлением."""
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Rating = apps.get_model('recipes', 'Rating')
+    totals = {
+        row['recipe_id']: (row['total'], row['count'])
+        for row in Rating.objects.order_by().values('recipe_id').annotate(total=Sum('value'), count=Count('id'))
+    }
+    recipes = list(Recipe.objects.filter(pk__in=totals).only('id'))
+    for recipe in recipes:
+        recipe.rating_sum, recipe.rating_count = totals[recipe.pk]
+        hundredths = (recipe.rating_sum * 200 + recipe.rating_count) // (recipe.rating_count * 2)
+        recipe.rating = (Decimal(hundredths) / 100).quantize(Decimal('0.01'))
+    Recipe.objects.bulk_update(recipes, ['rating_sum', 'rating_count', 'rating'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_merge_20261018_0614'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Число оценок'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Сумма оценок'),
+        ),
+        migrations.RunPython(fill_rating_totals, migrations.RunPython.noop),
+    ]
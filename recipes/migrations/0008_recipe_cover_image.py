@@ -0,0 +1,40 @@
+# Generated by Django 5.1.1 on 2026-10-18 03:47
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def fill_images(apps, schema_editor):
+    """Заполнить главное изображение и число изображений одним UPDATE."""
+    Recipe = apps.get_model('recipes', 'Recipe')
+    RecipeImage = apps.get_model('recipes', 'RecipeImage')
+    images = RecipeImage.objects.filter(recipe=OuterRef('pk')).order_by()
+    Recipe.objects.filter(pk__in=RecipeImage.objects.values('recipe_id')).update(
+        cover_image=Coalesce(
+            Subquery(images.order_by('-is_main', 'position', 'id').values('image')[:1]),
+            Value(''),
+        ),
+        image_count=Subquery(images.values('recipe').annotate(count=Count('id')).values('count')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_recipe_rating_sum_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='cover_image',
+            field=models.ImageField(blank=True, editable=False, upload_to='recipe_images/', verbose_name='Главное изображение'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='image_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Число изображений'),
+        ),
+        migrations.RunPython(fill_images, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.1.1 on 2026-10-18 03:53
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+
+
+def fill_counters(apps, schema_editor):
+    """Заполнить счётчики комментариев и коллекций: по одному UPDATE на счётчик."""
+    Recipe = apps.get_model('recipes', 'Recipe')
+    for field, model in (
+        ('comment_count', apps.get_model('recipes', 'Comment')),
+        ('collection_count', apps.get_model('collections_app', 'CollectionItem')),
+    ):
+        rows = model.objects.filter(recipe=OuterRef('pk')).order_by()
+        Recipe.objects.filter(pk__in=model.objects.values('recipe_id')).update(**{
+            field: Subquery(rows.values('recipe').annotate(count=Count('id')).values('count')),
+        })
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_recipe_cover_image'),
+        ('collections_app', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='collection_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В коллекциях'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Число комментариев'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+from django.db import migrations
+from django.db.models import F
+from django.db.models.functions import Round
+
+
+def round_ratings(apps, schema_editor):
+    """Округлить рейтинги, записанные прежним выражением как 1.1300000000000001."""
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Recipe.objects.filter(rating_count__gt=0).update(rating=Round(F('rating'), 2))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_recipe_engagement_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(round_ratings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.1.1 on 2026-10-18 04:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_round_stored_ratings'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Generation',
+            fields=[
+                ('name', models.CharField(max_length=100, primary_key=True, serialize=False, verbose_name='Имя')),
+                ('value', models.BigIntegerField(verbose_name='Значение')),
+            ],
+            options={
+                'verbose_name': 'Поколение данных',
+                'verbose_name_plural': 'Поколения данных',
+            },
+        ),
+    ]
@@ -1,9 +1,11 @@
-from decimal import Decimal, ROUND_HALF_UP
-import decimal
+from decimal import Decimal
 from django.conf import settings
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.db import models
-from django.db.models import PROTECT, Avg
+from django.db.models import PROTECT, Case, Count, F, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce, Greatest, Round
+from django.db.models.lookups import GreaterThan
+from django.utils import timezone
 from django.utils.text import slugify
 
 
@@ -38,6 +40,62 @@ class Ingredient(models.Model):
         return self.name
 
 
+def rating_from_totals(rating_sum, rating_count):
+    """Средняя оценка, округлённая до сотых (половина — вверх)."""
+    if rating_count <= 0:
+        return Decimal("0.00")
+    hundredths = (rating_sum * 200 + rating_count) // (rating_count * 2)
+    return (Decimal(hundredths) / 100).quantize(Decimal("0.01"))
+
+
+def rating_expression(rating_sum, rating_count):
+    """То же, что rating_from_totals, но SQL-выражением — для UPDATE без чтения строки.
+
+    Сотые считаются целочисленным делением, а в оценку с двумя знаками переводятся
+    делением на 100 с ROUND(…, 2): умножение на 0.01 оставляло в базе
+    1.1300000000000001 вместо 1.13, и такие строки не находились по
+    ``rating=Decimal("1.13")`` и путали keyset-пагинацию по рейтингу.
+    """
+    hundredths = Cast((rating_sum * 200 + rating_count) / (rating_count * 2), models.IntegerField())
+    return Case(
+        When(GreaterThan(rating_count, 0), then=Round(hundredths / Value(100.0), 2)),
+        default=Value(Decimal("0.00")),
+        output_field=models.DecimalField(max_digits=4, decimal_places=2),
+    )
+
+
+# Поля, которые нужны карточке рецепта в списках (см. RecipeQuerySet.for_cards)
+CARD_FIELDS = (
+    "id", "title", "description", "cook_time", "difficulty",
+    "rating", "rating_count", "comment_count", "collection_count", "cover_image", "image_count",
+    "created_at",
+    "author__id", "author__username", "author__first_name", "author__last_name",
+    "category__id", "category__name", "category__slug",
+)
+
+# Популярность рецепта: сохранения в коллекции весят больше оценок, оценки — больше комментариев
+POPULARITY = "popularity"
+
+
+def popularity_expression():
+    return F("collection_count") * 3 + F("rating_count") * 2 + F("comment_count")
+
+
+class RecipeQuerySet(models.QuerySet):
+    def for_cards(self):
+        """Рецепты для карточек в списках — одним запросом на страницу.
+
+        Автор и категория подтягиваются JOIN'ом, из таблиц берутся только
+        поля карточки; главное изображение и счётчики оценок, комментариев
+        и коллекций уже лежат в рецепте.
+        """
+        return self.select_related("author", "category").only(*CARD_FIELDS)
+
+    def with_popularity(self):
+        """Добавить аннотацию ``popularity`` — по счётчикам рецепта, без агрегатов."""
+        return self.annotate(**{POPULARITY: popularity_expression()})
+
+
 class Recipe(models.Model):
     author = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -72,10 +130,24 @@ class Recipe(models.Model):
     )
 
 
-    # Рейтинг считается автоматически по оценкам
+    # Рейтинг считается автоматически по оценкам: rating = rating_sum / rating_count
     rating = models.DecimalField(
         "Рейтинг", max_digits=4, decimal_places=2, default=0, editable=False
     )
+    rating_sum = models.PositiveIntegerField("Сумма оценок", default=0, editable=False)
+    rating_count = models.PositiveIntegerField("Число оценок", default=0, editable=False)
+
+    # Главное изображение и число изображений — копия данных RecipeImage,
+    # чтобы карточки и фильтр «с фото» обходились без JOIN'а (см. sync_images)
+    cover_image = models.ImageField(
+        "Главное изображение", upload_to="recipe_images/", blank=True, editable=False
+    )
+    image_count = models.PositiveIntegerField("Число изображений", default=0, editable=False)
+
+    # Счётчики комментариев и добавлений в коллекции: сдвигаются при каждом
+    # создании и удалении (см. apply_counter_delta), сверяются manage.py reconcile_counters
+    comment_count = models.PositiveIntegerField("Число комментариев", default=0, editable=False)
+    collection_count = models.PositiveIntegerField("В коллекциях", default=0, editable=False)
 
     created_at = models.DateTimeField("Создано", auto_now_add=True)
     updated_at = models.DateTimeField("Изменено", auto_now=True)
@@ -87,6 +159,8 @@ class Recipe(models.Model):
         verbose_name="Ингредиенты",
     )
 
+    objects = RecipeQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Рецепт"
         verbose_name_plural = "Рецепты"
@@ -102,25 +176,69 @@ class Recipe(models.Model):
     image_tag.short_description = "Фото"
 
     def update_rating(self):
-        """Пересчитать средний рейтинг из связанных оценок."""
-        agg = self.ratings.aggregate(avg=Avg("value"))
-        avg_value = agg["avg"]
-        if avg_value is None:
-            new_value = Decimal("0.00")
-        else:
-            try:
-                # Безопасное преобразование в Decimal
-                avg_str = str(avg_value)
-                if avg_str.lower() in ['nan', 'inf', '-inf']:
-                    new_value = Decimal("0.00")
-                else:
-                    new_value = Decimal(avg_str).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
-            except (ValueError, TypeError, decimal.InvalidOperation):
-                new_value = Decimal("0.00")
-        
-        if self.rating != new_value:
-            self.rating = new_value
-            self.save(update_fields=["rating"])
+        """Пересчитать сумму, число оценок и рейтинг по всем оценкам рецепта.
+
+        Обычно не нужен: каждая оценка сдвигает агрегаты сама (см. apply_rating_delta).
+        Используется для исправления расхождений (manage.py audit_ratings).
+        """
+        agg = self.ratings.aggregate(total=Sum("value"), count=Count("id"))
+        self.rating_sum = agg["total"] or 0
+        self.rating_count = agg["count"]
+        self.rating = rating_from_totals(self.rating_sum, self.rating_count)
+        self.save(update_fields=["rating_sum", "rating_count", "rating"])
+
+    @classmethod
+    def apply_rating_delta(cls, recipe_id, sum_delta, count_delta):
+        """Сдвинуть агрегаты рейтинга одним атомарным UPDATE, без чтения оценок."""
+        new_sum = F("rating_sum") + sum_delta
+        new_count = F("rating_count") + count_delta
+        cls.objects.filter(pk=recipe_id).update(
+            rating_sum=new_sum,
+            rating_count=new_count,
+            rating=rating_expression(new_sum, new_count),
+        )
+
+    @classmethod
+    def apply_counter_delta(cls, recipe_id, field, delta):
+        """Сдвинуть счётчик рецепта (comment_count, collection_count) атомарным UPDATE."""
+        value = F(field) + delta
+        if delta < 0:
+            # Разошедшийся счётчик не должен уходить в минус и ломать удаление
+            value = Greatest(value, Value(0))
+        cls.objects.filter(pk=recipe_id).update(**{field: value})
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Запоминаем сохранённое название: словарь подсказок поиска пополняется,
+        # только если оно сменилось (search.signals)
+        instance._saved_title = instance.__dict__.get("title")
+        return instance
+
+    @classmethod
+    def touch(cls, recipe_id):
+        """Сдвинуть updated_at без сохранения рецепта — по нему версионируется кеш страницы."""
+        cls.objects.filter(pk=recipe_id).update(updated_at=timezone.now())
+
+    @classmethod
+    def sync_images(cls, recipe_id):
+        """Обновить cover_image и image_count по изображениям рецепта одним UPDATE.
+
+        Главное — изображение с is_main, иначе первое по порядку. Заодно
+        сдвигается updated_at: галерея входит в закешированную страницу.
+        """
+        images = RecipeImage.objects.filter(recipe=OuterRef("pk")).order_by()
+        cls.objects.filter(pk=recipe_id).update(
+            updated_at=timezone.now(),
+            cover_image=Coalesce(
+                Subquery(images.order_by("-is_main", "position", "id").values("image")[:1]),
+                Value(""),
+            ),
+            image_count=Coalesce(
+                Subquery(images.values("recipe").annotate(count=Count("id")).values("count")),
+                Value(0),
+            ),
+        )
 
     @property
     def main_image(self):
@@ -130,6 +248,17 @@ class Recipe(models.Model):
             return main.image.url
         return None
 
+    @property
+    def cover_url(self):
+        """URL обложки для карточек — из cover_image, без запроса к RecipeImage.
+
+        В отличие от ``main_image``, без отмеченного главного изображения
+        обложкой становится первое по порядку (см. sync_images).
+        """
+        if self.cover_image:
+            return self.cover_image.url
+        return None
+
 
 class RecipeImage(models.Model):
     recipe = models.ForeignKey(
@@ -217,13 +346,39 @@ class Rating(models.Model):
     def __str__(self):
         return f"{self.user} → {self.recipe}: {self.value}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Запоминаем сохранённую оценку, чтобы при изменении сдвинуть агрегаты на разницу
+        instance._saved = (instance.__dict__.get("recipe_id"), instance.__dict__.get("value"))
+        return instance
+
     def save(self, *args, **kwargs):
+        adding = self._state.adding
+        saved_recipe_id, saved_value = getattr(self, "_saved", (None, None))
         super().save(*args, **kwargs)
-        self.recipe.update_rating()
-
-    def delete(self, *args, **kwargs):
-        recipe = self.recipe
-        super().delete(*args, **kwargs)
-        # Проверяем, что рецепт еще существует перед обновлением рейтинга
-        if Recipe.objects.filter(pk=recipe.pk).exists():
-            recipe.update_rating()
\ No newline at end of file
+        if adding:
+            Recipe.apply_rating_delta(self.recipe_id, self.value, 1)
+        elif saved_recipe_id is None or saved_value is None:
+            # Прежняя оценка неизвестна (поля были отложены) — пересчитываем честно
+            self.recipe.update_rating()
+        elif saved_recipe_id != self.recipe_id:
+            Recipe.apply_rating_delta(saved_recipe_id, -saved_value, -1)
+            Recipe.apply_rating_delta(self.recipe_id, self.value, 1)
+        elif saved_value != self.value:
+            Recipe.apply_rating_delta(self.recipe_id, self.value - saved_value, 0)
+        self._saved = (self.recipe_id, self.value)
+        # Удаление (в том числе каскадное) обрабатывается в recipes.signals
+
+class Generation(models.Model):
+    """Поколение данных (см. recipes.cache): растёт атомарным UPDATE и не вытесняется."""
+
+    name = models.CharField("Имя", max_length=100, primary_key=True)
+    value = models.BigIntegerField("Значение")
+
+    class Meta:
+        verbose_name = "Поколение данных"
+        verbose_name_plural = "Поколения данных"
+
+    def __str__(self):
+        return f"{self.name}: {self.value}"
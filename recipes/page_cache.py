@@ -0,0 +1,104 @@
+"""Условные GET-запросы и кеш целых страниц для анонимных посетителей.
+
+Большую часть трафика главной, списков рецептов и категорий и страниц
+рецептов дают гости и поисковые роботы — им всем показывается одна и та
+же страница. Для таких запросов (см. ``is_anonymous_request``):
+
+* ответ получает ``ETag`` — по поколению данных рецептов (recipes.cache).
+  Поколение лежит в таблице Generation, так что это один запрос к базе по
+  первичному ключу на каждый запрос страницы; для закешированной страницы
+  и ответа 304 он единственный. Поколение не кешируется в процессе, чтобы
+  ETag не отставал от данных. В отличие от
+  ``max(updated_at)`` поколение сменяется и при удалениях, оценках,
+  комментариях и изменении категорий, которые ``updated_at`` не двигают.
+  Повторный запрос с ``If-None-Match`` получает 304 без рендеринга;
+* готовая страница кешируется целиком; поколение входит в ключ, так что
+  после изменения данных старые записи просто перестают читаться.
+
+Запрос с cookie сессии или сообщений считается персональным и обрабатывается
+как обычно — без ETag и кеша. Не кешируются и ответы, которые выдали
+CSRF-токен или поставили cookie. Кешированные ответы помечаются
+``Vary: Cookie``, чтобы промежуточные кеши не отдавали их вошедшим
+пользователям.
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+
+from .cache import RECIPES, get_generation
+
+# Сколько секунд держать страницу; актуальность обеспечивает поколение в ключе
+PAGE_TIMEOUT = 10 * 60
+
+# Заголовки, которые сохраняются вместе с телом страницы
+CACHED_HEADERS = ("Content-Type", "Content-Language")
+
+
+def is_anonymous_request(request):
+    """GET/HEAD без cookie сессии и сообщений — страница не зависит от посетителя.
+
+    Без cookie сессии пользователь заведомо не вошёл, и проверка не стоит запроса к базе.
+    """
+    if request.method not in ("GET", "HEAD"):
+        return False
+    personal = (settings.SESSION_COOKIE_NAME, CookieStorage.cookie_name)
+    return not any(name in request.COOKIES for name in personal)
+
+
+def page_etag(request):
+    """ETag страницы: путь с параметрами и поколение данных рецептов (один запрос к базе)."""
+    raw = f"{request.get_full_path()}:{get_generation(RECIPES)}"
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def _cache_key(etag):
+    return f"page:{etag}"
+
+
+def _is_cacheable(request, response):
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+        and not request.META.get("CSRF_COOKIE_NEEDS_UPDATE")
+    )
+
+
+def anonymous_page_cache(view):
+    """Декоратор представления: ETag, 304 и кеш страницы для анонимных запросов."""
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not is_anonymous_request(request):
+            return view(request, *args, **kwargs)
+
+        etag = f'"{page_etag(request)}"'
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return not_modified
+
+        cached = cache.get(_cache_key(etag))
+        if cached is not None:
+            content, headers = cached
+            response = HttpResponse(content, headers=headers)
+        else:
+            response = view(request, *args, **kwargs)
+            if hasattr(response, "render") and callable(response.render):
+                response = response.render()  # CSRF-токен берётся при рендеринге
+            if not _is_cacheable(request, response):
+                return response
+            headers = {name: response[name] for name in CACHED_HEADERS if name in response}
+            cache.set(_cache_key(etag), (response.content, headers), PAGE_TIMEOUT)
+
+        response["ETag"] = etag
+        patch_vary_headers(response, ("Cookie",))
+        # Браузер хранит страницу, но каждый раз сверяет ETag
+        patch_cache_control(response, no_cache=True)
+        return response
+
+    return wrapper
@@ -0,0 +1,197 @@
+"""Keyset-пагинация (по курсору) для списков рецептов.
+
+Обычный Paginator на каждой странице делает ``COUNT(*)`` и ``OFFSET``,
+поэтому дальние страницы становятся всё медленнее. Здесь следующая
+страница выбирается условием «после последней показанной записи» по
+ключу сортировки (например, ``(created_at, id)``) — это одинаково быстро
+для любой страницы. Курсоры непрозрачные: base64 от JSON.
+"""
+import base64
+import binascii
+import datetime
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+NEXT = "n"
+PREVIOUS = "p"
+
+# Сколько секунд хранить посчитанное общее число записей
+COUNT_CACHE_TIMEOUT = 300
+
+
+def keyset_ordering(order_field):
+    """Ключ сортировки с id в качестве разрешения ничьих: '-rating' → ('-rating', '-id')."""
+    return (order_field, "-id" if order_field.startswith("-") else "id")
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    """DjangoJSONEncoder обрезает время до миллисекунд — для курсора нужна полная точность."""
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def encode_cursor(direction, values):
+    raw = json.dumps([direction, values], cls=CursorEncoder, ensure_ascii=False)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    """Вернуть (direction, values) или None, если курсор испорчен."""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        direction, values = json.loads(raw)
+    except (binascii.Error, ValueError, TypeError):
+        return None
+    if direction not in (NEXT, PREVIOUS) or not isinstance(values, list):
+        return None
+    return direction, values
+
+
+class KeysetPage:
+    """Страница keyset-пагинации; повторяет основное API django.core.paginator.Page."""
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        return f"<KeysetPage: {len(self.object_list)} objects>"
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    @property
+    def next_cursor(self):
+        if not self._has_next:
+            return None
+        return encode_cursor(NEXT, self.paginator.key_values(self.object_list[-1]))
+
+    @property
+    def previous_cursor(self):
+        if not self._has_previous:
+            return None
+        return encode_cursor(PREVIOUS, self.paginator.key_values(self.object_list[0]))
+
+
+class KeysetPaginator:
+    """Пагинация по курсору для queryset'а с сортировкой ``ordering``.
+
+    ``ordering`` — поля сортировки, последнее должно быть уникальным
+    (обычно ``id``), например ``("-created_at", "-id")``.
+    """
+
+    def __init__(self, queryset, per_page, ordering):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.ordering = tuple(ordering)
+        self.fields = [(field.lstrip("-"), field.startswith("-")) for field in self.ordering]
+
+    def key_values(self, obj):
+        return [getattr(obj, name) for name, _ in self.fields]
+
+    def _parse_values(self, values):
+        if len(values) != len(self.fields):
+            return None
+        try:
+            return [self._field(name).to_python(value) for (name, _), value in zip(self.fields, values)]
+        except Exception:
+            return None
+
+    def _field(self, name):
+        # Ключом может быть и аннотация queryset'а (например, popularity)
+        annotation = self.queryset.query.annotations.get(name)
+        if annotation is not None:
+            return annotation.output_field
+        return self.queryset.model._meta.get_field(name)
+
+    def _after(self, values, backwards):
+        """Условие «строго после ``values``» в порядке сортировки (или до — при backwards)."""
+        condition = Q()
+        equal = Q()
+        for (name, descending), value in zip(self.fields, values):
+            lookup = "lt" if descending != backwards else "gt"
+            condition |= equal & Q(**{f"{name}__{lookup}": value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def page(self, cursor=None):
+        """Страница после/до курсора; пустой или испорченный курсор — первая страница."""
+        decoded = decode_cursor(cursor) if cursor else None
+        values = self._parse_values(decoded[1]) if decoded else None
+        direction = decoded[0] if values is not None else None
+        backwards = direction == PREVIOUS
+
+        queryset = self.queryset
+        if values is not None:
+            queryset = queryset.filter(self._after(values, backwards))
+        if backwards:
+            ordering = [field[1:] if field.startswith("-") else f"-{field}" for field in self.ordering]
+        else:
+            ordering = self.ordering
+        rows = list(queryset.order_by(*ordering)[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+
+        if backwards:
+            rows.reverse()
+            return KeysetPage(rows, self, has_next=True, has_previous=has_more)
+        return KeysetPage(rows, self, has_next=has_more, has_previous=values is not None)
+
+    @property
+    def count(self):
+        """Общее число записей — считается редко и хранится в кеше несколько минут."""
+        try:
+            sql = str(self.queryset.query)
+        except EmptyResultSet:
+            return 0
+        key = "keyset-count:" + hashlib.md5(sql.encode()).hexdigest()
+        total = cache.get(key)
+        if total is None:
+            total = self.queryset.count()
+            cache.set(key, total, COUNT_CACHE_TIMEOUT)
+        return total
+
+
+class KeysetPaginationMixin:
+    """Для ListView: с параметром ``?cursor=`` страницы листаются по курсору.
+
+    Без параметра работает обычная постраничная навигация.
+    """
+
+    cursor_param = "cursor"
+    keyset_ordering = ("-created_at", "-id")
+
+    def get_keyset_ordering(self):
+        return self.keyset_ordering
+
+    def paginate_queryset(self, queryset, page_size):
+        if self.cursor_param not in self.request.GET:
+            return super().paginate_queryset(queryset, page_size)
+        paginator = KeysetPaginator(queryset, page_size, self.get_keyset_ordering())
+        page = paginator.page(self.request.GET.get(self.cursor_param))
+        return paginator, page, page.object_list, page.has_other_pages()
@@ -0,0 +1,87 @@
+"""Сверка и пересчёт агрегатов рейтинга по таблице оценок.
+
+Рецепт хранит сумму и число оценок, которые сдвигаются при каждой оценке
+(см. Recipe.apply_rating_delta). Массовые изменения мимо моделей —
+``QuerySet.update()``, импорт, восстановление из резервной копии — могут
+оставить агрегаты расходящимися с таблицей оценок; здесь их находят и чинят.
+
+Все суммы считаются одним сгруппированным запросом по Rating, а записываются
+только изменившиеся рецепты — пачками, по транзакции на пачку.
+"""
+from django.db import connection, transaction
+from django.db.models import Count, Sum
+
+from .cache import RECIPES, bump_generation
+from .models import Rating, Recipe, rating_from_totals
+
+FIELDS = ["rating_sum", "rating_count", "rating"]
+
+
+def _recipes_rated_since(since):
+    return Rating.objects.filter(created_at__gte=since).values("recipe_id")
+
+
+def rating_totals(since=None):
+    """Один сгруппированный запрос: recipe_id → (сумма, число) по таблице оценок.
+
+    При ``since`` — только для рецептов, у которых есть оценки не старше этой отметки.
+    """
+    ratings = Rating.objects.order_by()
+    if since is not None:
+        ratings = ratings.filter(recipe_id__in=_recipes_rated_since(since))
+    rows = (
+        ratings.values("recipe_id")
+        .annotate(total=Sum("value"), count=Count("id"))
+        .values_list("recipe_id", "total", "count")
+    )
+    return {recipe_id: (total, count) for recipe_id, total, count in rows}
+
+
+def find_drift(since=None):
+    """Рецепты, у которых агрегаты не совпадают с оценками.
+
+    Возвращает пару (проверено рецептов, список несохранённых рецептов
+    с исправленными полями ``rating_sum``, ``rating_count`` и ``rating``).
+    """
+    totals = rating_totals(since)
+    recipes = Recipe.objects.order_by()
+    if since is not None:
+        recipes = recipes.filter(pk__in=_recipes_rated_since(since))
+    drifted = []
+    checked = 0
+    for pk, *stored in recipes.values_list("pk", *FIELDS).iterator(chunk_size=5000):
+        checked += 1
+        rating_sum, rating_count = totals.get(pk, (0, 0))
+        expected = [rating_sum, rating_count, rating_from_totals(rating_sum, rating_count)]
+        if stored != expected:
+            drifted.append(Recipe(pk=pk, rating_sum=rating_sum, rating_count=rating_count, rating=expected[2]))
+    return checked, drifted
+
+
+def _update_sql(fields):
+    quote = connection.ops.quote_name
+    assignments = ", ".join(f"{quote(field)} = %s" for field in fields)
+    return f"UPDATE {quote(Recipe._meta.db_table)} SET {assignments} WHERE {quote('id')} = %s"
+
+
+def repair(recipes, chunk_size=1000, progress=None, fields=FIELDS):
+    """Сохранить исправленные поля ``fields`` рецептов: по транзакции на пачку.
+
+    Вместо ``bulk_update`` (он собирает CASE WHEN на каждую строку и упирается
+    в Python на паре тысяч строк в секунду) пачка пишется одним
+    параметризованным UPDATE через ``executemany``. Сигналы, как и у
+    ``bulk_update``, не отправляются. ``progress(done, total)`` вызывается
+    после каждой пачки.
+    """
+    if not recipes:
+        return
+    sql = _update_sql(fields)
+    for start in range(0, len(recipes), chunk_size):
+        chunk = recipes[start:start + chunk_size]
+        rows = [[getattr(recipe, field) for field in fields] + [recipe.pk] for recipe in chunk]
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.executemany(sql, rows)
+        if progress is not None:
+            progress(start + len(chunk), len(recipes))
+    # Сигналов не было — сбрасываем кеши поиска явно
+    bump_generation(RECIPES)
@@ -0,0 +1,116 @@
+"""Пересчёт ингредиентов рецептов на другое число порций.
+
+Интеграция планирования меню масштабирует сотни рецептов за запрос,
+поэтому пересчёт не проходит через модели и Decimal. Количества
+читаются одним запросом ``values_list`` уже целыми сотыми долями
+(``ROUND(amount * 100)`` в SQL), масштабируются точной целочисленной
+арифметикой с коэффициентом-дробью и округляются до шага, свойственного
+единице (ложки — до четверти, граммы — до целых). Шаги вычисляются
+один раз на единицу (``rounding_step``).
+
+Единицы нормализуются: лишние пробелы и регистр убираются, граммы и
+миллилитры переходят в килограммы и литры от 1000 и обратно — меньше
+единицы (см. recipes.shopping).
+"""
+from decimal import Decimal
+from fractions import Fraction
+from functools import lru_cache
+
+from django.db.models import F, IntegerField
+from django.db.models.functions import Cast, Round
+
+from .models import RecipeIngredient
+from .shopping import CONVERSIONS, DISPLAY_UNITS
+
+# Количества считаются в сотых долях единицы
+SCALE = 100
+
+# Шаг округления в сотых: ложки и стаканы — до долей, граммы и миллилитры — до целых
+ROUNDING_STEPS = {
+    "г": 100,
+    "мл": 100,
+    "ч.л.": 25,
+    "ст.л.": 50,
+    "стакан": 25,
+    "шт": 50,
+    "щепотка": 100,
+}
+
+# Коэффициент масштабирования: от 1/100 до 100 порций исходного рецепта
+MIN_FACTOR = Fraction(1, 100)
+MAX_FACTOR = Fraction(100)
+
+# Метрические пары: мелкая единица → (крупная, сколько мелких в крупной)
+_SMALLER = {larger: (unit, ratio) for unit, (larger, ratio) in DISPLAY_UNITS.items()}
+
+
+def parse_factor(value):
+    """Коэффициент из числа или строки ("1.5", "3/2"); ValueError, если вне допустимого."""
+    try:
+        factor = Fraction(str(value)).limit_denominator(1000)
+    except (ValueError, ZeroDivisionError):
+        raise ValueError(f"Некорректный коэффициент: {value!r}")
+    if not MIN_FACTOR <= factor <= MAX_FACTOR:
+        raise ValueError(f"Коэффициент вне диапазона {MIN_FACTOR}–{MAX_FACTOR}: {value!r}")
+    return factor
+
+
+@lru_cache(maxsize=256)
+def normalize_unit(unit):
+    """Каноническое написание единицы: «  КГ » → «кг»."""
+    normalized = unit.strip().lower()
+    return normalized if normalized in CONVERSIONS or normalized in ROUNDING_STEPS else unit.strip()
+
+
+@lru_cache(maxsize=256)
+def rounding_step(unit):
+    """Шаг округления единицы в сотых долях (для кг и л — 0.01)."""
+    return ROUNDING_STEPS.get(unit, 1)
+
+
+def _round(hundredths, unit, nonzero):
+    # Половина — вверх; ненулевое количество не округляется до нуля
+    step = rounding_step(unit)
+    rounded = (hundredths + step // 2) // step * step
+    return rounded or (step if nonzero else 0)
+
+
+def scale_amount(hundredths, factor, unit):
+    """Масштабировать количество (в сотых) на ``factor`` (Fraction) и вернуть (Decimal, единица)."""
+    unit = normalize_unit(unit)
+    # Результат — дробь numerator / denominator сотых; всё в целых числах
+    numerator = hundredths * factor.numerator
+    denominator = factor.denominator
+    larger = DISPLAY_UNITS.get(unit)
+    smaller = _SMALLER.get(unit)
+    if larger is not None and numerator >= larger[1] * SCALE * denominator:
+        denominator *= larger[1]
+        unit = larger[0]
+    elif smaller is not None and numerator < SCALE * denominator:
+        numerator *= smaller[1]
+        unit = smaller[0]
+    scaled = (2 * numerator + denominator) // (2 * denominator)  # половина — вверх
+    return Decimal(_round(scaled, unit, numerator > 0)).scaleb(-2), unit
+
+
+def scale_recipes(factors):
+    """Ингредиенты рецептов, пересчитанные на коэффициенты ``factors`` ({recipe_id: Fraction}).
+
+    Один запрос на все рецепты. Возвращает {recipe_id: [{"ingredient_id",
+    "name", "amount" (Decimal), "unit"}, ...]}; рецепты без ингредиентов
+    и несуществующие получают пустой список.
+    """
+    factors = {recipe_id: Fraction(factor) for recipe_id, factor in factors.items()}
+    rows = (
+        RecipeIngredient.objects.filter(recipe_id__in=factors)
+        .order_by("recipe_id", "id")
+        .values_list(
+            "recipe_id", "ingredient_id", "ingredient__name", "unit",
+            Cast(Round(F("amount") * SCALE), IntegerField()),
+        )
+    )
+    scaled = {recipe_id: [] for recipe_id in factors}
+    for recipe_id, ingredient_id, name, unit, hundredths in rows:
+        amount, unit = scale_amount(hundredths, factors[recipe_id], unit)
+        scaled[recipe_id].append({"ingredient_id": ingredient_id, "name": name, "amount": amount, "unit": unit})
+    return scaled
@@ -0,0 +1,106 @@
+"""Список покупок: сумма ингредиентов по набору рецептов.
+
+Считается одним запросом ``GROUP BY`` по RecipeIngredient: единицы
+приводятся к базовым (граммы, миллилитры) выражением ``CASE`` прямо
+в SQL, поэтому «200 г» и «1 кг» муки складываются в одну строку, а
+рецепты и их ингредиенты в Python не загружаются. Для коллекции выборка
+идёт JOIN'ом через CollectionItem, так что размер коллекции влияет только
+на работу базы.
+
+Штуки, щепотки и единицы вне таблицы не пересчитываются и суммируются
+каждая сама по себе.
+"""
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db.models import Case, CharField, Count, DecimalField, F, Sum, Value, When
+from django.db.models.functions import Trim
+
+from .models import RecipeIngredient
+
+# Единица → (базовая единица, сколько базовых в одной); единицы — из RecipeIngredientForm.UNIT_CHOICES
+CONVERSIONS = {
+    "г": ("г", 1),
+    "кг": ("г", 1000),
+    "мл": ("мл", 1),
+    "л": ("мл", 1000),
+    "ч.л.": ("мл", 5),
+    "ст.л.": ("мл", 15),
+    "стакан": ("мл", 200),  # гранёный стакан
+}
+
+# Крупная единица для показа: от 1000 г — в килограммах, от 1000 мл — в литрах
+DISPLAY_UNITS = {"г": ("кг", 1000), "мл": ("л", 1000)}
+
+AMOUNT = DecimalField(max_digits=14, decimal_places=2)
+
+
+def _spellings(name):
+    # LOWER() в SQLite не понимает кириллицу — перечисляем написания явно
+    return {name, name.upper(), name.capitalize()}
+
+
+def _base_unit(unit):
+    return Case(
+        *[When(**{f"{unit}__in": _spellings(name)}, then=Value(base)) for name, (base, _) in CONVERSIONS.items()],
+        default=F(unit),
+        output_field=CharField(),
+    )
+
+
+def _factor(unit):
+    return Case(
+        *[
+            When(**{f"{unit}__in": _spellings(name)}, then=Value(Decimal(factor)))
+            for name, (_, factor) in CONVERSIONS.items()
+        ],
+        default=Value(Decimal(1)),
+        output_field=AMOUNT,
+    )
+
+
+def _display(amount, unit):
+    larger, factor = DISPLAY_UNITS.get(unit, (None, None))
+    if larger is not None and amount >= factor:
+        return amount / factor, larger
+    return amount, unit
+
+
+def shopping_list(recipe_ingredients):
+    """Сгруппировать ``recipe_ingredients`` (queryset RecipeIngredient) в список покупок.
+
+    Возвращает список словарей ``ingredient_id``, ``name``, ``amount``
+    (Decimal), ``unit`` и ``recipes`` (в скольких рецептах встречается),
+    упорядоченный по названию ингредиента.
+    """
+    rows = (
+        recipe_ingredients.order_by()
+        .annotate(normalized_unit=Trim("unit"))
+        .annotate(base_unit=_base_unit("normalized_unit"))
+        .values("ingredient_id", "ingredient__name", "base_unit")
+        .annotate(
+            total=Sum(F("amount") * _factor("normalized_unit"), output_field=AMOUNT),
+            recipes=Count("recipe_id", distinct=True),
+        )
+        .order_by("ingredient__name", "base_unit")
+    )
+    items = []
+    for row in rows:
+        amount, unit = _display(Decimal(row["total"]), row["base_unit"])
+        items.append({
+            "ingredient_id": row["ingredient_id"],
+            "name": row["ingredient__name"],
+            "amount": amount.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP),
+            "unit": unit,
+            "recipes": row["recipes"],
+        })
+    return items
+
+
+def for_collection(collection):
+    """Список покупок по всем рецептам коллекции — JOIN через CollectionItem."""
+    return shopping_list(RecipeIngredient.objects.filter(recipe__in_collections__collection=collection))
+
+
+def for_recipes(recipe_ids):
+    """Список покупок по произвольному набору рецептов."""
+    return shopping_list(RecipeIngredient.objects.filter(recipe_id__in=recipe_ids))
@@ -0,0 +1,79 @@
+"""Поддержание денормализованных полей рецепта (агрегаты рейтинга, изображения, счётчики) и копий изображений."""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import derivatives
+from .cache import bump_generation, forget_generation
+from .fragments import comments_generation_name
+from .models import Comment, Ingredient, Rating, Recipe, RecipeImage, RecipeIngredient
+
+
+@receiver(post_delete, sender=Rating)
+def rating_deleted(sender, instance, **kwargs):
+    # Сигнал приходит и при каскадном удалении (рецепта или пользователя),
+    # когда Rating.delete() не вызывается; для удалённого рецепта UPDATE ничего не делает
+    recipe_id, value = getattr(instance, "_saved", (instance.recipe_id, instance.value))
+    if recipe_id is not None and value is not None:
+        Recipe.apply_rating_delta(recipe_id, -value, -1)
+
+
+@receiver(post_save, sender=RecipeImage)
+@receiver(post_delete, sender=RecipeImage)
+def recipe_image_changed(sender, instance, **kwargs):
+    # Сохранения и удаления из формсетов recipe_create/recipe_edit и из админки
+    # проходят через эти сигналы. Обработчики search.signals подключаются позже
+    # (приложение search ниже в INSTALLED_APPS), так что поколение кешей поиска
+    # сменится уже после обновления полей
+    Recipe.sync_images(instance.recipe_id)
+
+
+@receiver(post_save, sender=RecipeImage)
+def recipe_image_saved(sender, instance, **kwargs):
+    # Миниатюры и WebP строятся в фоне — формсеты не ждут кодирования
+    derivatives.schedule(instance.image.name, "recipe")
+
+
+@receiver(post_delete, sender=RecipeImage)
+def recipe_image_deleted(sender, instance, **kwargs):
+    name = instance.image.name
+    if name:
+        transaction.on_commit(lambda: derivatives.delete(name, "recipe"))
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+def recipe_ingredient_changed(sender, instance, **kwargs):
+    # Ингредиенты входят в закешированное тело страницы рецепта (см. recipes.fragments)
+    Recipe.touch(instance.recipe_id)
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_saved(sender, instance, created=False, **kwargs):
+    # Название ингредиента входит в закешированное тело страниц рецептов с ним
+    if not created:
+        Recipe.objects.filter(
+            pk__in=RecipeIngredient.objects.filter(ingredient=instance).values("recipe_id")
+        ).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created=False, **kwargs):
+    if created:
+        Recipe.apply_counter_delta(instance.recipe_id, "comment_count", 1)
+    # Закешированный блок комментариев устаревает и при правке текста
+    bump_generation(comments_generation_name(instance.recipe_id))
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    # Как и у оценок, приходит и при каскадном удалении рецепта или пользователя
+    Recipe.apply_counter_delta(instance.recipe_id, "comment_count", -1)
+    bump_generation(comments_generation_name(instance.recipe_id))
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    # Поколение комментариев удалённого рецепта больше не понадобится
+    forget_generation(comments_generation_name(instance.pk))
@@ -0,0 +1,44 @@
+"""Тег ``{% fragment_cache %}`` — версионированный кеш фрагмента со статистикой.
+
+Как встроенный ``{% cache %}``, но без таймаута в шаблоне (актуальность
+задаёт версия) и с подсчётом попаданий и промахов (см. recipes.fragments)::
+
+    {% load recipe_fragments %}
+    {% fragment_cache "recipe_body" recipe.pk recipe.updated_at %}
+        … ингредиенты, инструкция, галерея …
+    {% endfragment_cache %}
+    {% fragment_cache "recipe_comments" recipe.pk comments_generation comments_page.number %}
+        … комментарии …
+    {% endfragment_cache %}
+"""
+from django import template
+
+from recipes import fragments
+
+register = template.Library()
+
+
+class FragmentCacheNode(template.Node):
+    def __init__(self, nodelist, name, vary_on):
+        self.nodelist = nodelist
+        self.name = name
+        self.vary_on = vary_on
+
+    def render(self, context):
+        name = self.name.resolve(context)
+        vary_on = [value.resolve(context) for value in self.vary_on]
+        return fragments.get_or_render(name, vary_on, lambda: self.nodelist.render(context))
+
+
+@register.tag("fragment_cache")
+def do_fragment_cache(parser, token):
+    nodelist = parser.parse(("endfragment_cache",))
+    parser.delete_first_token()
+    bits = token.split_contents()
+    if len(bits) < 3:
+        raise template.TemplateSyntaxError(
+            f"'{bits[0]}' ожидает имя фрагмента и хотя бы одно значение версии"
+        )
+    return FragmentCacheNode(
+        nodelist, parser.compile_filter(bits[1]), [parser.compile_filter(bit) for bit in bits[2:]],
+    )
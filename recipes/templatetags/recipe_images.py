@@ -0,0 +1,47 @@
+"""Тег ``{% responsive_image %}`` — изображение с ``srcset`` из готовых копий.
+
+::
+
+    {% load recipe_images %}
+    {% responsive_image recipe.cover_image sizes="(max-width: 600px) 100vw, 320px" alt=recipe.title %}
+    {% responsive_image user.avatar preset="avatar" sizes="64px" %}
+
+Выводит ``<picture>`` с WebP-источником и JPEG-запасным вариантом
+(см. recipes.derivatives). Пока копии не построены — обычный ``<img>``
+с оригиналом.
+"""
+from django import template
+from django.core.files.storage import default_storage
+from django.utils.html import format_html
+
+from recipes.derivatives import PRESETS, derivative_name, is_ready
+
+register = template.Library()
+
+
+def _srcset(name, preset, image_format):
+    return ", ".join(
+        f"{default_storage.url(derivative_name(name, width, image_format))} {width}w"
+        for width in PRESETS[preset]
+    )
+
+
+@register.simple_tag
+def responsive_image(image, preset="recipe", sizes="100vw", alt="", css_class=""):
+    # Принимает FieldFile или имя файла в хранилище (например, Recipe.cover_image)
+    name = getattr(image, "name", image)
+    if not name:
+        return ""
+    if not is_ready(name, preset):
+        return format_html(
+            '<img src="{}" alt="{}" class="{}" loading="lazy" decoding="async">',
+            default_storage.url(name), alt, css_class,
+        )
+    widths = PRESETS[preset]
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" alt="{}" class="{}" loading="lazy" decoding="async"></picture>',
+        _srcset(name, preset, "WEBP"), sizes,
+        default_storage.url(derivative_name(name, widths[len(widths) // 2], "JPEG")),
+        _srcset(name, preset, "JPEG"), sizes, alt, css_class,
+    )
@@ -1,3 +1,1007 @@
-from django.test import TestCase
+import datetime
+import json
+import shutil
+import tempfile
+from decimal import Decimal
+from fractions import Fraction
+from io import BytesIO, StringIO
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.template import Context, Template
+from django.test import TestCase, override_settings
+from PIL import Image
+from django.urls import reverse
+from django.utils import timezone
+
+from collections_app.models import Collection, CollectionItem
+from search.filters import filter_recipes, parse_params
+from users.models import User
+from . import derivatives
+from .cache import DEFAULT_GENERATION, RECIPES, bump_generation, get_generation
+from .fragments import RECIPE_BODY, RECIPE_COMMENTS, comments_generation_name, reset_stats, stats
+from .pagination import NEXT, KeysetPaginator, encode_cursor, keyset_ordering
+from .scaling import scale_amount, scale_recipes
+from .shopping import for_collection
+from .models import (
+    Category, Comment, Generation, Ingredient, Rating, Recipe, RecipeImage, RecipeIngredient,
+    rating_from_totals,
+)
+
+# База откатывается между тестами, а индексы в памяти общие на процесс —
+# они должны сверять поколение на каждом обращении
+_index_settings = override_settings(SEARCH_INDEX_CHECK_INTERVAL=0)
+
+
+def setUpModule():
+    _index_settings.enable()
+
+
+def tearDownModule():
+    _index_settings.disable()
+
+
+# Карточка рецепта — всё, что списки показывают о рецепте
+CARD = (
+    "{{ recipe.title }} {{ recipe.description|truncatechars:100 }} {{ recipe.author }} "
+    "{{ recipe.category }} {{ recipe.get_difficulty_display }} {{ recipe.cook_time }} "
+    "{{ recipe.rating }} ({{ recipe.rating_count }}) {{ recipe.comment_count }} "
+    "{{ recipe.cover_url|default:'' }}\n"
+)
+RECIPE_CARDS = "{% for recipe in recipes %}" + CARD + "{% endfor %}"
+CARD_TEMPLATES = [{
+    "BACKEND": "django.template.backends.django.DjangoTemplates",
+    "OPTIONS": {
+        "loaders": [("django.template.loaders.locmem.Loader", {
+            "main/home.html": RECIPE_CARDS,
+            "recipes/recipe_list.html": RECIPE_CARDS,
+            "recipes/my_recipes.html": RECIPE_CARDS,
+            "search/results.html": RECIPE_CARDS,
+            "recipes/category_list.html": "{% for category in categories %}{{ category.name }}\n{% endfor %}",
+            "recipes/recipe_detail.html": "{{ recipe.title }} {{ recipe.rating_count }}",
+            "collections/collection_detail.html": (
+                "{% for item in items %}{% with recipe=item.recipe %}" + CARD + "{% endwith %}{% endfor %}"
+            ),
+        })],
+    },
+}]
+
+DETAIL_TEMPLATES = [{
+    "BACKEND": "django.template.backends.django.DjangoTemplates",
+    "OPTIONS": {
+        "loaders": [("django.template.loaders.locmem.Loader", {
+            "recipes/recipe_detail.html": (
+                "{% load recipe_fragments %}{{ recipe.title }} {{ recipe.author }} {{ recipe.category }}"
+                "{% fragment_cache 'recipe_body' recipe.pk recipe.updated_at %}"
+                "{% for item in ingredients %}{{ item.ingredient }} {{ item.amount }}\n{% endfor %}"
+                "{{ recipe.instruction }}{% for image in images %}{{ image.image.url }}{% endfor %}"
+                "{% endfragment_cache %}"
+                "{% fragment_cache 'recipe_comments' recipe.pk comments_generation comments_page.number %}"
+                "{% for comment in comments %}{{ comment.user }}: {{ comment.text }}\n{% endfor %}"
+                "{{ comments_page.number }}/{{ comments_page.paginator.num_pages }}"
+                "{% endfragment_cache %}"
+                "{% for c in collections %}{{ c.obj.title }}={{ c.in_collection }}\n{% endfor %}"
+                "{% for similar in similar_recipes %}" + CARD + "{% endfor %}"
+            ),
+        })],
+    },
+}]
+
+
+# Чтение и сохранение сессии (SESSION_SAVE_EVERY_REQUEST): SELECT, SAVEPOINT, UPDATE, RELEASE
+SESSION_QUERIES = 4
+
+
+@override_settings(TEMPLATES=CARD_TEMPLATES)
+class CardQueryCountTests(TestCase):
+    """Списки рецептов делают фиксированное число запросов при любом размере страницы."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("author", password="pass", first_name="Анна")
+        cls.readers = [User.objects.create_user(f"reader{i}", password="pass") for i in range(3)]
+        cls.category = Category.objects.create(name="Soups", slug="soups")
+        cls.collection = Collection.objects.create(owner=cls.user, title="Избранное")
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def add_recipes(self, count):
+        for number in range(count):
+            recipe = Recipe.objects.create(
+                author=self.user, title=f"Суп {number}", description="Описание " * 30,
+                instruction="Варить", cook_time=30, category=self.category,
+                cover_image=f"recipe_images/{number}.jpg", image_count=1,
+            )
+            for reader in self.readers:
+                Comment.objects.create(recipe=recipe, user=reader, text="Вкусно")
+                Rating.objects.create(recipe=recipe, user=reader, value=5)
+            CollectionItem.objects.create(collection=self.collection, recipe=recipe)
+
+    def assertQueriesIndependentOfPageSize(self, url, expected, params=None):
+        for count in (3, 9):
+            self.add_recipes(count)
+            # Первый запрос прогревает структуры, которые строятся раз на процесс
+            # (статистика индекса, словарь подсказок) — они не зависят от страницы
+            self.client.get(url, params)
+            with self.subTest(recipes=Recipe.objects.count()), self.assertNumQueries(expected):
+                response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+
+    def test_home(self):
+        self.assertQueriesIndependentOfPageSize(reverse("home"), SESSION_QUERIES + 1)
+
+    def test_recipe_list(self):
+        # COUNT для пагинатора и сама страница
+        self.assertQueriesIndependentOfPageSize(reverse("recipe_list"), SESSION_QUERIES + 2)
+
+    def test_recipe_list_cursor(self):
+        self.assertQueriesIndependentOfPageSize(reverse("recipe_list"), SESSION_QUERIES + 1, {"cursor": ""})
+
+    def test_my_recipes(self):
+        # пользователь, COUNT и страница
+        self.assertQueriesIndependentOfPageSize(reverse("my_recipes"), SESSION_QUERIES + 3)
+
+    def test_search(self):
+        # частоты слов запроса для BM25, страница, категории и фасеты (id результатов — из кеша)
+        # + поколение данных для ключа кеша результатов
+        self.assertQueriesIndependentOfPageSize(reverse("search"), SESSION_QUERIES + 5, {"q": "суп"})
+
+    def test_collection_detail(self):
+        self.assertQueriesIndependentOfPageSize(
+            # пользователь, коллекция, её элементы и их рецепты
+            reverse("collection_detail", args=[self.collection.pk]), SESSION_QUERIES + 4,
+        )
+
+    def test_card_counters(self):
+        self.add_recipes(2)
+        recipe = Recipe.objects.for_cards().first()
+        self.assertEqual(recipe.comment_count, len(self.readers))
+        self.assertEqual(recipe.rating_count, len(self.readers))
+        self.assertEqual(recipe.collection_count, 1)
+        self.assertEqual(recipe.cover_url, "/media/recipe_images/1.jpg")
+
+
+@override_settings(TEMPLATES=DETAIL_TEMPLATES)
+class RecipeDetailQueryCountTests(TestCase):
+    """Страница рецепта не зависит по числу запросов от коллекций и комментариев."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("author", password="pass")
+        cls.recipe = Recipe.objects.create(
+            author=cls.user, title="Борщ", instruction="Варить", cook_time=60,
+            category=Category.objects.create(name="Супы", slug="soups"),
+        )
+        for name in ("Свёкла", "Капуста"):
+            RecipeIngredient.objects.create(
+                recipe=cls.recipe, ingredient=Ingredient.objects.create(name=name), amount=1,
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def add_engagement(self, count):
+        offset = Comment.objects.count()
+        for number in range(offset, offset + count):
+            reader = User.objects.create_user(f"reader{number}", password="pass")
+            Comment.objects.create(recipe=self.recipe, user=reader, text="Вкусно")
+            collection = Collection.objects.create(owner=self.user, title=f"Коллекция {number}")
+            if number % 2:
+                CollectionItem.objects.create(collection=collection, recipe=self.recipe)
+
+    def test_query_budget(self):
+        url = reverse("recipe_detail", args=[self.recipe.pk])
+        for count in (3, 30):
+            self.add_engagement(count)
+            self.client.get(url)  # прогрев индекса похожих рецептов
+            # новые версии фрагментов — как после правки рецепта и нового комментария
+            Recipe.touch(self.recipe.pk)
+            bump_generation(comments_generation_name(self.recipe.pk))
+            # пользователь, рецепт, ингредиенты, изображения, COUNT и страница комментариев, коллекции
+            # и поколения комментариев и индекса похожих рецептов
+            with self.subTest(count=count, cached=False), self.assertNumQueries(SESSION_QUERIES + 9):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            # из кеша: ингредиенты, изображения и страница комментариев не запрашиваются
+            with self.subTest(count=count, cached=True), self.assertNumQueries(SESSION_QUERIES + 6):
+                self.client.get(url)
+
+    def test_fragments_follow_versions(self):
+        url = reverse("recipe_detail", args=[self.recipe.pk])
+        reset_stats()
+        self.client.get(url)
+        self.client.get(url)
+        self.assertEqual(stats()[RECIPE_BODY], {"hits": 1, "misses": 1, "hit_ratio": 0.5})
+
+        comment = Comment.objects.create(recipe=self.recipe, user=self.user, text="Вкусно")
+        self.assertContains(self.client.get(url), "author: Вкусно")
+        comment.text = "Очень вкусно"
+        comment.save()
+        self.assertContains(self.client.get(url), "author: Очень вкусно")
+
+        RecipeIngredient.objects.get(recipe=self.recipe, ingredient__name="Капуста").delete()
+        self.assertNotContains(self.client.get(url), "Капуста")
+        self.recipe.instruction = "Тушить"
+        self.recipe.save()
+        self.assertContains(self.client.get(url), "Тушить")
+
+        beet = Ingredient.objects.get(name="Свёкла")
+        beet.name = "Буряк"
+        beet.save()
+        response = self.client.get(url)
+        self.assertContains(response, "Буряк")
+        self.assertNotContains(response, "Свёкла")
+        self.assertEqual(stats()[RECIPE_BODY]["misses"], 4)
+        self.assertEqual(stats()[RECIPE_COMMENTS]["misses"], 3)
+
+        out = StringIO()
+        call_command("fragment_cache_stats", "--reset", stdout=out)
+        self.assertIn("recipe_body: попаданий", out.getvalue())
+        self.assertEqual(stats()[RECIPE_BODY]["hit_ratio"], None)
+
+    def test_membership_and_comment_pages(self):
+        self.add_engagement(25)
+        url = reverse("recipe_detail", args=[self.recipe.pk])
+        response = self.client.get(url)
+        flags = [c["in_collection"] for c in response.context["collections"]]
+        self.assertEqual(flags.count(True), 12)
+        self.assertEqual(len(flags), 25)
+        self.assertEqual(len(response.context["comments"]), 20)
+        response = self.client.get(url, {"comments_page": 2})
+        self.assertEqual(len(response.context["comments"]), 5)
+
+
+@override_settings(TEMPLATES=CARD_TEMPLATES)
+class AnonymousPageCacheTests(TestCase):
+    """Гостям — ETag, 304 и кеш страницы; персональные ответы не кешируются."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("author", password="pass")
+        cls.category = Category.objects.create(name="Супы", slug="soups")
+        cls.recipe = Recipe.objects.create(
+            author=cls.user, title="Борщ", instruction="Варить", cook_time=60, category=cls.category,
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_pages(self):
+        urls = [
+            reverse("home"), reverse("recipe_list"), reverse("category_list"),
+            reverse("recipe_detail", args=[self.recipe.pk]),
+        ]
+        for url in urls:
+            with self.subTest(url):
+                first = self.client.get(url)
+                self.assertEqual(first.status_code, 200)
+                self.assertIn("Cookie", first["Vary"])
+                # единственный запрос — поколение данных для ETag (по первичному ключу)
+                with self.assertNumQueries(1):
+                    cached = self.client.get(url)
+                self.assertEqual(cached.content, first.content)
+                self.assertEqual(cached["ETag"], first["ETag"])
+                with self.assertNumQueries(1):
+                    not_modified = self.client.get(url, headers={"if-none-match": first["ETag"]})
+                self.assertEqual(not_modified.status_code, 304)
+
+    def test_changes_change_etag(self):
+        url = reverse("recipe_detail", args=[self.recipe.pk])
+        etag = self.client.get(url)["ETag"]
+        # оценка не двигает updated_at, но страница должна обновиться
+        Rating.objects.create(recipe=self.recipe, user=self.user, value=5)
+        response = self.client.get(url, headers={"if-none-match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Борщ 1")
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_logged_in_is_not_cached(self):
+        self.client.force_login(self.user)
+        url = reverse("home")
+        response = self.client.get(url)
+        self.assertFalse(response.has_header("ETag"))
+        with self.assertNumQueries(SESSION_QUERIES + 1):
+            self.client.get(url)
+
+    @override_settings(TEMPLATES=[{
+        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        "OPTIONS": {
+            "loaders": [("django.template.loaders.locmem.Loader", {
+                "recipes/category_list.html": "<form method='post'>{% csrf_token %}</form>",
+            })],
+        },
+    }])
+    def test_csrf_pages_are_not_cached(self):
+        url = reverse("category_list")
+        response = self.client.get(url)
+        self.assertFalse(response.has_header("ETag"))
+        self.client.cookies.clear()
+        with self.assertNumQueries(2):  # поколение и COUNT пагинатора — страница отрендерена заново
+            self.client.get(url)
+
+
+class RatingAggregateTests(TestCase):
+    """Оценки сдвигают агрегаты рецепта UPDATE'ом — результат совпадает с полным пересчётом."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user("author", password="pass")
+        cls.voters = [User.objects.create_user(f"voter{i}", password="pass") for i in range(8)]
+        cls.recipe = Recipe.objects.create(author=cls.author, title="Борщ", instruction="Варить", cook_time=60)
+
+    def stored(self):
+        return Recipe.objects.filter(pk=self.recipe.pk).values_list("rating_sum", "rating_count", "rating").get()
+
+    def test_incremental_matches_recompute(self):
+        # 1.13 = 113/100: умножение на 0.01 в SQL оставляло 1.1300000000000001
+        for count in range(1, 9):
+            for total in range(count, 5 * count + 1):
+                with self.subTest(total=total, count=count):
+                    Recipe.objects.filter(pk=self.recipe.pk).update(rating_sum=0, rating_count=0, rating=0)
+                    Recipe.apply_rating_delta(self.recipe.pk, total, count)
+                    expected = rating_from_totals(total, count)
+                    self.assertEqual(self.stored(), (total, count, expected))
+                    self.assertTrue(Recipe.objects.filter(pk=self.recipe.pk, rating=expected).exists())
+
+    def test_votes(self):
+        values = [1, 1, 1, 1, 2, 1, 1, 2]
+        ratings = [
+            Rating.objects.create(recipe=self.recipe, user=voter, value=value)
+            for voter, value in zip(self.voters, values)
+        ]
+        ratings[0].value = 5
+        ratings[0].save()
+        ratings[1].delete()
+        incremental = self.stored()
+        self.assertEqual(incremental, (13, 7, Decimal("1.86")))
+
+        self.recipe.refresh_from_db()
+        self.recipe.update_rating()
+        self.assertEqual(self.stored(), incremental)
+        self.assertEqual(Recipe.objects.filter(rating=Decimal("1.86")).count(), 1)
+
+        Rating.objects.filter(recipe=self.recipe).delete()
+        self.assertEqual(self.stored(), (0, 0, Decimal("0.00")))
+
+
+class RebuildRatingsTests(TestCase):
+    """rebuild_ratings находит расхождения одним запросом и пишет только изменившиеся рецепты."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user("author", password="pass")
+        voters = [User.objects.create_user(f"voter{i}", password="pass") for i in range(3)]
+        cls.recipes = [
+            Recipe.objects.create(author=author, title=title, instruction="Готовить", cook_time=30)
+            for title in ("Борщ", "Щи", "Уха")
+        ]
+        for recipe, values in zip(cls.recipes, ([5, 4, 4], [3], [])):
+            for voter, value in zip(voters, values):
+                Rating.objects.create(recipe=recipe, user=voter, value=value)
+        # Щи оценили давно
+        Rating.objects.filter(recipe=cls.recipes[1]).update(created_at=datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc))
+
+    def stored(self):
+        return list(Recipe.objects.order_by("pk").values_list("rating_sum", "rating_count", "rating"))
+
+    def rebuild(self, *args):
+        out = StringIO()
+        call_command("rebuild_ratings", *args, stdout=out)
+        return out.getvalue()
+
+    def test_repairs_drift(self):
+        expected = self.stored()
+        self.assertEqual(expected[0], (13, 3, Decimal("4.33")))
+        Recipe.objects.update(rating_sum=1, rating_count=1, rating=1)
+        generation = get_generation(RECIPES)
+
+        output = self.rebuild("--chunk-size", "2")
+        self.assertIn("нужно обновить: 3", output)
+        self.assertIn("2/3", output)
+        self.assertEqual(self.stored(), expected)
+        self.assertGreater(get_generation(RECIPES), generation)
+        self.assertIn("нужно обновить: 0", self.rebuild())
+
+    def test_since(self):
+        Recipe.objects.update(rating_sum=1, rating_count=1, rating=1)
+        self.rebuild("--since", (timezone.now() - datetime.timedelta(days=1)).date().isoformat())
+        self.assertEqual(self.stored()[:2], [(13, 3, Decimal("4.33")), (1, 1, Decimal("1.00"))])
+        self.rebuild("--since", "2019-12-31T12:00")
+        self.assertEqual(self.stored()[1], (3, 1, Decimal("3.00")))
+        with self.assertRaises(CommandError):
+            self.rebuild("--since", "вчера")
+
+
+class GenerationTests(TestCase):
+    """Поколения растут атомарно в базе, не сбрасываются вместе с кешем и не пишутся при чтении."""
+
+    def test_bump(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(get_generation("test"), DEFAULT_GENERATION)
+        self.assertFalse(Generation.objects.exists())
+        first = bump_generation("test")
+        self.assertGreater(first, DEFAULT_GENERATION)
+        self.assertEqual([bump_generation("test") for _ in range(3)], [first + 1, first + 2, first + 3])
+        cache.clear()
+        self.assertEqual(get_generation("test"), first + 3)
+
+    def test_new_generation_does_not_repeat(self):
+        issued = bump_generation("test")
+        Generation.objects.filter(name="test").delete()
+        self.assertEqual(get_generation("test"), DEFAULT_GENERATION)
+        self.assertGreater(bump_generation("test"), issued)
+
+    @override_settings(TEMPLATES=DETAIL_TEMPLATES)
+    def test_reads_do_not_write(self):
+        author = User.objects.create_user("author", password="pass")
+        recipe = Recipe.objects.create(author=author, title="Борщ", instruction="Варить", cook_time=60)
+        rows = set(Generation.objects.values_list("name", flat=True))
+        self.client.get(reverse("recipe_detail", args=[recipe.pk]))
+        self.assertEqual(set(Generation.objects.values_list("name", flat=True)), rows)
+
+        Comment.objects.create(recipe=recipe, user=author, text="Вкусно")
+        self.assertTrue(Generation.objects.filter(name=comments_generation_name(recipe.pk)).exists())
+        recipe.delete()
+        self.assertFalse(Generation.objects.filter(name=comments_generation_name(recipe.pk)).exists())
+
+
+class KeysetPaginatorTests(TestCase):
+    """Курсор проходит все записи ровно по разу — вперёд и назад, в том числе на ничьих."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user("author", password="pass")
+        # Рейтинги с ничьими; 113/100 и 226/200 — оба 1.13, записанные UPDATE'ом
+        totals = [(113, 100), (226, 200), (5, 1), (0, 0), (9, 2), (5, 1), (113, 100), (0, 0), (18, 4), (3, 1), (5, 1)]
+        for number, (total, count) in enumerate(totals):
+            recipe = Recipe.objects.create(
+                author=author, title=f"Рецепт {number}", instruction="Готовить", cook_time=10 + number % 3,
+            )
+            Recipe.apply_rating_delta(recipe.pk, total, count)
+
+    def walk(self, ordering, per_page=3):
+        paginator = KeysetPaginator(Recipe.objects.with_popularity(), per_page, ordering)
+        # Страниц не больше, чем записей: иначе курсор зациклился на ничьей
+        limit = Recipe.objects.count()
+        pages = [paginator.page()]
+        while pages[-1].has_next() and len(pages) <= limit:
+            pages.append(paginator.page(pages[-1].next_cursor))
+        forward = [[recipe.pk for recipe in page] for page in pages]
+
+        backward = [forward[-1]]
+        page = pages[-1]
+        while page.has_previous() and len(backward) <= limit:
+            page = paginator.page(page.previous_cursor)
+            backward.insert(0, [recipe.pk for recipe in page])
+        return forward, backward
+
+    def test_orderings(self):
+        for order_field in ("-rating", "rating", "-created_at", "cook_time", "-popularity"):
+            ordering = keyset_ordering(order_field)
+            expected = list(Recipe.objects.with_popularity().order_by(*ordering).values_list("pk", flat=True))
+            for per_page in (1, 3, 4):
+                with self.subTest(ordering=order_field, per_page=per_page):
+                    forward, backward = self.walk(ordering, per_page)
+                    self.assertEqual(sum(forward, []), expected)
+                    self.assertEqual(backward, forward)
+
+    def test_broken_cursor_gives_first_page(self):
+        paginator = KeysetPaginator(Recipe.objects.all(), 3, keyset_ordering("-rating"))
+        first = [recipe.pk for recipe in paginator.page()]
+        for cursor in ("garbage", encode_cursor(NEXT, ["x"]), encode_cursor(NEXT, [1, 2, 3])):
+            with self.subTest(cursor=cursor):
+                self.assertEqual([recipe.pk for recipe in paginator.page(cursor)], first)
+
+
+class EngagementCounterTests(TestCase):
+    """Счётчики комментариев и коллекций сдвигаются при создании и удалении строк."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("author", password="pass")
+        cls.reader = User.objects.create_user("reader", password="pass")
+        cls.recipe = Recipe.objects.create(
+            author=cls.user, title="Борщ", instruction="Варить", cook_time=60,
+        )
+        cls.other = Recipe.objects.create(
+            author=cls.user, title="Щи", instruction="Варить", cook_time=40,
+        )
+        cls.collection = Collection.objects.create(owner=cls.reader, title="Супы")
+
+    def setUp(self):
+        cache.clear()
+
+    def counters(self, recipe=None):
+        recipe = recipe or self.recipe
+        return tuple(Recipe.objects.filter(pk=recipe.pk).values_list("comment_count", "collection_count").get())
+
+    def test_comments(self):
+        first = Comment.objects.create(recipe=self.recipe, user=self.reader, text="Вкусно")
+        Comment.objects.create(recipe=self.recipe, user=self.user, text="Спасибо")
+        first.text = "Очень вкусно"
+        first.save()
+        self.assertEqual(self.counters(), (2, 0))
+        first.delete()
+        self.assertEqual(self.counters(), (1, 0))
+        self.user.delete()  # каскадом — и оставшийся комментарий
+        self.assertFalse(Comment.objects.exists())
+
+    def test_toggle_and_api(self):
+        self.client.force_login(self.reader)
+        toggle = reverse("toggle_recipe_in_collection", args=[self.collection.pk, self.recipe.pk])
+        self.client.post(toggle)
+        self.assertEqual(self.counters(), (0, 1))
+        self.client.post(toggle)
+        self.assertEqual(self.counters(), (0, 0))
+
+        payload = {"collection_id": self.collection.pk, "recipe_id": self.recipe.pk}
+        for _ in range(2):  # повторное добавление счётчик не сдвигает
+            self.client.post(reverse("api_add_recipe_to_collection"), payload, content_type="application/json")
+        self.assertEqual(self.counters(), (0, 1))
+        self.client.post(reverse("api_remove_recipe_from_collection"), payload, content_type="application/json")
+        self.assertEqual(self.counters(), (0, 0))
+
+    def test_collection_delete_cascades(self):
+        CollectionItem.objects.create(collection=self.collection, recipe=self.recipe)
+        CollectionItem.objects.create(collection=self.collection, recipe=self.other)
+        self.collection.delete()
+        self.assertEqual(self.counters(), (0, 0))
+        self.assertEqual(self.counters(self.other), (0, 0))
+
+    def test_drifted_counter_does_not_go_negative(self):
+        comment = Comment.objects.create(recipe=self.recipe, user=self.reader, text="Вкусно")
+        Recipe.objects.filter(pk=self.recipe.pk).update(comment_count=0)
+        comment.delete()
+        self.assertEqual(self.counters(), (0, 0))
+
+    def test_reconcile_counters(self):
+        Comment.objects.create(recipe=self.recipe, user=self.reader, text="Вкусно")
+        CollectionItem.objects.create(collection=self.collection, recipe=self.other)
+        Rating.objects.create(recipe=self.other, user=self.reader, value=4)
+        Recipe.objects.update(comment_count=5, collection_count=0, rating_count=0)
+
+        out = StringIO()
+        call_command("reconcile_counters", stdout=out)
+        self.assertIn("счётчиков 2", out.getvalue())
+        self.assertEqual(self.counters(), (5, 0))
+
+        call_command("reconcile_counters", "--fix", stdout=out)
+        self.assertEqual(self.counters(), (1, 0))
+        self.assertEqual(self.counters(self.other), (0, 1))
+        self.assertEqual(Recipe.objects.get(pk=self.other.pk).rating_count, 1)
+        out = StringIO()
+        call_command("reconcile_counters", stdout=out)
+        self.assertIn("Расхождений нет", out.getvalue())
+
+    def test_popular_sort(self):
+        Comment.objects.create(recipe=self.recipe, user=self.reader, text="Вкусно")
+        CollectionItem.objects.create(collection=self.collection, recipe=self.other)
+        ordered = Recipe.objects.with_popularity().order_by("-popularity", "-id")
+        self.assertEqual([(r.pk, r.popularity) for r in ordered], [(self.other.pk, 3), (self.recipe.pk, 1)])
+
+
+class ApiSearchTests(TestCase):
+    """API поиска: обычный JSON-ответ и поток NDJSON."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("author", password="pass")
+        wheat = Ingredient.objects.create(name="Мука пшеничная")
+        rye = Ingredient.objects.create(name="Мука ржаная")
+        salt = Ingredient.objects.create(name="Соль")
+        cls.bread = Recipe.objects.create(author=cls.user, title="Хлеб", instruction="Печь", cook_time=90)
+        cls.soup = Recipe.objects.create(author=cls.user, title="Суп", instruction="Варить", cook_time=30)
+        for recipe, ingredient in ((cls.bread, wheat), (cls.bread, rye), (cls.bread, salt), (cls.soup, salt)):
+            RecipeIngredient.objects.create(recipe=recipe, ingredient=ingredient, amount=1, unit="г")
+
+    def setUp(self):
+        cache.clear()
+
+    def search(self, stream=False, **data):
+        url = reverse("api_search_recipes") + ("?stream=1" if stream else "")
+        return self.client.post(url, data, content_type="application/json")
+
+    def streamed_ids(self, response):
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        return [json.loads(line)["id"] for line in lines]
+
+    def test_ingredient_filters_do_not_repeat_recipes(self):
+        # У хлеба под «Мука» подходят два ингредиента — рецепт всё равно один раз
+        response = self.search(ingredient_name="Мука")
+        self.assertEqual([recipe["id"] for recipe in response.json()["recipes"]], [self.bread.pk])
+        self.assertEqual(self.streamed_ids(self.search(stream=True, ingredient_name="Мука")), [self.bread.pk])
+        salt = Ingredient.objects.get(name="Соль")
+        ids = self.streamed_ids(self.search(stream=True, ingredient=salt.pk, limit=2))
+        self.assertEqual(ids, [self.soup.pk, self.bread.pk])
+
+    def test_stream(self):
+        response = self.search(stream=True)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        self.assertEqual(self.streamed_ids(response), [self.soup.pk, self.bread.pk])
+        self.assertEqual(self.streamed_ids(self.search(stream=True, limit=1)), [self.soup.pk])
+        self.assertEqual(self.streamed_ids(self.search(stream=True, query="пирог")), [])
+        # Заголовок Accept включает поток так же, как ?stream=1
+        response = self.client.post(
+            reverse("api_search_recipes"), {}, content_type="application/json",
+            headers={"accept": "application/x-ndjson"},
+        )
+        self.assertTrue(response.streaming)
+
+    def test_stream_rejects_bad_limit(self):
+        for limit in (-1, 0, "abc", True):
+            with self.subTest(limit=limit):
+                response = self.search(stream=True, limit=limit)
+                self.assertEqual(response.status_code, 400)
+                self.assertFalse(response.streaming)
+                self.assertFalse(response.json()["success"])
+
+    def test_stream_query_errors_are_json(self):
+        # Ошибка базы должна прийти до начала потока, как в обычном режиме
+        for stream in (False, True):
+            with self.subTest(stream=stream):
+                response = self.search(stream=stream, ingredient_name="(")
+                self.assertFalse(response.streaming)
+                self.assertFalse(response.json()["success"])
+
+
+class CreateIngredientApiTests(TestCase):
+    """Дубликат ингредиента определяет база; индекс в памяти даёт только подсказки."""
+
+    @classmethod
+    def setUpTestData(cls):
+        # Индекс в памяти узнаёт об ингредиентах после фиксации транзакции
+        with cls.captureOnCommitCallbacks(execute=True):
+            cls.carrot = Ingredient.objects.create(name="Морковь")
+
+    def setUp(self):
+        cache.clear()
+
+    def create(self, name, **data):
+        return self.client.post(
+            reverse("api_create_ingredient"), {"name": name, **data}, content_type="application/json",
+        ).json()
+
+    def test_exact_duplicate(self):
+        response = self.create("Морковь")
+        self.assertEqual(response["error"], "Ингредиент с таким названием уже существует")
+
+    def test_duplicate_missing_from_index(self):
+        # bulk_create проходит мимо сигналов — индекс этого процесса о луке не знает
+        self.create("Свёкла")
+        Ingredient.objects.bulk_create([Ingredient(name="Лук")])
+        response = self.create("Лук")
+        self.assertEqual(response["error"], "Ингредиент с таким названием уже существует")
+        self.assertEqual(Ingredient.objects.filter(name="Лук").count(), 1)
+
+    def test_same_name_in_other_case_is_duplicate(self):
+        # iexact в SQLite не сравнивает регистр кириллицы — дубликат ловит индекс
+        for name in ("морковь", "МОРКОВЬ"):
+            with self.subTest(name=name):
+                response = self.create(name, force=True)
+                self.assertEqual(response["error"], "Ингредиент с таким названием уже существует")
+                self.assertNotIn("can_force", response)
+        self.assertEqual(Ingredient.objects.count(), 1)
+
+    def test_similar_names_are_hints(self):
+        response = self.create("Моркофь")
+        self.assertFalse(response["success"])
+        self.assertTrue(response["can_force"])
+        self.assertEqual(response["similar"], ["Морковь"])
+        self.assertEqual(Ingredient.objects.count(), 1)
+
+    def test_force_creates_similar_name(self):
+        # «Сок» и «Соя» различаются одной буквой, но это разные ингредиенты
+        with self.captureOnCommitCallbacks(execute=True):
+            Ingredient.objects.create(name="Соя")
+        self.assertEqual(self.create("Сок")["similar"], ["Соя"])
+        response = self.create("Сок", force=True)
+        self.assertTrue(response["success"])
+        self.assertEqual(response["ingredient"]["name"], "Сок")
+        self.assertTrue(Ingredient.objects.filter(name="Сок").exists())
+
+    def test_hints_skip_deleted_ingredients(self):
+        self.create("Свёкла")  # индекс загружен
+        # Удаление мимо ORM: индекс в памяти по-прежнему помнит морковь
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {Ingredient._meta.db_table} WHERE id = %s", [self.carrot.pk])
+        response = self.create("Моркофь")
+        self.assertTrue(response["success"])
+
+    def test_created(self):
+        response = self.create("Петрушка")
+        self.assertTrue(response["success"])
+        self.assertEqual(response["ingredient"]["name"], "Петрушка")
+
+
+class PantryApiTests(TestCase):
+    """«Что приготовить»: оценка по индексу в памяти, недостающие ингредиенты по названиям."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user("author", password="pass")
+        with cls.captureOnCommitCallbacks(execute=True):
+            cls.egg, cls.milk, cls.flour, cls.sugar = (
+                Ingredient.objects.create(name=name) for name in ("Яйцо", "Молоко", "Мука", "Сахар")
+            )
+        cls.omelette = cls.create_recipe(author, "Омлет", [cls.egg, cls.milk])
+        cls.pancakes = cls.create_recipe(author, "Блины", [cls.egg, cls.milk, cls.flour, cls.sugar])
+        cls.cake = cls.create_recipe(author, "Бисквит", [cls.egg, cls.flour, cls.sugar])
+
+    @classmethod
+    def create_recipe(cls, author, title, ingredients):
+        with cls.captureOnCommitCallbacks(execute=True):
+            recipe = Recipe.objects.create(
+                author=author, title=title, description="", instruction="Готовить", cook_time=20,
+            )
+            for ingredient in ingredients:
+                RecipeIngredient.objects.create(recipe=recipe, ingredient=ingredient, amount=1, unit="шт")
+        return recipe
+
+    def search(self, **data):
+        return self.client.post(reverse("api_pantry_search"), data, content_type="application/json").json()
+
+    def test_ranked_by_coverage(self):
+        response = self.search(ingredients=["яйцо", self.milk.pk, "Мука", "Трюфель"])
+        self.assertTrue(response["success"])
+        self.assertEqual(response["unknown_ingredients"], ["Трюфель"])
+        self.assertEqual(
+            [(recipe["title"], recipe["coverage"]) for recipe in response["recipes"]],
+            [("Омлет", 1.0), ("Блины", 0.75), ("Бисквит", 0.6667)],
+        )
+        self.assertEqual(response["recipes"][1]["missing"], [{"id": self.sugar.pk, "name": "Сахар"}])
+        self.assertEqual([recipe["title"] for recipe in self.search(ingredients=["Мука"], limit=1)["recipes"]], ["Бисквит"])
+
+    def test_follows_recipe_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            RecipeIngredient.objects.filter(recipe=self.omelette, ingredient=self.milk).delete()
+            RecipeIngredient.objects.create(recipe=self.omelette, ingredient=self.sugar, amount=1, unit="шт")
+        response = self.search(ingredients=["Яйцо", "Молоко"])
+        self.assertEqual(
+            [(recipe["title"], recipe["coverage"]) for recipe in response["recipes"]],
+            [("Блины", 0.5), ("Омлет", 0.5), ("Бисквит", 0.3333)],
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.pancakes.delete()
+        self.assertEqual(len(self.search(ingredients=["Яйцо"])["recipes"]), 2)
+
+    def test_bad_body(self):
+        response = self.client.post(reverse("api_pantry_search"), "{", content_type="application/json")
+        self.assertFalse(response.json()["success"])
+
+
+class ShoppingListTests(TestCase):
+    """Список покупок складывает ингредиенты с пересчётом единиц одним запросом."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("author", password="pass")
+        cls.collection = Collection.objects.create(owner=cls.user, title="Меню на неделю")
+        flour, milk, egg = (Ingredient.objects.create(name=name) for name in ("Мука", "Молоко", "Яйцо"))
+        cls.recipes = []
+        rows = [(200, "г", 1, "л"), (1, "кг", 3, "ст.л."), (Decimal("0.5"), " КГ", 1, "стакан")]
+        for number, (flour_amount, flour_unit, milk_amount, milk_unit) in enumerate(rows):
+            recipe = Recipe.objects.create(author=cls.user, title=f"Блины {number}", instruction="Жарить", cook_time=30)
+            RecipeIngredient.objects.create(recipe=recipe, ingredient=flour, amount=flour_amount, unit=flour_unit)
+            RecipeIngredient.objects.create(recipe=recipe, ingredient=milk, amount=milk_amount, unit=milk_unit)
+            RecipeIngredient.objects.create(recipe=recipe, ingredient=egg, amount=2, unit="шт")
+            CollectionItem.objects.create(collection=cls.collection, recipe=recipe)
+            cls.recipes.append(recipe)
+
+    def test_collection(self):
+        with self.assertNumQueries(1):
+            items = for_collection(self.collection)
+        self.assertEqual(
+            [(item["name"], item["amount"], item["unit"], item["recipes"]) for item in items],
+            [
+                ("Молоко", Decimal("1.25"), "л", 3),   # 1 л + 3 ст.л. + стакан = 1245 мл
+                ("Мука", Decimal("1.70"), "кг", 3),
+                ("Яйцо", Decimal("6.00"), "шт", 3),
+            ],
+        )
+
+    def test_endpoints(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("collection_shopping_list", args=[self.collection.pk]))
+        self.assertEqual(response.json()["count"], 3)
+
+        ids = ",".join(str(recipe.pk) for recipe in self.recipes[:1])
+        data = self.client.get(reverse("api_shopping_list"), {"ids": ids}).json()
+        self.assertEqual(data["items"][1], {
+            "ingredient_id": data["items"][1]["ingredient_id"], "name": "Мука", "amount": 200.0, "unit": "г", "recipes": 1,
+        })
+        self.assertEqual(self.client.get(reverse("api_shopping_list"), {"ids": "1,x"}).status_code, 400)
+
+        other = User.objects.create_user("guest", password="pass")
+        self.client.force_login(other)
+        response = self.client.get(reverse("collection_shopping_list", args=[self.collection.pk]))
+        self.assertEqual(response.status_code, 403)
+
+    def test_anonymous_visitors(self):
+        url = reverse("collection_shopping_list", args=[self.collection.pk])
+        self.assertEqual(self.client.get(url).status_code, 403)
+        Collection.objects.filter(pk=self.collection.pk).update(is_public=True)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["count"], 3)
+
+
+class ScalingTests(TestCase):
+    """Пересчёт порций: целочисленная арифметика, округление по единице, нормализация единиц."""
+
+    def test_scale_amount(self):
+        cases = [
+            ((20000, Fraction(3, 2), "г"), (Decimal("300.00"), "г")),
+            ((20000, Fraction(10), "г"), (Decimal("2.00"), "кг")),
+            ((50, Fraction(1), " КГ"), (Decimal("500.00"), "г")),
+            ((100, Fraction(1, 3), "ст.л."), (Decimal("0.50"), "ст.л.")),
+            ((100, Fraction(1, 3), "ч.л."), (Decimal("0.25"), "ч.л.")),
+            ((1, Fraction(1, 100), "г"), (Decimal("1.00"), "г")),
+        ]
+        for args, expected in cases:
+            with self.subTest(args):
+                self.assertEqual(scale_amount(*args), expected)
+
+    def test_scale_recipes(self):
+        user = User.objects.create_user("author", password="pass")
+        flour = Ingredient.objects.create(name="Мука")
+        recipes = [
+            Recipe.objects.create(author=user, title=f"Пирог {number}", instruction="Печь", cook_time=40)
+            for number in range(3)
+        ]
+        for recipe in recipes[:2]:
+            RecipeIngredient.objects.create(recipe=recipe, ingredient=flour, amount=Decimal("0.4"), unit="кг")
+        with self.assertNumQueries(1):
+            scaled = scale_recipes({recipes[0].pk: 3, recipes[1].pk: Fraction(1, 2), recipes[2].pk: 2})
+        self.assertEqual(scaled[recipes[0].pk][0]["amount"], Decimal("1.20"))
+        self.assertEqual(scaled[recipes[1].pk][0]["amount"], Decimal("200.00"))
+        self.assertEqual(scaled[recipes[1].pk][0]["unit"], "г")
+        self.assertEqual(scaled[recipes[2].pk], [])
+
+        response = self.client.post(
+            reverse("api_scale_recipes"),
+            {"recipes": [{"id": recipes[0].pk, "factor": "3/2"}]}, content_type="application/json",
+        )
+        self.assertEqual(response.json()["recipes"][0]["ingredients"][0]["amount"], 600.0)
+        response = self.client.post(
+            reverse("api_scale_recipes"),
+            {"recipes": [{"id": recipes[0].pk, "factor": "0"}]}, content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_api_rejects_malformed_bodies(self):
+        url = reverse("api_scale_recipes")
+        for body in ([], "1.5", 3, {"recipes": {"id": 1}}, {"recipes": [1]}, {"recipes": [{"factor": 2}]}):
+            with self.subTest(body=body):
+                response = self.client.post(url, json.dumps(body), content_type="application/json")
+                self.assertEqual(response.status_code, 400)
+                self.assertFalse(response.json()["success"])
+
+
+class CoverImageTests(TestCase):
+    """cover_image и image_count на рецепте следуют за его изображениями."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user("author", password="pass")
+        cls.recipe = Recipe.objects.create(author=author, title="Пирог", instruction="Печь", cook_time=40)
+        cls.plain = Recipe.objects.create(author=author, title="Каша", instruction="Варить", cook_time=20)
+
+    def stored(self):
+        recipe = Recipe.objects.get(pk=self.recipe.pk)
+        return recipe.cover_image.name, recipe.image_count
+
+    def test_follows_images(self):
+        self.assertEqual(self.stored(), ("", 0))
+        self.assertIsNone(Recipe.objects.get(pk=self.recipe.pk).cover_url)
+
+        first = RecipeImage.objects.create(recipe=self.recipe, image="recipe_images/first.jpg", position=1)
+        self.assertEqual(self.stored(), ("recipe_images/first.jpg", 1))
+        second = RecipeImage.objects.create(
+            recipe=self.recipe, image="recipe_images/second.jpg", position=2, is_main=True,
+        )
+        self.assertEqual(self.stored(), ("recipe_images/second.jpg", 2))
+        recipe = Recipe.objects.get(pk=self.recipe.pk)
+        self.assertEqual((recipe.cover_url, recipe.main_image), (second.image.url, second.image.url))
+
+        # Без главного — первое по порядку
+        second.is_main = False
+        second.save()
+        self.assertEqual(self.stored(), ("recipe_images/first.jpg", 2))
+        # main_image — только отмеченное главное изображение, как и раньше
+        self.assertIsNone(Recipe.objects.get(pk=self.recipe.pk).main_image)
+        first.delete()
+        self.assertEqual(self.stored(), ("recipe_images/second.jpg", 1))
+        second.delete()
+        self.assertEqual(self.stored(), ("", 0))
+
+    def test_has_image_filter(self):
+        RecipeImage.objects.create(recipe=self.recipe, image="recipe_images/first.jpg")
+        RecipeImage.objects.create(recipe=self.recipe, image="recipe_images/second.jpg")
+        recipes, _ = filter_recipes(parse_params({"has_image": "on"}))
+        # Счётчик на рецепте: ни JOIN'а, ни дублей
+        self.assertNotIn("JOIN", str(recipes.query))
+        self.assertEqual(list(recipes), [self.recipe])
+        self.assertEqual(list(filter_recipes(parse_params({}))[0].order_by("pk")), [self.recipe, self.plain])
+
+
+class ImageDerivativeTests(TestCase):
+    """Миниатюры и WebP-копии строятся в фоне и попадают в srcset."""
+
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        settings = override_settings(MEDIA_ROOT=media)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.user = User.objects.create_user("author", password="pass")
+        self.recipe = Recipe.objects.create(author=self.user, title="Пирог", instruction="Печь", cook_time=40)
+
+    def upload(self, name="pie.jpg", size=(1600, 1200)):
+        buffer = BytesIO()
+        Image.new("RGB", size, "orange").save(buffer, "JPEG")
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type="image/jpeg")
+
+    def test_generated_on_upload(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            image = RecipeImage.objects.create(recipe=self.recipe, image=self.upload(), is_main=True)
+        derivatives.wait(timeout=30)
+        name = image.image.name
+        self.assertTrue(derivatives.is_ready(name, "recipe"))
+        for width in derivatives.PRESETS["recipe"]:
+            for image_format in derivatives.FORMATS:
+                with default_storage.open(derivatives.derivative_name(name, width, image_format)) as file:
+                    copy = Image.open(file)
+                    self.assertEqual((copy.format, copy.width), (image_format, width))
+
+        html = Template("{% load recipe_images %}{% responsive_image recipe.cover_image alt='Пирог' %}").render(
+            Context({"recipe": Recipe.objects.get(pk=self.recipe.pk)})
+        )
+        self.assertIn('<source type="image/webp" srcset="/media/derivatives/', html)
+        self.assertIn("-1024w.webp 1024w", html)
+        self.assertIn('alt="Пирог"', html)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            image.delete()
+        self.assertFalse(derivatives.is_ready(name, "recipe"))
+
+    def test_original_until_ready_and_no_upscaling(self):
+        name = default_storage.save("recipe_images/small.jpg", self.upload(size=(200, 100)))
+        html = Template("{% load recipe_images %}{% responsive_image name %}").render(Context({"name": name}))
+        self.assertTrue(html.startswith(f'<img src="/media/{name}"'))
+
+        self.assertEqual(derivatives.generate(name, "recipe"), 6)
+        self.assertEqual(derivatives.generate(name, "recipe"), 0)  # уже готовы
+        with default_storage.open(derivatives.derivative_name(name, 1024, "WEBP")) as file:
+            self.assertEqual(Image.open(file).size, (200, 100))
+
+    def test_same_stem_different_extension(self):
+        jpeg = default_storage.save("recipe_images/pie.jpg", self.upload(size=(400, 300)))
+        buffer = BytesIO()
+        Image.new("RGB", (300, 400), "green").save(buffer, "PNG")
+        png = default_storage.save("recipe_images/pie.png", SimpleUploadedFile("pie.png", buffer.getvalue()))
+        self.assertEqual(derivatives.derivative_name(jpeg, 320, "WEBP"), "derivatives/recipe_images/pie.jpg-320w.webp")
+        self.assertEqual(derivatives.generate(jpeg, "recipe"), 6)
+        # копии PNG не совпадают с копиями JPEG и не затирают их
+        self.assertFalse(derivatives.is_ready(png, "recipe"))
+        self.assertEqual(derivatives.generate(png, "recipe"), 6)
+        for name, size in ((jpeg, (320, 240)), (png, (300, 400))):
+            with default_storage.open(derivatives.derivative_name(name, 320, "JPEG")) as file:
+                self.assertEqual(Image.open(file).size, size)
+
+    def test_avatar(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.user.avatar = self.upload("me.jpg", size=(400, 400))
+            self.user.save()
+        self.assertEqual(len(callbacks), 1)
+        derivatives.wait(timeout=30)
+        self.assertTrue(derivatives.is_ready(self.user.avatar.name, "avatar"))
+        # вход сохраняет только last_login — копии не перестраиваются
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.client.login(username="author", password="pass")
+        self.assertEqual(callbacks, [])
@@ -2,7 +2,7 @@
 from django.urls import path
 from .views import RecipeDetailView, RecipeListView, MyRecipesView, \
     IngredientListView, IngredientCreateView, recipe_create, recipe_edit, recipe_delete, \
-    CategoryListView, get_ingredient_unit, get_ingredient_name, api_search_recipes, api_search_ingredients, api_create_ingredient, ingredient_management
+    CategoryListView, get_ingredient_unit, get_ingredient_name, api_search_recipes, api_pantry_search, api_shopping_list, api_scale_recipes, api_search_ingredients, api_create_ingredient, ingredient_management
 
 urlpatterns = [
     path("", RecipeListView.as_view(), name="recipe_list"),
@@ -17,6 +17,9 @@ urlpatterns = [
     path("api/ingredient-unit/", get_ingredient_unit, name="get_ingredient_unit"),
     path("api/ingredient-name/<int:ingredient_id>/", get_ingredient_name, name="get_ingredient_name"),
     path("api/search/", api_search_recipes, name="api_search_recipes"),
+    path("api/pantry/", api_pantry_search, name="api_pantry_search"),
+    path("api/shopping-list/", api_shopping_list, name="api_shopping_list"),
+    path("api/scale/", api_scale_recipes, name="api_scale_recipes"),
     path("api/search-ingredients/", api_search_ingredients, name="api_search_ingredients"),
     path("api/create-ingredient/", api_create_ingredient, name="api_create_ingredient"),
     path("ingredients/manage/", ingredient_management, name="ingredient_management"),
@@ -1,23 +1,37 @@
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.contrib import messages
-from django.db.models import Q
-from django.http import HttpResponse, HttpResponseForbidden, JsonResponse
+from django.core.paginator import Paginator
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, OuterRef
+from django.http import HttpResponse, HttpResponseForbidden, JsonResponse, StreamingHttpResponse
 from django.shortcuts import redirect, render, get_object_or_404
 from django.urls import reverse_lazy
+from django.utils.decorators import method_decorator
 from django.views.generic import ListView, CreateView, DetailView, UpdateView
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
+import itertools
 import json
 
 from recipes.forms import RecipeForm, CommentForm, RatingForm, RecipeIngredientFormSet, RecipeIngredientFormSetCreate, RecipeImageFormSet, RecipeImageFormSetCreate
-from recipes.models import Recipe, Rating, Ingredient, Category
+from recipes import scaling, shopping
+from recipes.fragments import comments_generation
+from recipes.page_cache import anonymous_page_cache
+from recipes.models import Recipe, RecipeIngredient, Rating, Ingredient, Category
+from recipes.pagination import KeysetPaginationMixin
+from search import backends as search_backends, result_cache as search_result_cache
+from search.indexing import API_SEARCH_FIELDS, RELEVANCE
+from search.ingredients import ingredient_index
+from search.pantry import pantry_index
+from search.similar import similar_index
 
 PREFIX = "ingredients"
 
 def index(request):
     return HttpResponse("Раздел рецептов работает!")
 
+@method_decorator(anonymous_page_cache, name="dispatch")
 class HomePageView(ListView):
     """Главная страница — приветствие и несколько рецептов"""
     model = Recipe
@@ -25,7 +39,7 @@ class HomePageView(ListView):
     context_object_name = "recipes"
 
     def get_queryset(self):
-        return Recipe.objects.order_by("-created_at")[:5]  # последние 5 рецептов
+        return Recipe.objects.for_cards().order_by("-created_at")[:5]  # последние 5 рецептов
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -60,14 +74,16 @@ def recipe_create(request):
         print(f"CREATE - Images formset valid: {images_valid}")
         
         if form_valid and ingredients_valid and images_valid:
-            recipe = form.save(commit=False)
-            recipe.author = request.user
-            recipe.save()
-
-            formset_ingredients.instance = recipe
-            image_formset.instance = recipe
-            formset_ingredients.save()
-            image_formset.save()
+            # Одной транзакцией: поисковые индексы обновятся один раз после фиксации
+            with transaction.atomic():
+                recipe = form.save(commit=False)
+                recipe.author = request.user
+                recipe.save()
+
+                formset_ingredients.instance = recipe
+                image_formset.instance = recipe
+                formset_ingredients.save()
+                image_formset.save()
             print(f"CREATE - Рецепт {recipe.title} успешно создан!")
             return redirect("recipe_detail", pk=recipe.pk)
         else:
@@ -158,10 +174,6 @@ def recipe_edit(request, pk):
             ingredients_valid = False
         
         if form_valid and ingredients_valid and images_valid:
-            saved_recipe = form.save()
-            formset_ingredients.instance = saved_recipe
-            image_formset.instance = saved_recipe
-            
             # Дополнительная проверка перед сохранением ингредиентов
             for ingredient_form in formset_ingredients.forms:
                 if ingredient_form.cleaned_data:
@@ -172,9 +184,14 @@ def recipe_edit(request, pk):
                     # Если cleaned_data пустой, создаем пустой словарь с DELETE=True
                     ingredient_form.cleaned_data = {'DELETE': True}
             
-            # Сохраняем formset
-            formset_ingredients.save()
-            image_formset.save()
+            # Сохраняем formset — вместе с рецептом одной транзакцией:
+            # поисковые индексы обновятся один раз после фиксации
+            with transaction.atomic():
+                saved_recipe = form.save()
+                formset_ingredients.instance = saved_recipe
+                image_formset.instance = saved_recipe
+                formset_ingredients.save()
+                image_formset.save()
             print(f"Рецепт {saved_recipe.title} успешно сохранен!")
             return redirect("my_recipes")
         else:
@@ -219,22 +236,49 @@ def recipe_delete(request, pk):
         "recipe": recipe,
     })
 
+@method_decorator(anonymous_page_cache, name="dispatch")
 class RecipeDetailView(DetailView):
     """Страница рецепта с комментариями и оценками"""
     model = Recipe
     template_name = "recipes/recipe_detail.html"
     context_object_name = "recipe"
+    comments_per_page = 20
+
+    def get_queryset(self):
+        return Recipe.objects.select_related("author", "category")
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context["comment_form"] = CommentForm()
         context["rating_form"] = RatingForm()
-        context["comments"] = self.object.comments.all()
+
+        # Ингредиенты и изображения — ленивыми запросами: внутри закешированного
+        # фрагмента страницы (см. recipes.fragments) при попадании они не выполняются
+        context["ingredients"] = self.object.recipe_ingredients.select_related("ingredient")
+        context["images"] = self.object.images.all()
+        context["comments_generation"] = comments_generation(self.object.pk)
+
+        # Комментарии — постранично (?comments_page=), вместе с авторами
+        comments = self.object.comments.select_related("user").order_by("-created_at", "-id")
+        paginator = Paginator(comments, self.comments_per_page)
+        context["comments_page"] = paginator.get_page(self.request.GET.get("comments_page"))
+        context["comments"] = context["comments_page"].object_list
+
+        # Похожие рецепты по ингредиентам (MinHash + LSH, см. search.similar)
+        similar = dict(similar_index.similar(self.object.pk))
+        context["similar_recipes"] = search_result_cache.hydrate(
+            Recipe.objects.for_cards(), list(similar)
+        )
+        for recipe in context["similar_recipes"]:
+            recipe.similarity = similar[recipe.pk]  # доля общих ингредиентов (оценка Жаккара)
+
         if self.request.user.is_authenticated:
-            collections = self.request.user.collections.all()
-            recipe = self.get_object()
+            # Есть ли рецепт в каждой из коллекций пользователя — одним запросом
+            collections = self.request.user.collections.annotate(
+                in_collection=Exists(self.object.in_collections.filter(collection=OuterRef("pk")))
+            )
             context["collections"] = [
-                {"obj": c, "in_collection": c.items.filter(recipe=recipe).exists()}
+                {"obj": c, "in_collection": c.in_collection}
                 for c in collections
             ]
         return context
@@ -262,25 +306,26 @@ class RecipeDetailView(DetailView):
 
         return self.get(request, *args, **kwargs)
 
-class RecipeListView(ListView):
-    """Список всех рецептов"""
+@method_decorator(anonymous_page_cache, name="dispatch")
+class RecipeListView(KeysetPaginationMixin, ListView):
+    """Список всех рецептов (с ?cursor= — постранично по курсору)"""
     model = Recipe
     template_name = "recipes/recipe_list.html"
     context_object_name = "recipes"
     paginate_by = 10  # по 10 рецептов на страницу
 
     def get_queryset(self):
-        return Recipe.objects.order_by("-created_at")
+        return Recipe.objects.for_cards().order_by("-created_at", "-id")
 
-class MyRecipesView(LoginRequiredMixin, ListView):
-    """Список рецептов текущего пользователя"""
+class MyRecipesView(LoginRequiredMixin, KeysetPaginationMixin, ListView):
+    """Список рецептов текущего пользователя (с ?cursor= — постранично по курсору)"""
     model = Recipe
     template_name = "recipes/my_recipes.html"
     context_object_name = "recipes"
     paginate_by = 10
 
     def get_queryset(self):
-        return Recipe.objects.filter(author=self.request.user).order_by("-created_at")
+        return Recipe.objects.for_cards().filter(author=self.request.user).order_by("-created_at", "-id")
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -310,6 +355,7 @@ class IngredientCreateView(LoginRequiredMixin, CreateView):
     success_url = reverse_lazy("ingredient_list")
 
 
+@method_decorator(anonymous_page_cache, name="dispatch")
 class CategoryListView(ListView):
     """Список всех категорий"""
     model = Category
@@ -355,9 +401,135 @@ def get_ingredient_unit(request):
     return JsonResponse({'success': False, 'error': 'Only POST method allowed'})
 
 
+# Потоковый режим API поиска: по объекту JSON на строку (NDJSON)
+NDJSON = 'application/x-ndjson'
+STREAM_CHUNK_SIZE = 2000
+STREAM_FIELDS = (
+    'id', 'title', 'description', 'author__username', 'rating',
+    'cook_time', 'difficulty', 'category__name', 'cover_image',
+)
+
+
+def _image_url(name):
+    # В values() ImageField приходит строкой — URL строим тем же хранилищем
+    return Recipe._meta.get_field('cover_image').storage.url(name) if name else None
+
+
+def _short_description(description):
+    if description and len(description) > 100:
+        return description[:100] + '...'
+    return description
+
+
+def _api_search_queryset(query, category, min_rating, ingredient, ingredient_name, difficulty):
+    """Отфильтрованные и упорядоченные рецепты для API поиска (без ограничения числа)."""
+    recipes = Recipe.objects.all()
+
+    # Фильтр по тексту — через поисковый бэкенд (индекс или FTS5)
+    ranked = False
+    if query:
+        recipes, ranked = search_backends.filter_recipes(recipes, query, API_SEARCH_FIELDS)
+
+    # Фильтр по категории
+    if category:
+        recipes = recipes.filter(category__slug=category)
+
+    # Фильтр по минимальному рейтингу
+    if min_rating:
+        try:
+            min_rating_float = float(min_rating)
+            print(f"Filtering by rating >= {min_rating_float}")
+            recipes = recipes.filter(rating__gte=min_rating_float)
+        except ValueError:
+            print(f"Invalid rating value: {min_rating}")
+            pass
+
+    # Фильтр по ингредиенту (по названию)
+    if ingredient_name:
+        print(f"Filtering by ingredient name: '{ingredient_name}'")
+        # Используем iregex для поиска по частичным совпадениям; подзапрос вместо
+        # JOIN'а — иначе рецепт повторяется по разу на каждый подходящий ингредиент
+        recipes = recipes.filter(pk__in=RecipeIngredient.objects.filter(
+            ingredient__name__iregex=ingredient_name,
+        ).values('recipe_id'))
+
+    # Фильтр по ингредиенту (по ID - для обратной совместимости)
+    if ingredient:
+        try:
+            ingredient_id = int(ingredient)
+            print(f"Filtering by ingredient ID: {ingredient_id}")
+            recipes = recipes.filter(pk__in=RecipeIngredient.objects.filter(
+                ingredient_id=ingredient_id,
+            ).values('recipe_id'))
+        except ValueError:
+            print(f"Invalid ingredient ID: {ingredient}")
+
+    # Фильтр по сложности
+    if difficulty:
+        print(f"Filtering by difficulty: {difficulty}")
+        recipes = recipes.filter(difficulty=difficulty)
+
+    # С текстом — самые релевантные (BM25), иначе новые
+    if query:
+        recipes = search_backends.rank_recipes(recipes, query, ranked, API_SEARCH_FIELDS)
+        return recipes.order_by(f'-{RELEVANCE}', '-created_at')
+    return recipes.order_by('-created_at')
+
+
+def _parse_stream_limit(value):
+    """``limit`` потока: не задан — все рецепты, иначе положительное целое (ValueError)."""
+    if value in (None, ''):
+        return None
+    if isinstance(value, bool):
+        raise ValueError(value)
+    limit = int(value)
+    if limit <= 0:
+        raise ValueError(value)
+    return limit
+
+
+def _stream_recipes(recipes, limit=None):
+    """Строки NDJSON: рецепты читаются пачками через iterator(), только нужные колонки.
+
+    Запрос выполняется и первая пачка читается сразу, до создания ответа:
+    ошибка базы (например, некорректное регулярное выражение в фильтре)
+    возвращается обычным JSON, а не обрывает уже начатый поток.
+    """
+    rows = recipes.values(*STREAM_FIELDS)
+    if limit:
+        rows = rows[:limit]
+    rows = rows.iterator(chunk_size=STREAM_CHUNK_SIZE)
+    first = next(rows, None)
+    if first is None:
+        return iter(())
+    return _ndjson_lines(itertools.chain([first], rows))
+
+
+def _ndjson_lines(rows):
+    difficulty_labels = dict(Recipe.DIFFICULTY_CHOICES)
+    for row in rows:
+        yield json.dumps({
+            'id': row['id'],
+            'title': row['title'],
+            'description': _short_description(row['description']),
+            'author': row['author__username'],
+            'rating': float(row['rating']),
+            'cook_time': row['cook_time'],
+            'difficulty': row['difficulty'],
+            'difficulty_display': difficulty_labels.get(row['difficulty'], row['difficulty']),
+            'category': row['category__name'],
+            'image_url': _image_url(row['cover_image']),
+            'url': f'/recipes/{row["id"]}/'
+        }, ensure_ascii=False) + '\n'
+
+
 @csrf_exempt
 def api_search_recipes(request):
-    """API endpoint для поиска и фильтрации рецептов"""
+    """API endpoint для поиска и фильтрации рецептов
+
+    С ``?stream=1`` или заголовком ``Accept: application/x-ndjson`` отдаёт все
+    найденные рецепты (или первые ``limit``) потоком NDJSON — по объекту на строку.
+    """
     if request.method == 'POST':
         try:
             data = json.loads(request.body)
@@ -370,74 +542,44 @@ def api_search_recipes(request):
             difficulty = data.get('difficulty', '').strip()
             
             print(f"Filter API called with query: '{query}', category: '{category}', min_rating: '{min_rating}', ingredient_name: '{ingredient_name}', difficulty: '{difficulty}'")
+
+            def search_queryset():
+                return _api_search_queryset(query, category, min_rating, ingredient, ingredient_name, difficulty)
+
+            # Потоковый режим: без ограничения в 20 рецептов, память не растёт с числом результатов
+            if request.GET.get('stream') == '1' or NDJSON in request.headers.get('Accept', ''):
+                try:
+                    limit = _parse_stream_limit(data.get('limit'))
+                except (TypeError, ValueError):
+                    return JsonResponse({
+                        'success': False, 'error': 'limit должен быть положительным целым числом',
+                    }, status=400)
+                return StreamingHttpResponse(
+                    _stream_recipes(search_queryset(), limit), content_type=NDJSON,
+                )
             
-            # Проверяем общее количество рецептов
+            # Общее количество рецептов
             total_recipes = Recipe.objects.count()
-            print(f"Total recipes in database: {total_recipes}")
-            
-            # Проверяем рейтинги в базе данных
-            if total_recipes > 0:
-                ratings = Recipe.objects.values_list('rating', flat=True)
-                print(f"Ratings in database: {list(ratings)}")
-                
-                # Пересчитываем рейтинги для всех рецептов
-                for recipe in Recipe.objects.all():
-                    recipe.update_rating()
-                print("Ratings recalculated")
             
             # Базовый запрос
-            recipes = Recipe.objects.select_related('author', 'category').prefetch_related('ingredients', 'images')
-            
-            # Фильтр по тексту
-            if query:
-                recipes = recipes.filter(
-                    Q(title__icontains=query) |
-                    Q(description__icontains=query) |
-                    Q(ingredients__ingredient__name__icontains=query)
-                ).distinct()
-            
-            # Фильтр по категории
-            if category:
-                recipes = recipes.filter(category__slug=category)
-            
-            # Фильтр по минимальному рейтингу
-            if min_rating:
-                try:
-                    min_rating_float = float(min_rating)
-                    print(f"Filtering by rating >= {min_rating_float}")
-                    recipes = recipes.filter(rating__gte=min_rating_float)
-                    print(f"After rating filter: {recipes.count()} recipes")
-                except ValueError:
-                    print(f"Invalid rating value: {min_rating}")
-                    pass
-            
-            # Фильтр по ингредиенту (по названию)
-            if ingredient_name:
-                print(f"Filtering by ingredient name: '{ingredient_name}'")
-                # Используем iregex для поиска по частичным совпадениям
-                recipes = recipes.filter(ingredients__name__iregex=ingredient_name)
-                print(f"After ingredient name filter: {recipes.count()} recipes")
-            
-            # Фильтр по ингредиенту (по ID - для обратной совместимости)
-            if ingredient:
-                try:
-                    ingredient_id = int(ingredient)
-                    print(f"Filtering by ingredient ID: {ingredient_id}")
-                    recipes = recipes.filter(ingredients__id=ingredient_id)
-                    print(f"After ingredient ID filter: {recipes.count()} recipes")
-                except ValueError:
-                    print(f"Invalid ingredient ID: {ingredient}")
-            
-            # Фильтр по сложности
-            if difficulty:
-                print(f"Filtering by difficulty: {difficulty}")
-                recipes = recipes.filter(difficulty=difficulty)
-                print(f"After difficulty filter: {recipes.count()} recipes")
-            
-            # Ограничиваем количество результатов
-            recipes = recipes.order_by('-created_at')[:20]
-            
-            print(f"Found {recipes.count()} recipes")
+            base = Recipe.objects.for_cards()
+
+            # Список id берём из кеша результатов (ключ — нормализованные параметры)
+            key_params = {
+                'query': query,
+                'category': category,
+                'min_rating': str(min_rating),
+                'max_time': str(max_time),
+                'ingredient': str(ingredient),
+                'ingredient_name': ingredient_name,
+                'difficulty': difficulty,
+            }
+            ids = search_result_cache.cached_ids(
+                'api', key_params, lambda: search_queryset().values_list('pk', flat=True)[:20]
+            )
+            recipes = search_result_cache.hydrate(base, ids)
+
+            print(f"Found {len(recipes)} recipes")
             
             # Формируем ответ
             recipes_data = []
@@ -446,14 +588,14 @@ def api_search_recipes(request):
                     recipes_data.append({
                         'id': recipe.id,
                         'title': recipe.title,
-                        'description': recipe.description[:100] + '...' if recipe.description and len(recipe.description) > 100 else recipe.description,
+                        'description': _short_description(recipe.description),
                         'author': recipe.author.username,
                         'rating': float(recipe.rating),
                         'cook_time': recipe.cook_time,
                         'difficulty': recipe.difficulty,
                         'difficulty_display': recipe.get_difficulty_display(),
                         'category': recipe.category.name if recipe.category else None,
-                        'image_url': None,  # Поле image удалено из модели Recipe
+                        'image_url': recipe.cover_url,
                         'url': f'/recipes/{recipe.id}/'
                     })
                 except Exception as e:
@@ -477,6 +619,156 @@ def api_search_recipes(request):
     return JsonResponse({'success': False, 'error': 'Only POST method allowed'})
 
 
+@csrf_exempt
+@require_http_methods(["POST"])
+def api_pantry_search(request):
+    """API endpoint «Что приготовить»: рецепты по ингредиентам, которые есть под рукой"""
+    try:
+        data = json.loads(request.body)
+        try:
+            limit = min(max(int(data.get('limit', 20)), 1), 100)
+        except (TypeError, ValueError):
+            limit = 20
+
+        # Ингредиенты можно передать id или названиями
+        pantry = set()
+        unknown = []
+        for item in data.get('ingredients', []):
+            if isinstance(item, int):
+                pantry.add(item)
+                continue
+            ingredient_id = ingredient_index.lookup(str(item))
+            if ingredient_id is None:
+                unknown.append(item)
+            else:
+                pantry.add(ingredient_id)
+
+        # Оценка по индексу ингредиентов в памяти, из базы — только найденные рецепты
+        matches = pantry_index.search(pantry, limit=limit)
+        recipes = Recipe.objects.for_cards().in_bulk(
+            [recipe_id for recipe_id, _, _ in matches]
+        )
+        names = ingredient_index.names(
+            {ingredient_id for _, _, missing in matches for ingredient_id in missing}
+        )
+
+        recipes_data = []
+        for recipe_id, coverage, missing in matches:
+            recipe = recipes.get(recipe_id)
+            if recipe is None:
+                continue
+            recipes_data.append({
+                'id': recipe.id,
+                'title': recipe.title,
+                'author': recipe.author.username,
+                'rating': float(recipe.rating),
+                'cook_time': recipe.cook_time,
+                'difficulty': recipe.difficulty,
+                'difficulty_display': recipe.get_difficulty_display(),
+                'category': recipe.category.name if recipe.category else None,
+                'coverage': round(coverage, 4),
+                'missing': [
+                    {'id': ingredient_id, 'name': names.get(ingredient_id)}
+                    for ingredient_id in missing
+                ],
+                'url': f'/recipes/{recipe.id}/'
+            })
+
+        return JsonResponse({
+            'success': True,
+            'recipes': recipes_data,
+            'count': len(recipes_data),
+            'unknown_ingredients': unknown,
+        })
+
+    except json.JSONDecodeError:
+        return JsonResponse({
+            'success': False,
+            'error': 'Неверный формат JSON'
+        })
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        })
+
+
+# Сколько рецептов можно пересчитать за один запрос
+SCALE_MAX_RECIPES = 500
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def api_scale_recipes(request):
+    """API endpoint: ингредиенты рецептов, пересчитанные на коэффициенты порций
+
+    Тело: {"recipes": [{"id": 1, "factor": "1.5"}, ...]}; все рецепты — одним запросом (см. recipes.scaling)
+    """
+    try:
+        data = json.loads(request.body)
+        if not isinstance(data, dict):
+            return JsonResponse({'success': False, 'error': 'Ожидается JSON-объект'}, status=400)
+        items = data.get('recipes', [])
+        if not isinstance(items, list) or len(items) > SCALE_MAX_RECIPES:
+            return JsonResponse({
+                'success': False,
+                'error': f'Ожидается список из не больше {SCALE_MAX_RECIPES} рецептов'
+            }, status=400)
+        try:
+            factors = {int(item['id']): scaling.parse_factor(item.get('factor', 1)) for item in items}
+        except (KeyError, TypeError, ValueError) as e:
+            return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+        scaled = scaling.scale_recipes(factors)
+        return JsonResponse({
+            'success': True,
+            'recipes': [
+                {
+                    'id': recipe_id,
+                    'factor': str(factors[recipe_id]),
+                    'ingredients': [dict(row, amount=float(row['amount'])) for row in ingredients],
+                }
+                for recipe_id, ingredients in scaled.items()
+            ],
+        })
+
+    except json.JSONDecodeError:
+        return JsonResponse({
+            'success': False,
+            'error': 'Неверный формат JSON'
+        })
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        })
+
+
+# Сколько рецептов можно передать в список покупок за раз
+SHOPPING_LIST_MAX_RECIPES = 500
+
+
+@require_http_methods(["GET"])
+def api_shopping_list(request):
+    """API endpoint: список покупок по рецептам ?ids=1,2,3 (один GROUP BY, см. recipes.shopping)"""
+    try:
+        recipe_ids = {int(value) for value in request.GET.get('ids', '').split(',') if value.strip()}
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Некорректный список id рецептов'}, status=400)
+    if len(recipe_ids) > SHOPPING_LIST_MAX_RECIPES:
+        return JsonResponse({
+            'success': False,
+            'error': f'Не больше {SHOPPING_LIST_MAX_RECIPES} рецептов за раз'
+        }, status=400)
+
+    items = shopping.for_recipes(recipe_ids)
+    return JsonResponse({
+        'success': True,
+        'items': [dict(item, amount=float(item['amount'])) for item in items],
+        'count': len(items),
+    })
+
+
 @csrf_exempt
 @require_http_methods(["POST"])
 def api_search_ingredients(request):
@@ -484,41 +776,20 @@ def api_search_ingredients(request):
     try:
         data = json.loads(request.body)
         query = data.get('query', '').strip()
-        
-        print(f"DEBUG: Поиск ингредиентов, запрос: '{query}'")
-        print(f"DEBUG: Длина запроса: {len(query)}")
-        print(f"DEBUG: Коды символов: {[ord(c) for c in query]}")
-        
+
+        # Подсказки берём из индекса названий в памяти процесса — без запросов к БД
         if len(query) < 2:
             # Если запрос пустой, возвращаем все ингредиенты (для загрузки существующих)
-            ingredients = Ingredient.objects.all().order_by('name')
-            print(f"DEBUG: Загружаем все ингредиенты, найдено: {ingredients.count()}")
+            ingredients = ingredient_index.all()
         else:
-            # Поиск ингредиентов по части названия (без учета регистра)
-            # Используем iregex для более надежного поиска без учета регистра
-            ingredients = Ingredient.objects.filter(
-                name__iregex=query
-            ).order_by('name')[:10]  # Ограничиваем 10 результатами
-            
-            # Дополнительная отладка
-            print(f"DEBUG: Поиск по '{query}', найдено: {ingredients.count()}")
-            print(f"DEBUG: Запрос в БД: name__iregex='{query}'")
-            
-            # Проверим, есть ли ингредиенты с похожими названиями
-            all_ingredients = Ingredient.objects.all()
-            similar_names = [ing.name for ing in all_ingredients if query.lower() in ing.name.lower()]
-            print(f"DEBUG: Похожие названия (без учета регистра): {similar_names}")
-        
-        ingredients_data = []
-        for ingredient in ingredients:
-            ingredients_data.append({
-                'id': ingredient.id,
-                'name': ingredient.name
-            })
-            print(f"DEBUG: Добавлен ингредиент: {ingredient.name}")
-        
-        print(f"DEBUG: Возвращаем {len(ingredients_data)} ингредиентов")
-        
+            # Сначала совпадения с начала названия, затем по вхождению
+            ingredients = ingredient_index.suggest(query, limit=10)
+
+        ingredients_data = [
+            {'id': ingredient_id, 'name': name}
+            for ingredient_id, name in ingredients
+        ]
+
         return JsonResponse({
             'success': True,
             'ingredients': ingredients_data
@@ -552,31 +823,58 @@ def api_create_ingredient(request):
                 'error': 'Название ингредиента не может быть пустым'
             })
         
-        # Проверяем, не существует ли уже точно такой ингредиент
+        # Проверяем, не существует ли уже точно такой ингредиент — по базе:
+        # индекс в памяти этого процесса может отставать от других воркеров
         if Ingredient.objects.filter(name__iexact=name).exists():
             return JsonResponse({
                 'success': False,
                 'error': 'Ингредиент с таким названием уже существует'
             })
-        
-        # Проверяем на похожие ингредиенты (разница в 1-2 символа)
-        similar_ingredients = []
-        for ingredient in Ingredient.objects.all():
-            if abs(len(ingredient.name) - len(name)) <= 2:
-                # Простая проверка на схожесть
-                if name.lower() in ingredient.name.lower() or ingredient.name.lower() in name.lower():
-                    similar_ingredients.append(ingredient.name)
-        
-        # Если найдены похожие ингредиенты, предупреждаем пользователя
-        if similar_ingredients:
+
+        # Похожие названия — по триграммному индексу в памяти. Удалённые
+        # в другом воркере ингредиенты отсеиваем по базе
+        similar = ingredient_index.similar(name, limit=3)
+        if similar:
+            existing = set(Ingredient.objects.filter(
+                pk__in=[ingredient_id for ingredient_id, _, _ in similar]
+            ).values_list('pk', flat=True))
+            similar = [row for row in similar if row[0] in existing]
+        similar_ingredients = [similar_name for _, similar_name, _ in similar]
+        similar_details = [
+            {'id': ingredient_id, 'name': similar_name, 'distance': distance}
+            for ingredient_id, similar_name, distance in similar
+        ]
+
+        # Расстояние 0 — то же название с другим регистром кириллицы или «ё»
+        # (iexact в SQLite их не сравнивает): это дубликат, создавать нельзя
+        if any(distance == 0 for _, _, distance in similar):
             return JsonResponse({
                 'success': False,
-                'error': f'Возможно, вы имели в виду: {", ".join(similar_ingredients[:3])}? Проверьте правильность написания.',
-                'similar': similar_ingredients[:3]
+                'error': 'Ингредиент с таким названием уже существует',
+                'similar': similar_ingredients,
+                'similar_details': similar_details,
+            })
+
+        # Расстояние 1-2 — вероятная опечатка, но может быть и другой ингредиент
+        # («Сок» и «Соя»): предупреждаем, а с force=true создаём всё равно
+        if similar and data.get('force') is not True:
+            return JsonResponse({
+                'success': False,
+                'error': f'Возможно, вы имели в виду: {", ".join(similar_ingredients)}? Проверьте правильность написания.',
+                'similar': similar_ingredients,
+                'similar_details': similar_details,
+                'can_force': True,
             })
         
-        # Создаем новый ингредиент
-        ingredient = Ingredient.objects.create(name=name)
+        # Создаем новый ингредиент; уникальность названия держит база
+        try:
+            with transaction.atomic():
+                ingredient = Ingredient.objects.create(name=name)
+        except IntegrityError:
+            return JsonResponse({
+                'success': False,
+                'error': 'Ингредиент с таким названием уже существует'
+            })
         
         return JsonResponse({
             'success': True,
@@ -1,9 +1,10 @@
-# Временно отключено для исправления ошибки удаления рецептов
-# from django.contrib import admin
-# from .models import SearchIndex
+from django.contrib import admin
+from .models import SearchIndex
 
-# @admin.register(SearchIndex)
-# class SearchIndexAdmin(admin.ModelAdmin):
-#     list_display = ("recipe", "updated_at")
-#     search_fields = ("title", "content")
-#     autocomplete_fields = ["recipe"]
+
+@admin.register(SearchIndex)
+class SearchIndexAdmin(admin.ModelAdmin):
+    list_display = ("token", "field", "recipe", "frequency")
+    list_filter = ("field",)
+    search_fields = ("token",)
+    autocomplete_fields = ["recipe"]
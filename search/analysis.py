@@ -0,0 +1,127 @@
+"""Анализ русского текста для поиска: нормализация, стоп-слова, стемминг.
+
+Стеммер — реализация алгоритма Snowball для русского языка без внешних
+зависимостей. Основы слов кешируются в LRU, поэтому при массовой
+переиндексации повторяющиеся слова не разбираются заново.
+"""
+import re
+from functools import lru_cache
+
+WORD_RE = re.compile(r"\w+")
+
+VOWELS = frozenset("аеиоуыэюя")
+
+STOP_WORDS = frozenset("""
+    а без более бы был была были было быть в вам вас весь во вот все всего
+    всех вы где да даже для до его ее ей ему если есть еще же за здесь и из
+    или им их к как когда кто ли либо мне может мы на над надо наш не него
+    нее нет ни них но ну о об однако он она они оно от очень по под при с со
+    так также такой там те тем то того тоже той только том ты у уже хотя чего
+    чей чем что чтобы чье чья эта эти это я
+""".split())
+
+
+def _by_length(endings):
+    """Окончания от длинных к коротким — выбираем самое длинное совпадение."""
+    return tuple(sorted(endings, key=len, reverse=True))
+
+
+# Окончания, которые снимаются только после «а» или «я»
+PERFECTIVE_GERUND_1 = frozenset(("в", "вши", "вшись"))
+PERFECTIVE_GERUND = _by_length(PERFECTIVE_GERUND_1 | {"ив", "ивши", "ившись", "ыв", "ывши", "ывшись"})
+
+ADJECTIVE = _by_length((
+    "ее", "ие", "ые", "ое", "ими", "ыми", "ей", "ий", "ый", "ой", "ем", "им", "ым",
+    "ом", "его", "ого", "ему", "ому", "их", "ых", "ую", "юю", "ая", "яя", "ою", "ею",
+))
+
+PARTICIPLE_1 = frozenset(("ем", "нн", "вш", "ющ", "щ"))
+PARTICIPLE = _by_length(PARTICIPLE_1 | {"ивш", "ывш", "ующ"})
+
+REFLEXIVE = _by_length(("ся", "сь"))
+
+VERB_1 = frozenset((
+    "ла", "на", "ете", "йте", "ли", "й", "л", "ем", "н", "ло", "но", "ет", "ют",
+    "ны", "ть", "ешь", "нно",
+))
+VERB = _by_length(VERB_1 | {
+    "ила", "ыла", "ена", "ейте", "уйте", "ите", "или", "ыли", "ей", "уй", "ил",
+    "ыл", "им", "ым", "ен", "ило", "ыло", "ено", "ят", "ует", "уют", "ит", "ыт",
+    "ены", "ить", "ыть", "ишь", "ую", "ю",
+})
+
+NOUN = _by_length((
+    "а", "ев", "ов", "ие", "ье", "е", "иями", "ями", "ами", "еи", "ии", "и", "ией",
+    "ей", "ой", "ий", "й", "иям", "ям", "ием", "ем", "ам", "ом", "о", "у", "ах",
+    "иях", "ях", "ы", "ь", "ию", "ью", "ю", "ия", "ья", "я",
+))
+
+SUPERLATIVE = _by_length(("ейш", "ейше"))
+DERIVATIONAL = _by_length(("ост", "ость"))
+
+
+def normalize(text):
+    """Нижний регистр и «ё» → «е»."""
+    return (text or "").lower().replace("ё", "е")
+
+
+def _region_after_vowel(word, start):
+    """Начало области R1/R2: позиция после первой согласной, идущей за гласной."""
+    for i in range(start + 1, len(word)):
+        if word[i] not in VOWELS and word[i - 1] in VOWELS:
+            return i + 1
+    return len(word)
+
+
+def _remove_ending(word, rv, endings, after_a_ya=frozenset()):
+    """Снять самое длинное окончание из ``endings``, лежащее в области RV."""
+    region = word[rv:]
+    for ending in endings:
+        if region.endswith(ending):
+            if ending in after_a_ya and not region[:-len(ending)].endswith(("а", "я")):
+                continue
+            return word[:-len(ending)], True
+    return word, False
+
+
+@lru_cache(maxsize=100_000)
+def stem(word):
+    """Основа слова по алгоритму Snowball (слово уже нормализовано)."""
+    rv = next((i + 1 for i, char in enumerate(word) if char in VOWELS), len(word))
+    r2 = _region_after_vowel(word, _region_after_vowel(word, 0))
+
+    # Шаг 1: деепричастие, иначе возвратность + прилагательное/глагол/существительное
+    word, found = _remove_ending(word, rv, PERFECTIVE_GERUND, PERFECTIVE_GERUND_1)
+    if not found:
+        word, _ = _remove_ending(word, rv, REFLEXIVE)
+        word, found = _remove_ending(word, rv, ADJECTIVE)
+        if found:
+            word, _ = _remove_ending(word, rv, PARTICIPLE, PARTICIPLE_1)
+        else:
+            word, found = _remove_ending(word, rv, VERB, VERB_1)
+            if not found:
+                word, _ = _remove_ending(word, rv, NOUN)
+
+    # Шаг 2: конечное «и»
+    if word[rv:].endswith("и"):
+        word = word[:-1]
+
+    # Шаг 3: словообразовательные суффиксы — только в R2
+    if r2 < len(word):
+        word, _ = _remove_ending(word, r2, DERIVATIONAL)
+
+    # Шаг 4: превосходная степень, двойное «н», мягкий знак
+    word, found = _remove_ending(word, rv, SUPERLATIVE)
+    if word[rv:].endswith("нн"):
+        word = word[:-1]
+    elif not found and word[rv:].endswith("ь"):
+        word = word[:-1]
+    return word
+
+
+def analyze(text):
+    """Разбить текст на основы слов, отбросив стоп-слова."""
+    return [
+        stem(word) for word in WORD_RE.findall(normalize(text))
+        if word not in STOP_WORDS
+    ]
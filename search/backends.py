@@ -0,0 +1,43 @@
+"""Выбор поискового бэкенда: инвертированный индекс или SQLite FTS5.
+
+Бэкенд задаётся настройкой ``SEARCH_BACKEND``: ``"index"`` (по умолчанию)
+или ``"fts5"``. Если FTS-таблицы в базе нет, используется индекс.
+"""
+from django.conf import settings
+
+from . import fts, indexing
+
+
+def use_fts():
+    return getattr(settings, "SEARCH_BACKEND", "index") == "fts5" and fts.is_available()
+
+
+def filter_recipes(queryset, query, fields=indexing.SEARCH_FIELDS):
+    """Отфильтровать рецепты по тексту запроса.
+
+    Возвращает пару (queryset, ranked): при ranked=True у рецептов есть колонка
+    ``fts.RANK`` и по ней можно сортировать по релевантности.
+    """
+    if use_fts():
+        return fts.filter_recipes(queryset, query), True
+    return indexing.filter_recipes(queryset, query, fields), False
+
+
+def rank_recipes(queryset, query, ranked, fields=indexing.SEARCH_FIELDS):
+    """Добавить колонку релевантности (``indexing.RELEVANCE``, больше — лучше).
+
+    ``ranked`` — второй элемент результата filter_recipes: у FTS5 ранг уже
+    посчитан, иначе оценка BM25F строится по инвертированному индексу.
+    Вес рейтинга задаётся настройкой ``SEARCH_RATING_BOOST``.
+    """
+    rating_boost = getattr(settings, "SEARCH_RATING_BOOST", 0.0)
+    if ranked:
+        return fts.rank_recipes(queryset, rating_boost)
+    return indexing.rank_recipes(queryset, query, fields, rating_boost)
+
+
+def rebuild(batch_size=1000):
+    """Перестроить все поисковые структуры. Возвращает число рецептов в индексе."""
+    count = indexing.rebuild_index(batch_size=batch_size)
+    fts.rebuild()
+    return count
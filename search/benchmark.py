@@ -0,0 +1,478 @@
+"""Замеры скорости поиска на синтетическом корпусе рецептов.
+
+Корпус воспроизводим: одинаковые ``size`` и ``seed`` дают одни и те же
+названия, ингредиенты и оценки, поэтому отчёты разных коммитов можно
+сравнивать между собой (см. compare_reports). ``size`` — число рецептов;
+ингредиенты рецептов (3–10 на рецепт), оценки (в среднем около трёх),
+изображения и пользователи растут вместе с ним.
+
+Страница поиска и API вызываются через тестовый клиент Django — со всеми
+middleware, шаблоном и сериализацией, как настоящий запрос. Для каждой
+формы запроса записываются холодный запрос (после смены поколения, когда
+кеши результатов пусты), p50/p95 повторных и число SQL-запросов.
+
+Корпус пишется в текущую базу данных: запускайте только на отдельной
+базе (команда ``manage.py benchmark_search`` сама создаёт тестовую).
+"""
+import contextlib
+import io
+import json
+import math
+import random
+import subprocess
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from recipes.cache import RECIPES, bump_generation
+from recipes.models import Category, Ingredient, Rating, Recipe, RecipeImage, RecipeIngredient, rating_from_totals
+from recipes.pagination import NEXT, encode_cursor, keyset_ordering
+from . import backends
+from .filters import SORT_OPTIONS
+from .ingredients import ingredient_index
+from .pantry import pantry_index
+from .suggestions import vocabulary_index
+
+# Стандартные размеры корпуса (число рецептов)
+SIZES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+
+DEFAULT_SEED = 42
+
+# ── Словарь корпуса ────────────────────────────────
+
+CATEGORIES = [
+    ("Супы", "soups"),
+    ("Салаты", "salads"),
+    ("Выпечка", "baking"),
+    ("Горячее", "main"),
+    ("Десерты", "desserts"),
+    ("Завтраки", "breakfast"),
+    ("Закуски", "snacks"),
+    ("Напитки", "drinks"),
+]
+
+# (блюдо, род: 0 — м., 1 — ж., 2 — ср., 3 — мн. ч., категория)
+DISHES = [
+    ("суп", 0, "soups"), ("борщ", 0, "soups"), ("щи", 3, "soups"), ("солянка", 1, "soups"),
+    ("уха", 1, "soups"), ("рассольник", 0, "soups"),
+    ("салат", 0, "salads"), ("винегрет", 0, "salads"),
+    ("пирог", 0, "baking"), ("пирожки", 3, "baking"), ("хлеб", 0, "baking"), ("кекс", 0, "baking"),
+    ("котлеты", 3, "main"), ("плов", 0, "main"), ("рагу", 2, "main"), ("жаркое", 2, "main"),
+    ("запеканка", 1, "main"), ("паста", 1, "main"), ("голубцы", 3, "main"), ("пельмени", 3, "main"),
+    ("торт", 0, "desserts"), ("печенье", 2, "desserts"), ("пудинг", 0, "desserts"),
+    ("каша", 1, "breakfast"), ("омлет", 0, "breakfast"), ("блины", 3, "breakfast"),
+    ("оладьи", 3, "breakfast"), ("сырники", 3, "breakfast"),
+    ("бутерброды", 3, "snacks"), ("закуска", 1, "snacks"), ("паштет", 0, "snacks"),
+    ("компот", 0, "drinks"), ("морс", 0, "drinks"), ("смузи", 2, "drinks"), ("кисель", 0, "drinks"),
+]
+
+# Прилагательные в формах м., ж., ср. рода и мн. числа
+ADJECTIVES = [
+    ("домашний", "домашняя", "домашнее", "домашние"),
+    ("быстрый", "быстрая", "быстрое", "быстрые"),
+    ("куриный", "куриная", "куриное", "куриные"),
+    ("грибной", "грибная", "грибное", "грибные"),
+    ("овощной", "овощная", "овощное", "овощные"),
+    ("сырный", "сырная", "сырное", "сырные"),
+    ("летний", "летняя", "летнее", "летние"),
+    ("праздничный", "праздничная", "праздничное", "праздничные"),
+    ("постный", "постная", "постное", "постные"),
+    ("бабушкин", "бабушкина", "бабушкино", "бабушкины"),
+    ("острый", "острая", "острое", "острые"),
+    ("нежный", "нежная", "нежное", "нежные"),
+    ("ягодный", "ягодная", "ягодное", "ягодные"),
+    ("картофельный", "картофельная", "картофельное", "картофельные"),
+]
+
+# (название, творительный падеж для «… с …» или None, единица измерения)
+INGREDIENTS = [
+    ("Курица", "курицей", "г"), ("Говядина", "говядиной", "г"), ("Свинина", "свининой", "г"),
+    ("Фарш мясной", "фаршем", "г"), ("Лосось", "лососем", "г"), ("Треска", "треской", "г"),
+    ("Креветки", "креветками", "г"), ("Картофель", "картофелем", "г"), ("Морковь", "морковью", "шт"),
+    ("Лук репчатый", "луком", "шт"), ("Чеснок", "чесноком", "зуб."), ("Капуста белокочанная", "капустой", "г"),
+    ("Свёкла", "свёклой", "шт"), ("Помидоры", "помидорами", "шт"), ("Огурцы", "огурцами", "шт"),
+    ("Перец болгарский", "перцем", "шт"), ("Кабачок", "кабачком", "шт"), ("Баклажаны", "баклажанами", "шт"),
+    ("Тыква", "тыквой", "г"), ("Шампиньоны", "шампиньонами", "г"), ("Грибы лесные", "грибами", "г"),
+    ("Фасоль", "фасолью", "г"), ("Горох", "горохом", "г"), ("Чечевица", "чечевицей", "г"),
+    ("Рис", "рисом", "г"), ("Гречка", "гречкой", "г"), ("Овсяные хлопья", "овсянкой", "г"),
+    ("Макароны", "макаронами", "г"), ("Мука пшеничная", None, "г"), ("Манка", None, "г"),
+    ("Яйца", "яйцами", "шт"), ("Молоко", None, "мл"), ("Кефир", None, "мл"),
+    ("Сметана", "сметаной", "г"), ("Творог", "творогом", "г"), ("Сыр твёрдый", "сыром", "г"),
+    ("Масло сливочное", None, "г"), ("Масло подсолнечное", None, "мл"), ("Сливки", "сливками", "мл"),
+    ("Сахар", None, "г"), ("Соль", None, "г"), ("Перец чёрный молотый", None, "г"),
+    ("Мёд", "мёдом", "ст. л."), ("Лимон", "лимоном", "шт"), ("Яблоки", "яблоками", "шт"),
+    ("Клубника", "клубникой", "г"), ("Вишня", "вишней", "г"), ("Черника", "черникой", "г"),
+    ("Изюм", "изюмом", "г"), ("Орехи грецкие", "орехами", "г"), ("Укроп", "укропом", "пучок"),
+    ("Петрушка", "петрушкой", "пучок"), ("Лавровый лист", None, "шт"), ("Паприка", None, "ч. л."),
+    ("Томатная паста", None, "ст. л."), ("Майонез", None, "г"), ("Горчица", "горчицей", "ч. л."),
+    ("Сода", None, "ч. л."), ("Дрожжи", None, "г"), ("Шоколад", "шоколадом", "г"),
+]
+
+# Торговые марки для вариантов ингредиентов («Сметана «Зелёный луг»») — выдуманные
+BRANDS = [
+    "Зелёный луг", "Северное", "Родные просторы", "Дары леса", "Солнечный край", "Летний сад",
+    "Добрый двор", "Золотая нива", "Тихая заводь", "Сибирская марка", "Утренняя роса", "Вкусный дом",
+]
+
+FIRST_NAMES = [
+    "анна", "мария", "елена", "ольга", "наталья", "ирина", "светлана", "татьяна",
+    "алексей", "дмитрий", "сергей", "андрей", "михаил", "иван", "николай", "павел",
+]
+
+DESCRIPTION_SENTENCES = [
+    "Простой рецепт на каждый день.",
+    "Готовится из самых доступных продуктов.",
+    "Понравится и детям, и взрослым.",
+    "Подавайте горячим со сметаной и свежей зеленью.",
+    "Отличный вариант для праздничного стола.",
+    "Хорошо хранится в холодильнике два-три дня.",
+    "Можно приготовить заранее и разогреть перед подачей.",
+    "Рецепт достался мне от бабушки.",
+    "Сытно, вкусно и недорого.",
+]
+
+STEPS = [
+    "Подготовьте все ингредиенты.",
+    "Нарежьте {ingredient} небольшими кубиками.",
+    "Обжарьте {ingredient} на сковороде до золотистого цвета.",
+    "Смешайте всё в большой миске.",
+    "Варите на медленном огне {minutes} минут.",
+    "Выпекайте в духовке при 180 °C {minutes} минут.",
+    "Посолите и поперчите по вкусу.",
+    "Дайте настояться и подавайте.",
+]
+
+COOK_TIMES = [10, 15, 20, 25, 30, 40, 45, 60, 90, 120]
+
+DIFFICULTIES = [("easy", 5), ("medium", 3), ("hard", 1)]
+
+# Сколько оценок у рецепта (0–8) и какие оценки ставят чаще
+RATING_COUNT_WEIGHTS = [20, 10, 12, 14, 12, 10, 8, 7, 7]
+RATING_VALUE_WEIGHTS = [5, 7, 15, 35, 38]
+
+# Доля рецептов с фотографиями (у таких 1–3 изображения)
+IMAGE_SHARE = 0.6
+
+
+def parse_size(value):
+    """Размер корпуса: «10k», «100k», «1m» или число рецептов."""
+    key = str(value).strip().lower()
+    if key in SIZES:
+        return SIZES[key]
+    size = int(key)
+    if size <= 0:
+        raise ValueError("Размер корпуса должен быть положительным")
+    return size
+
+
+# ── Генерация корпуса ──────────────────────────────
+
+def _ingredient_names(count, rng):
+    """Названия ингредиентов: сначала базовые, затем варианты с марками."""
+    base = [name for name, _, _ in INGREDIENTS]
+    variants = [f"{name} «{brand}»" for name in base for brand in BRANDS]
+    rng.shuffle(variants)
+    return (base + variants)[:count]
+
+
+def _title(rng, dish, gender, with_ingredient):
+    words = []
+    if rng.random() < 0.7:
+        words.append(rng.choice(ADJECTIVES)[gender])
+    words.append(dish)
+    if with_ingredient is not None:
+        words.append(f"с {with_ingredient}")
+    title = " ".join(words)
+    return title[0].upper() + title[1:]
+
+
+def _description(rng, title, cook_time):
+    sentences = rng.sample(DESCRIPTION_SENTENCES, rng.randint(1, 3))
+    return f"{title} за {cook_time} минут. " + " ".join(sentences)
+
+
+def _instruction(rng, ingredient_names, cook_time):
+    steps = []
+    for number, step in enumerate(rng.sample(STEPS, rng.randint(3, 6)), start=1):
+        text = step.format(ingredient=rng.choice(ingredient_names).lower(), minutes=cook_time)
+        steps.append(f"{number}. {text}")
+    return "\n".join(steps)
+
+
+def _rating_values(rng):
+    count = rng.choices(range(len(RATING_COUNT_WEIGHTS)), weights=RATING_COUNT_WEIGHTS)[0]
+    return rng.choices(range(1, 6), weights=RATING_VALUE_WEIGHTS, k=count)
+
+
+def generate_corpus(size, seed=DEFAULT_SEED, chunk_size=2000, progress=None):
+    """Заполнить пустую базу корпусом из ``size`` рецептов. Возвращает число строк по моделям.
+
+    Строки пишутся ``bulk_create`` пачками по ``chunk_size`` рецептов, сигналы
+    не отправляются: агрегаты рейтинга и поля главного изображения
+    заполняются сразу, поисковый индекс
+    перестраивается в конце, поколения поисковых кешей сменяются явно.
+    ``progress(done, total)`` вызывается после каждой пачки.
+    """
+    rng = random.Random(seed)
+    User = get_user_model()
+    counts = {}
+
+    with transaction.atomic():
+        users = User.objects.bulk_create([
+            User(username=f"{rng.choice(FIRST_NAMES)}{number}", password="!")
+            for number in range(max(50, size // 20))
+        ])
+        counts["users"] = len(users)
+
+        categories = {
+            slug: category
+            for category, (_, slug) in zip(
+                Category.objects.bulk_create([Category(name=name, slug=slug) for name, slug in CATEGORIES]),
+                CATEGORIES,
+            )
+        }
+        counts["categories"] = len(categories)
+
+        count = min(len(INGREDIENTS) + size // 100, len(INGREDIENTS) * (1 + len(BRANDS)))
+        units = {name: unit for name, _, unit in INGREDIENTS}
+        ingredients = Ingredient.objects.bulk_create([
+            Ingredient(name=name, default_unit=units.get(name, ""))
+            for name in _ingredient_names(count, rng)
+        ])
+        counts["ingredients"] = len(ingredients)
+        # Базовые ингредиенты встречаются в рецептах в десять раз чаще вариантов
+        weights = [10 if index < len(INGREDIENTS) else 1 for index in range(len(ingredients))]
+        with_forms = [
+            (ingredients[index], instrumental)
+            for index, (_, instrumental, _) in enumerate(INGREDIENTS) if instrumental
+        ]
+
+        counts.update(recipes=0, recipe_ingredients=0, ratings=0, images=0)
+        for start in range(0, size, chunk_size):
+            plans = []
+            for number in range(start, min(start + chunk_size, size)):
+                dish, gender, category = rng.choice(DISHES)
+                main = rng.choice(with_forms) if rng.random() < 0.6 else None
+                chosen = {main[0].pk: main[0]} if main else {}
+                for ingredient in rng.choices(ingredients, weights=weights, k=rng.randint(3, 10)):
+                    chosen.setdefault(ingredient.pk, ingredient)
+                cook_time = rng.choice(COOK_TIMES)
+                title = _title(rng, dish, gender, main[1] if main else None)
+                values = _rating_values(rng)
+                image_names = [
+                    f"recipe_images/benchmark/{number}_{position}.jpg"
+                    for position in range(rng.randint(1, 3) if rng.random() < IMAGE_SHARE else 0)
+                ]
+                plans.append((
+                    Recipe(
+                        author=rng.choice(users),
+                        title=title,
+                        description=_description(rng, title, cook_time),
+                        instruction=_instruction(rng, [i.name for i in chosen.values()], cook_time),
+                        cook_time=cook_time,
+                        category=categories[category],
+                        difficulty=rng.choices(
+                            [d for d, _ in DIFFICULTIES], weights=[w for _, w in DIFFICULTIES],
+                        )[0],
+                        rating_sum=sum(values),
+                        rating_count=len(values),
+                        rating=rating_from_totals(sum(values), len(values)),
+                        cover_image=image_names[0] if image_names else "",
+                        image_count=len(image_names),
+                    ),
+                    list(chosen.values()),
+                    list(zip(rng.sample(users, len(values)), values)),
+                    image_names,
+                ))
+
+            recipes = Recipe.objects.bulk_create([recipe for recipe, _, _, _ in plans])
+            links, ratings, images = [], [], []
+            for recipe, (_, chosen, rated, image_names) in zip(recipes, plans):
+                links.extend(
+                    RecipeIngredient(
+                        recipe=recipe, ingredient=ingredient,
+                        amount=Decimal(rng.choice([1, 2, 3, 50, 100, 200, 250, 500])),
+                        unit=ingredient.default_unit,
+                    )
+                    for ingredient in chosen
+                )
+                ratings.extend(Rating(recipe=recipe, user=user, value=value) for user, value in rated)
+                images.extend(
+                    RecipeImage(recipe=recipe, image=name, is_main=position == 0, position=position)
+                    for position, name in enumerate(image_names)
+                )
+            RecipeIngredient.objects.bulk_create(links)
+            Rating.objects.bulk_create(ratings)
+            RecipeImage.objects.bulk_create(images)
+            counts["recipes"] += len(recipes)
+            counts["recipe_ingredients"] += len(links)
+            counts["ratings"] += len(ratings)
+            counts["images"] += len(images)
+            if progress is not None:
+                progress(counts["recipes"], size)
+
+    backends.rebuild()
+    _reset_search_state()
+    return counts
+
+
+def _reset_search_state():
+    """Сбросить поисковые кеши и структуры в памяти после записи мимо сигналов."""
+    cache.delete("search:field-statistics")
+    bump_generation(RECIPES)
+    for index in (ingredient_index, pantry_index, vocabulary_index):
+        bump_generation(index.generation_name)
+        index.invalidate()
+
+
+# ── Формы запросов ─────────────────────────────────
+
+PAGE = "search_recipes"
+API = "api_search_recipes"
+STREAM = "api_search_recipes (stream)"
+
+
+def _deep_cursor(recipes_count):
+    """Курсор на середину списка «сначала новые» — как после долгого листания."""
+    ordering = keyset_ordering(SORT_OPTIONS["newest"])
+    rows = Recipe.objects.order_by(*ordering).values_list(*[field.lstrip("-") for field in ordering])
+    middle = list(rows[recipes_count // 2:recipes_count // 2 + 1])
+    return encode_cursor(NEXT, list(middle[0]) if middle else [])
+
+
+def query_shapes(recipes_count):
+    """Формы запросов для замера: список (имя, вид, параметры)."""
+    shapes = [
+        ("page:single_word", PAGE, {"q": "суп"}),
+        ("page:multi_word", PAGE, {"q": "грибной суп с курицей"}),
+        ("page:typo", PAGE, {"q": "барщ"}),
+        ("page:filters_only", PAGE, {"category": "soups", "difficulty": "easy", "max_cook_time": "45"}),
+        ("page:has_image", PAGE, {"has_image": "on", "min_cook_time": "30"}),
+        ("page:query_and_filters", PAGE, {"q": "пирог с яблоками", "category": "baking", "has_image": "on"}),
+        ("page:deep_page", PAGE, {"page": str(max(1, recipes_count // 20))}),
+        ("page:deep_cursor", PAGE, {"cursor": _deep_cursor(recipes_count)}),
+    ]
+    for sort_by in SORT_OPTIONS:
+        params = {"sort_by": sort_by}
+        if sort_by == "relevance":
+            params["q"] = "котлеты"
+        shapes.append((f"page:sort_{sort_by}", PAGE, params))
+    shapes += [
+        ("api:single_word", API, {"query": "суп"}),
+        ("api:multi_word", API, {"query": "грибной суп с курицей"}),
+        ("api:filters_only", API, {"category": "soups", "min_rating": "4", "difficulty": "easy"}),
+        ("api:ingredient_name", API, {"ingredient_name": "Картофель"}),
+        ("api:stream", STREAM, {"query": "суп", "limit": 1000}),
+    ]
+    return shapes
+
+
+# ── Замеры ─────────────────────────────────────────
+
+def percentile(values, fraction):
+    """Перцентиль по ближайшему рангу (без интерполяции)."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def _request(client, view, params):
+    if view == PAGE:
+        return client.get(reverse("search"), params)
+    url = reverse("api_search_recipes")
+    if view == STREAM:
+        url += "?stream=1"
+    return client.post(url, json.dumps(params), content_type="application/json")
+
+
+def _timed(client, view, params):
+    """Выполнить запрос: (секунды, число SQL-запросов). Потоковый ответ читается целиком."""
+    with CaptureQueriesContext(connection) as queries:
+        started = time.perf_counter()
+        response = _request(client, view, params)
+        if response.streaming:
+            b"".join(response.streaming_content)
+        elapsed = time.perf_counter() - started
+    if response.status_code != 200:
+        raise RuntimeError(f"{view} {params}: HTTP {response.status_code}")
+    return elapsed, len(queries)
+
+
+def measure(client, view, params, repeat):
+    """Холодный запрос и ``repeat`` повторных: словарь для отчёта (время в мс)."""
+    # Новое поколение — кеши результатов и фасетов пусты, как после изменения данных
+    bump_generation(RECIPES)
+    cold, cold_queries = _timed(client, view, params)
+    timings, queries = [], cold_queries
+    for _ in range(repeat):
+        elapsed, queries = _timed(client, view, params)
+        timings.append(elapsed)
+    timings = timings or [cold]
+    return {
+        "view": view,
+        "params": params,
+        "cold_ms": round(cold * 1000, 2),
+        "p50_ms": round(percentile(timings, 0.5) * 1000, 2),
+        "p95_ms": round(percentile(timings, 0.95) * 1000, 2),
+        "queries_cold": cold_queries,
+        "queries": queries,
+    }
+
+
+def _revision():
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=settings.BASE_DIR, capture_output=True, text=True, timeout=5,
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return result.stdout.strip() or None
+
+
+def run_benchmark(repeat=20, shapes=None, progress=None):
+    """Замерить все формы запросов на текущей базе. Возвращает отчёт (JSON-совместимый словарь).
+
+    ``progress(name, result)`` вызывается после каждой формы.
+    """
+    recipes_count = Recipe.objects.count()
+    shapes = query_shapes(recipes_count) if shapes is None else shapes
+    client = Client()
+    results = {}
+    # Вьюхи печатают отладочные сообщения — в отчёт они не должны попадать
+    with contextlib.redirect_stdout(io.StringIO()):
+        # Структуры в памяти строятся один раз при первом обращении — это не время запроса
+        for index in (ingredient_index, pantry_index, vocabulary_index):
+            index.ensure_loaded()
+        for name, view, params in shapes:
+            results[name] = measure(client, view, params, repeat)
+            if progress is not None:
+                progress(name, results[name])
+    return {
+        "meta": {
+            "revision": _revision(),
+            "recipes": recipes_count,
+            "repeat": repeat,
+            "backend": "fts5" if backends.use_fts() else "index",
+            "database": connection.vendor,
+        },
+        "results": results,
+    }
+
+
+def compare_reports(previous, current):
+    """Сравнить два отчёта: список (имя, p50 было, p50 стало, изменение в %, запросов было, стало)."""
+    rows = []
+    for name, result in current["results"].items():
+        before = previous.get("results", {}).get(name)
+        if before is None:
+            continue
+        change = (result["p50_ms"] / before["p50_ms"] - 1) * 100 if before["p50_ms"] else 0.0
+        rows.append((name, before["p50_ms"], result["p50_ms"], change, before["queries"], result["queries"]))
+    return rows
@@ -0,0 +1,105 @@
+"""Параметры поиска рецептов и построение отфильтрованного queryset'а.
+
+Общая часть страницы поиска, подсчёта фасетов и кеша результатов:
+параметры запроса разбираются один раз в словарь с нормализованными
+значениями, а фильтры применяются к любому queryset'у рецептов.
+"""
+from recipes.models import POPULARITY, Recipe
+from recipes.pagination import keyset_ordering
+from . import backends
+from .indexing import RELEVANCE
+
+SORT_OPTIONS = {
+    'relevance': None,                 # по релевантности (BM25), см. order_recipes
+    'newest': '-created_at',           # от новых к старым
+    'oldest': 'created_at',            # от старых к новым
+    'rating_high': '-rating',          # от высокого к низкому
+    'rating_low': 'rating',            # от низкого к высокому
+    'time_short': 'cook_time',         # от быстрых к долгим
+    'time_long': '-cook_time',         # от долгих к быстрым
+    'title_a_z': 'title',              # от А до Я
+    'title_z_a': '-title',             # от Я до А
+    'popular': f'-{POPULARITY}',       # по коллекциям, оценкам и комментариям
+}
+
+# Параметры, которые сужают выборку (sort_by только упорядочивает её)
+FILTER_PARAMS = ('q', 'category', 'difficulty', 'min_cook_time', 'max_cook_time', 'has_image')
+
+
+def _int_or_none(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None  # Некорректный ввод — игнорируем
+
+
+def parse_params(data):
+    """Нормализованные параметры поиска из QueryDict (или обычного словаря)."""
+    sort_by = data.get('sort_by', '')
+    return {
+        'q': ' '.join(data.get('q', '').split()),
+        'category': data.get('category', '').strip(),
+        'difficulty': data.get('difficulty', '').strip(),
+        'min_cook_time': _int_or_none(data.get('min_cook_time', '').strip()),
+        'max_cook_time': _int_or_none(data.get('max_cook_time', '').strip()),
+        'has_image': data.get('has_image', '') == 'on',
+        'sort_by': sort_by if sort_by in SORT_OPTIONS else '',
+    }
+
+
+def is_empty(params):
+    """True, если ни один фильтр не задан — выборка совпадает со всеми рецептами."""
+    return not any(params[name] not in ('', None, False) for name in FILTER_PARAMS)
+
+
+def filter_recipes(params, queryset=None):
+    """Применить фильтры к рецептам. Возвращает пару (queryset, ranked), как backends.filter_recipes."""
+    recipes = Recipe.objects.all() if queryset is None else queryset
+
+    # Поиск по тексту — через инвертированный индекс или FTS5 (см. SEARCH_BACKEND)
+    ranked = False
+    if params['q']:
+        recipes, ranked = backends.filter_recipes(recipes, params['q'])
+
+    # Фильтр по категории
+    if params['category']:
+        recipes = recipes.filter(category__slug=params['category'])
+
+    # Фильтр по сложности
+    if params['difficulty']:
+        recipes = recipes.filter(difficulty=params['difficulty'])
+
+    # Фильтр по времени приготовления — ОТ и ДО
+    if params['min_cook_time'] is not None:
+        recipes = recipes.filter(cook_time__gte=params['min_cook_time'])
+    if params['max_cook_time'] is not None:
+        recipes = recipes.filter(cook_time__lte=params['max_cook_time'])
+
+    # Фильтр по наличию картинки — по счётчику на рецепте, без JOIN'а и .distinct()
+    if params['has_image']:
+        recipes = recipes.filter(image_count__gt=0)
+
+    return recipes, ranked
+
+
+def order_recipes(recipes, params, ranked):
+    """Отсортировать рецепты. Возвращает пару (queryset, ordering).
+
+    ``ordering`` — ключ для keyset-пагинации; None, если сортировка по
+    релевантности и листать можно только по номеру страницы.
+    """
+    sort_by = params['sort_by']
+    if params['q'] and sort_by in ('', 'relevance'):
+        # По релевантности (BM25) — по умолчанию для текстовых запросов, затем по новизне
+        recipes = backends.rank_recipes(recipes, params['q'], ranked)
+        return recipes.order_by(f'-{RELEVANCE}', '-created_at'), None
+    if sort_by == 'popular':
+        # Популярность считается из счётчиков рецепта, без JOIN'ов и GROUP BY
+        recipes = recipes.with_popularity()
+    # id разрешает ничьи и служит ключом курсора
+    if SORT_OPTIONS.get(sort_by):
+        ordering = keyset_ordering(SORT_OPTIONS[sort_by])
+    else:
+        # По умолчанию (и для «релевантности» без запроса) — по новизне
+        ordering = keyset_ordering('-created_at')
+    return recipes.order_by(*ordering), ordering
@@ -0,0 +1,111 @@
+"""Полнотекстовый поиск на SQLite FTS5.
+
+Виртуальная таблица ``search_recipe_fts`` (rowid = id рецепта) создаётся
+миграцией ``0004_recipe_fts`` и поддерживается триггерами на таблицах
+рецептов, ингредиентов рецепта и ингредиентов (с ``0006`` триггеры
+сворачивают «ё» в «е»).
+"""
+from django.db import connection, OperationalError
+
+from recipes.models import Recipe
+from .indexing import tokenize
+
+FTS_TABLE = "search_recipe_fts"
+
+# Веса колонок для bm25: title, description, instruction, ingredients
+BM25_WEIGHTS = (10.0, 2.0, 1.0, 5.0)
+
+# Имя дополнительной колонки с рангом (чем меньше, тем релевантнее)
+RANK = "fts_rank"
+
+# Колонка релевантности для сортировки по ней (чем больше, тем релевантнее) —
+# то же имя, что у search.indexing.RELEVANCE
+RELEVANCE = "relevance"
+
+
+def _fold(expression):
+    """«ё» → «е» на стороне SQL — так же, как search.analysis.normalize."""
+    return f"replace(replace({expression}, 'ё', 'е'), 'Ё', 'Е')"
+
+
+_INGREDIENT_NAMES = """coalesce((SELECT group_concat(i.name, ' ')
+    FROM recipes_recipeingredient ri
+    JOIN recipes_ingredient i ON i.id = ri.ingredient_id
+    WHERE ri.recipe_id = r.id), '')"""
+
+POPULATE_SQL = f"""
+    INSERT INTO {FTS_TABLE}(rowid, title, description, instruction, ingredients)
+    SELECT r.id, {_fold("r.title")}, {_fold("r.description")}, {_fold("r.instruction")},
+           {_fold(_INGREDIENT_NAMES)}
+    FROM recipes_recipe r
+"""
+
+_available = None
+
+
+def is_available():
+    """Есть ли в текущей базе FTS-таблица (SQLite со сборкой FTS5)."""
+    global _available
+    if _available is None:
+        if connection.vendor != "sqlite":
+            _available = False
+        else:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE]
+                )
+                _available = cursor.fetchone() is not None
+    return _available
+
+
+def match_expression(query):
+    """Превратить пользовательский запрос в безопасное выражение MATCH.
+
+    Каждое слово приводится к основе, берётся в кавычки и ищется по префиксу
+    (так «картошкой» находит «картошка»), слова объединяются по И.
+    """
+    return " ".join(f'"{token}"*' for token in dict.fromkeys(tokenize(query)))
+
+
+def _bm25():
+    weights = ", ".join(str(weight) for weight in BM25_WEIGHTS)
+    return f"bm25({FTS_TABLE}, {weights})"
+
+
+def filter_recipes(queryset, query):
+    """Оставить рецепты, подходящие под запрос, и добавить колонку ранга bm25."""
+    expression = match_expression(query)
+    if not expression:
+        return queryset.none()
+    recipe_table = Recipe._meta.db_table
+    return queryset.extra(
+        select={RANK: _bm25()},
+        tables=[FTS_TABLE],
+        where=[f"{FTS_TABLE}.rowid = {recipe_table}.id", f"{FTS_TABLE} MATCH %s"],
+        params=[expression],
+    )
+
+
+def rank_recipes(queryset, rating_boost=0.0):
+    """Добавить колонку ``RELEVANCE`` к результату filter_recipes.
+
+    bm25 в SQLite отрицателен (меньше — лучше), здесь знак обращён, чтобы
+    сортировать так же, как по search.indexing.rank_recipes. ``rating_boost``
+    подмешивает рейтинг: оценка умножается на ``1 + rating_boost * rating / 5``.
+    """
+    relevance = f"-{_bm25()}"
+    if rating_boost:
+        boost = float(rating_boost) / 5
+        relevance = f"{relevance} * (1 + {boost!r} * {Recipe._meta.db_table}.rating)"
+    return queryset.extra(select={RELEVANCE: relevance})
+
+
+def rebuild():
+    """Перезаполнить FTS-таблицу из текущих данных."""
+    with connection.cursor() as cursor:
+        try:
+            cursor.execute(f"DELETE FROM {FTS_TABLE}")
+        except OperationalError:
+            return False
+        cursor.execute(POPULATE_SQL)
+    return True
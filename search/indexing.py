@@ -0,0 +1,208 @@
+"""Инвертированный индекс рецептов: построение, поиск и ранжирование по нему."""
+import math
+from collections import Counter
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import (
+    Case, Count, ExpressionWrapper, F, FloatField, OuterRef, Prefetch, Subquery, Sum, Value, When,
+)
+from django.db.models.functions import Cast, Coalesce
+
+from recipes.models import Recipe, Ingredient
+from .analysis import analyze
+from .models import SearchIndex
+
+MAX_TOKEN_LENGTH = SearchIndex._meta.get_field("token").max_length
+
+# Поля, по которым ищет страница поиска (название, ингредиенты, автор)
+SEARCH_FIELDS = (
+    SearchIndex.FIELD_TITLE,
+    SearchIndex.FIELD_INGREDIENT,
+    SearchIndex.FIELD_AUTHOR,
+)
+
+# Поля, по которым ищет API (название, описание, ингредиенты)
+API_SEARCH_FIELDS = (
+    SearchIndex.FIELD_TITLE,
+    SearchIndex.FIELD_DESCRIPTION,
+    SearchIndex.FIELD_INGREDIENT,
+)
+
+# Веса полей в BM25F: название > ингредиенты > описание > автор
+FIELD_WEIGHTS = {
+    SearchIndex.FIELD_TITLE: 4.0,
+    SearchIndex.FIELD_INGREDIENT: 2.0,
+    SearchIndex.FIELD_DESCRIPTION: 1.0,
+    SearchIndex.FIELD_AUTHOR: 0.5,
+}
+
+# Параметры BM25: насыщение частоты терма и сила нормировки по длине поля
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Имя аннотации с релевантностью (чем больше, тем релевантнее)
+RELEVANCE = "relevance"
+
+# Средние длины полей меняются медленно — пересчитываем их раз в несколько минут
+STATISTICS_TIMEOUT = 600
+
+
+def tokenize(text):
+    """Разбить текст на термы — основы слов без стоп-слов (см. search.analysis).
+
+    Одна и та же функция используется и при индексации, и для разбора запроса.
+    """
+    return [token for token in analyze(text) if len(token) <= MAX_TOKEN_LENGTH]
+
+
+def recipe_postings(recipe, ingredient_names, username):
+    """Собрать (без сохранения) записи индекса для одного рецепта."""
+    fields = {
+        SearchIndex.FIELD_TITLE: tokenize(recipe.title),
+        SearchIndex.FIELD_INGREDIENT: [
+            token for name in ingredient_names for token in tokenize(name)
+        ],
+        SearchIndex.FIELD_DESCRIPTION: tokenize(recipe.description),
+        SearchIndex.FIELD_AUTHOR: tokenize(username),
+    }
+    postings = []
+    for field, tokens in fields.items():
+        for token, frequency in Counter(tokens).items():
+            postings.append(SearchIndex(
+                token=token, field=field, recipe_id=recipe.pk,
+                frequency=frequency, length=len(tokens),
+            ))
+    return postings
+
+
+def index_recipe(recipe_id):
+    """Переиндексировать один рецепт (или убрать его из индекса, если он удалён)."""
+    recipe = Recipe.objects.select_related("author").filter(pk=recipe_id).first()
+    with transaction.atomic():
+        SearchIndex.objects.filter(recipe_id=recipe_id).delete()
+        if recipe is None:
+            return
+        names = recipe.ingredients.values_list("name", flat=True)
+        SearchIndex.objects.bulk_create(
+            recipe_postings(recipe, names, recipe.author.username)
+        )
+
+
+def rebuild_index(batch_size=1000):
+    """Полностью перестроить индекс. Возвращает число проиндексированных рецептов."""
+    recipes = (
+        Recipe.objects
+        .select_related("author")
+        .only("id", "title", "description", "author", "author__username")
+        .prefetch_related(Prefetch("ingredients", queryset=Ingredient.objects.only("id", "name")))
+        .order_by("pk")
+    )
+    count = 0
+    batch = []
+    with transaction.atomic():
+        SearchIndex.objects.all().delete()
+        for recipe in recipes.iterator(chunk_size=batch_size):
+            names = [ingredient.name for ingredient in recipe.ingredients.all()]
+            batch.extend(recipe_postings(recipe, names, recipe.author.username))
+            count += 1
+            if len(batch) >= batch_size:
+                SearchIndex.objects.bulk_create(batch)
+                batch = []
+        SearchIndex.objects.bulk_create(batch)
+    return count
+
+
+def filter_recipes(queryset, query, fields=SEARCH_FIELDS):
+    """Оставить рецепты, в которых встречаются все слова запроса.
+
+    Каждое слово превращается в подзапрос по posting list'у, пересечение
+    выполняет SQLite по уникальному индексу — без REGEXP и .distinct().
+    """
+    tokens = tokenize(query)
+    if not tokens:
+        return queryset.none()
+    for token in dict.fromkeys(tokens):
+        queryset = queryset.filter(pk__in=SearchIndex.objects.filter(
+            token=token, field__in=fields,
+        ).values("recipe_id"))
+    return queryset
+
+
+def field_statistics():
+    """Число рецептов в индексе и средняя длина каждого поля (из кеша)."""
+    statistics = cache.get("search:field-statistics")
+    if statistics is None:
+        documents = SearchIndex.objects.values("recipe_id").distinct().count()
+        # length одинаков у всех термов поля, поэтому сумма длин = Σ частот
+        totals = dict(
+            SearchIndex.objects.order_by().values("field")
+            .annotate(total=Sum("frequency")).values_list("field", "total")
+        )
+        lengths = {
+            field: totals.get(field, 0) / documents if documents else 0
+            for field in FIELD_WEIGHTS
+        }
+        statistics = (documents, lengths)
+        cache.set("search:field-statistics", statistics, STATISTICS_TIMEOUT)
+    return statistics
+
+
+def rank_recipes(queryset, query, fields=SEARCH_FIELDS, rating_boost=0.0):
+    """Добавить к рецептам аннотацию ``RELEVANCE`` — оценку BM25F по запросу.
+
+    Частоты термов и длины полей уже лежат в индексе, документная частота
+    считается по posting list'ам только слов запроса, средние длины полей
+    берутся из кеша. Сама оценка — одно SQL-выражение, поэтому сортировка
+    по ней стоит как обычный ``order_by`` по аннотации.
+
+    ``rating_boost`` подмешивает рейтинг: оценка умножается на
+    ``1 + rating_boost * rating / 5``.
+    """
+    tokens = list(dict.fromkeys(tokenize(query)))
+    if not tokens:
+        return queryset.annotate(**{RELEVANCE: Value(0.0, output_field=FloatField())})
+    documents, lengths = field_statistics()
+    frequencies = dict(
+        SearchIndex.objects.filter(token__in=tokens, field__in=fields).order_by()
+        .values("token").annotate(df=Count("recipe_id", distinct=True))
+        .values_list("token", "df")
+    )
+    # idf в варианте log(1 + …): даже у самых частых термов вес положительный
+    idf = {
+        token: math.log(1 + (documents - df + 0.5) / (df + 0.5))
+        for token, df in frequencies.items()
+    }
+    if not idf:
+        return queryset.annotate(**{RELEVANCE: Value(0.0, output_field=FloatField())})
+
+    weight = Case(
+        *[
+            When(token=token, field=field, then=Value(FIELD_WEIGHTS[field] * token_idf))
+            for token, token_idf in idf.items() for field in fields
+        ],
+        default=Value(0.0),
+        output_field=FloatField(),
+    )
+    length_norm = Case(
+        *[
+            When(field=field, then=Value(BM25_K1 * BM25_B / lengths[field]))
+            for field in fields if lengths.get(field)
+        ],
+        default=Value(0.0),
+        output_field=FloatField(),
+    )
+    score = ExpressionWrapper(
+        weight * F("frequency") * (BM25_K1 + 1)
+        / (F("frequency") + BM25_K1 * (1 - BM25_B) + F("length") * length_norm),
+        output_field=FloatField(),
+    )
+    scores = (
+        SearchIndex.objects
+        .filter(recipe=OuterRef("pk"), token__in=list(idf), field__in=fields)
+        .order_by().values("recipe").annotate(score=Sum(score)).values("score")
+    )
+    relevance = Coalesce(Subquery(scores, output_field=FloatField()), Value(0.0))
+    if rating_boost:
+        relevance = relevance * (1 + rating_boost / 5 * Cast("rating", FloatField()))
+    return queryset.annotate(**{RELEVANCE: ExpressionWrapper(relevance, output_field=FloatField())})
@@ -0,0 +1,155 @@
+"""Индекс названий ингредиентов в памяти процесса.
+
+Вместо запроса к базе на каждое нажатие клавиши держим два отсортированных
+массива и ищем в них двоичным поиском:
+
+* ``prefixes`` — нормализованные названия, для поиска по началу;
+* ``suffixes`` — все суффиксы названий (суффиксный массив), для поиска по
+  вхождению в середину названия.
+
+Для поиска похожих названий (опечаток и дубликатов) рядом лежит
+триграммный индекс (см. search.similarity).
+"""
+from bisect import bisect_left, insort
+
+from recipes.models import Ingredient
+from .analysis import normalize
+from .local_index import LocalIndex
+from .similarity import TrigramIndex, levenshtein
+
+
+def _suffixes(key, ingredient_id):
+    return [(key[i:], ingredient_id) for i in range(1, len(key))]
+
+
+def _remove(array, item):
+    index = bisect_left(array, item)
+    if index < len(array) and array[index] == item:
+        del array[index]
+
+
+def _ordered(names):
+    return sorted(names.items(), key=lambda item: (item[1], item[0]))
+
+
+class IngredientIndex(LocalIndex):
+    generation_name = "ingredients"
+
+    def __init__(self):
+        super().__init__()
+        # (names, ordered, prefixes, suffixes, trigrams) — заменяется целиком,
+        # поэтому читатели без блокировки всегда видят согласованный снимок
+        self._state = ({}, [], [], [], TrigramIndex())
+
+    def load(self):
+        names = dict(Ingredient.objects.values_list("id", "name"))
+        prefixes = sorted((normalize(name), ingredient_id) for ingredient_id, name in names.items())
+        suffixes = sorted(
+            suffix for key, ingredient_id in prefixes for suffix in _suffixes(key, ingredient_id)
+        )
+        self._state = (names, _ordered(names), prefixes, suffixes, TrigramIndex(names.items()))
+
+    def _replace(self, ingredient_id, name):
+        """Заменить (или удалить при name=None) ингредиент в копии снимка."""
+        names, _, prefixes, suffixes, trigram_index = self._state
+        names, prefixes, suffixes = dict(names), list(prefixes), list(suffixes)
+        old_name = names.pop(ingredient_id, None)
+        if old_name is not None:
+            old_key = normalize(old_name)
+            _remove(prefixes, (old_key, ingredient_id))
+            for suffix in _suffixes(old_key, ingredient_id):
+                _remove(suffixes, suffix)
+            trigram_index = trigram_index.without_item(ingredient_id)
+        if name is not None:
+            key = normalize(name)
+            names[ingredient_id] = name
+            insort(prefixes, (key, ingredient_id))
+            for suffix in _suffixes(key, ingredient_id):
+                insort(suffixes, suffix)
+            trigram_index = trigram_index.with_item(ingredient_id, name)
+        self._state = (names, _ordered(names), prefixes, suffixes, trigram_index)
+
+    def update(self, ingredient):
+        self.changed(lambda: self._replace(ingredient.pk, ingredient.name))
+
+    def remove(self, ingredient_id):
+        self.changed(lambda: self._replace(ingredient_id, None))
+
+    def all(self):
+        """Все ингредиенты в порядке названий: список пар (id, name)."""
+        self.ensure_loaded()
+        return list(self._state[1])
+
+    def names(self, ingredient_ids):
+        """Словарь id → название для известных индексу ингредиентов."""
+        self.ensure_loaded()
+        names = self._state[0]
+        return {pk: names[pk] for pk in ingredient_ids if pk in names}
+
+    def lookup(self, name):
+        """id ингредиента с таким названием (без учёта регистра и «ё») или None."""
+        self.ensure_loaded()
+        prefixes = self._state[2]
+        key = normalize(name).strip()
+        index = bisect_left(prefixes, (key,))
+        if index < len(prefixes) and prefixes[index][0] == key:
+            return prefixes[index][1]
+        return None
+
+    def suggest(self, query, limit=10):
+        """Подсказки по части названия: сначала совпадения с начала, потом по вхождению.
+
+        Возвращает не более ``limit`` пар (id, name).
+        """
+        self.ensure_loaded()
+        key = normalize(query).strip()
+        if not key:
+            return []
+        names, _, prefixes, suffixes, _ = self._state
+
+        found = []
+        index = bisect_left(prefixes, (key,))
+        while index < len(prefixes) and len(found) < limit and prefixes[index][0].startswith(key):
+            found.append(prefixes[index][1])
+            index += 1
+
+        if len(found) < limit:
+            seen = set(found)
+            infix = []
+            index = bisect_left(suffixes, (key,))
+            while index < len(suffixes) and len(infix) < limit - len(found):
+                suffix, ingredient_id = suffixes[index]
+                if not suffix.startswith(key):
+                    break
+                if ingredient_id not in seen:
+                    seen.add(ingredient_id)
+                    infix.append(ingredient_id)
+                index += 1
+            found.extend(sorted(infix, key=lambda ingredient_id: names[ingredient_id]))
+
+        return [(ingredient_id, names[ingredient_id]) for ingredient_id in found]
+
+    def similar(self, name, limit=3):
+        """Существующие названия, похожие на ``name``: опечатки, регистр, «ё».
+
+        Возвращает не более ``limit`` кортежей (id, name, distance), где distance —
+        расстояние Левенштейна между нормализованными названиями (0 — то же название).
+        """
+        self.ensure_loaded()
+        trigram_index = self._state[4]
+        key = normalize(name).strip()
+        max_distance = 1 if len(key) <= 4 else 2
+        matches = []
+        for ingredient_id, similarity in trigram_index.search(key, limit=20):
+            candidate = trigram_index.text(ingredient_id)
+            distance = levenshtein(key, normalize(candidate), max_distance)
+            if distance <= max_distance:
+                matches.append((distance, -similarity, ingredient_id, candidate))
+        matches.sort()
+        return [
+            (ingredient_id, candidate, distance)
+            for distance, _, ingredient_id, candidate in matches[:limit]
+        ]
+
+
+ingredient_index = IngredientIndex()
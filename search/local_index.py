@@ -0,0 +1,74 @@
+"""Базовый класс для поисковых структур в памяти процесса."""
+import threading
+import time
+
+from django.conf import settings
+from django.db import transaction
+
+from recipes.cache import bump_generation, get_generation
+
+
+class LocalIndex:
+    """Структура в памяти процесса, привязанная к поколению данных.
+
+    Строится лениво при первом обращении и перестраивается, если поколение
+    ``generation_name`` сменилось (например, данные изменил другой процесс).
+    Поколение читается из базы не чаще раза в ``SEARCH_INDEX_CHECK_INTERVAL``
+    секунд, так что подсказки на каждое нажатие клавиши обходятся без запросов;
+    изменения из других процессов видны с такой задержкой. Изменения из текущего
+    процесса применяются инкрементально через ``changed`` после фиксации транзакции.
+    """
+
+    generation_name = None
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._generation = None
+        self._checked_at = None
+
+    def load(self):
+        """Построить структуру с нуля из базы данных."""
+        raise NotImplementedError
+
+    def _check_due(self):
+        interval = getattr(settings, "SEARCH_INDEX_CHECK_INTERVAL", 2.0)
+        return (
+            self._generation is None or self._checked_at is None
+            or time.monotonic() - self._checked_at >= interval
+        )
+
+    def ensure_loaded(self):
+        if not self._check_due():
+            return
+        generation = get_generation(self.generation_name)
+        with self._lock:
+            if generation != self._generation:
+                self.load()
+                self._generation = generation
+            self._checked_at = time.monotonic()
+
+    def invalidate(self):
+        """Перестроить при следующем обращении (данные записаны мимо ``changed``)."""
+        with self._lock:
+            self._generation = None
+
+    def changed(self, apply):
+        """Сменить поколение и применить изменение ``apply()`` к локальной копии.
+
+        И то и другое — после фиксации текущей транзакции: при откате не
+        остаётся ни фантомной записи в памяти, ни смены поколения, которое
+        откатилось бы вместе с транзакцией и было бы выдано повторно.
+        Если между нашими изменениями поколение меняли другие процессы,
+        локальная копия устарела — её просто перестроим при следующем обращении.
+        """
+        transaction.on_commit(lambda: self._apply(apply))
+
+    def _apply(self, apply):
+        with self._lock:
+            previous = self._generation
+            generation = bump_generation(self.generation_name)
+            if previous is not None and generation == previous + 1:
+                apply()
+                self._generation = generation
+            else:
+                self._generation = None
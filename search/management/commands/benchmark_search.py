@@ -0,0 +1,119 @@
+import json
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (
+    override_settings, setup_databases, setup_test_environment, teardown_databases,
+    teardown_test_environment,
+)
+
+from search.benchmark import DEFAULT_SEED, compare_reports, generate_corpus, parse_size, run_benchmark
+
+# Свой кеш в памяти: кеши результатов и фасетов не должны попасть в общий кеш сайта
+BENCHMARK_CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "search-benchmark",
+    }
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Замерить скорость поиска на синтетическом корпусе рецептов. Корпус создаётся "
+        "в отдельной тестовой базе, рабочая база не затрагивается."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--size", default="10k",
+            help="Размер корпуса: 10k, 100k, 1m или число рецептов (по умолчанию 10k)",
+        )
+        parser.add_argument(
+            "--seed", type=int, default=DEFAULT_SEED,
+            help=f"Зерно генератора корпуса (по умолчанию {DEFAULT_SEED})",
+        )
+        parser.add_argument(
+            "--repeat", type=int, default=20,
+            help="Сколько раз повторять каждый запрос после холодного (по умолчанию 20)",
+        )
+        parser.add_argument("--output", help="Записать отчёт JSON в файл (иначе — в stdout)")
+        parser.add_argument("--compare", help="Сравнить с отчётом предыдущего запуска (JSON-файл)")
+        parser.add_argument(
+            "--db-file",
+            help=(
+                "Файл для тестовой базы SQLite вместо базы в памяти (для корпусов 100k и 1m). "
+                "Файл создаётся заново и удаляется после замера; существующий файл "
+                "перезаписывается только с --force, рабочая база — никогда"
+            ),
+        )
+        parser.add_argument(
+            "--force", action="store_true",
+            help="Разрешить перезаписать существующий файл --db-file",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            size = parse_size(options["size"])
+        except ValueError:
+            raise CommandError(f"Некорректный размер корпуса: {options['size']!r}")
+        previous = None
+        if options["compare"]:
+            with open(options["compare"], encoding="utf-8") as file:
+                previous = json.load(file)
+        if options["db_file"]:
+            connection.settings_dict["TEST"]["NAME"] = self.check_db_file(options["db_file"], options["force"])
+
+        # Прогресс — в stderr, чтобы stdout оставался чистым JSON
+        log = self.stderr
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            with override_settings(CACHES=BENCHMARK_CACHES):
+                started = time.perf_counter()
+                counts = generate_corpus(
+                    size, seed=options["seed"],
+                    progress=lambda done, total: log.write(f"  корпус: {done}/{total}"),
+                )
+                log.write(f"Корпус создан за {time.perf_counter() - started:.1f} с: {counts}")
+
+                def progress(name, result):
+                    log.write(
+                        f"  {name}: p50 {result['p50_ms']} мс, p95 {result['p95_ms']} мс, "
+                        f"запросов {result['queries']}"
+                    )
+
+                report = run_benchmark(repeat=max(options["repeat"], 1), progress=progress)
+                report["meta"].update(seed=options["seed"], corpus=counts)
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+        output = json.dumps(report, ensure_ascii=False, indent=2)
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as file:
+                file.write(output + "\n")
+            log.write(self.style.SUCCESS(f"Отчёт записан в {options['output']}"))
+        else:
+            self.stdout.write(output)
+
+        if previous is not None:
+            log.write(f"Сравнение с {options['compare']} (ревизия {previous['meta'].get('revision')}):")
+            for name, before, after, change, queries_before, queries_after in compare_reports(previous, report):
+                log.write(
+                    f"  {name}: p50 {before} → {after} мс ({change:+.0f}%), "
+                    f"запросов {queries_before} → {queries_after}"
+                )
+
+    def check_db_file(self, db_file, force):
+        """Путь для тестовой базы; setup_databases удалит файл, поэтому чужие файлы не трогаем."""
+        path = os.path.abspath(db_file)
+        if path == os.path.abspath(str(connection.settings_dict["NAME"])):
+            raise CommandError(f"{db_file} — рабочая база данных, укажите другой файл")
+        if os.path.exists(path) and not force:
+            raise CommandError(
+                f"Файл {db_file} уже существует и будет удалён. Укажите другой файл или --force"
+            )
+        return path
@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from search.backends import rebuild
+
+
+class Command(BaseCommand):
+    help = "Полностью перестроить поисковый индекс рецептов"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=1000,
+            help="Размер пачки при записи индекса (по умолчанию 1000)",
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        count = rebuild(batch_size=options["batch_size"])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Проиндексировано рецептов: {count} за {elapsed:.2f} с"
+        ))
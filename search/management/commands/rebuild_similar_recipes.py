@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from search.similar import rebuild_signatures
+
+
+class Command(BaseCommand):
+    help = "Пересчитать MinHash-сигнатуры всех рецептов для блока «Похожие рецепты»"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=1000,
+            help="Размер пачки при записи сигнатур (по умолчанию 1000)",
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        count = rebuild_signatures(batch_size=max(options["batch_size"], 1))
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Сигнатуры пересчитаны для рецептов: {count} за {elapsed:.2f} с"
+        ))
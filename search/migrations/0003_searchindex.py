@@ -0,0 +1,30 @@
+# Generated by Django 5.1.1 on 2026-10-18 03:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_merge_20261018_0614'),
+        ('search', '0002_delete_searchindex'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchIndex',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=64, verbose_name='Терм')),
+                ('field', models.CharField(choices=[('title', 'Название'), ('ingredient', 'Ингредиент'), ('author', 'Автор')], max_length=16, verbose_name='Поле')),
+                ('frequency', models.PositiveIntegerField(default=1, verbose_name='Частота')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_index', to='recipes.recipe', verbose_name='Рецепт')),
+            ],
+            options={
+                'verbose_name': 'Поисковый индекс',
+                'verbose_name_plural': 'Поисковые индексы',
+                'unique_together': {('token', 'field', 'recipe')},
+            },
+        ),
+    ]
@@ -0,0 +1,97 @@
+from django.db import migrations, OperationalError
+
+
+FTS_TABLE = "search_recipe_fts"
+
+INGREDIENT_NAMES = """coalesce((SELECT group_concat(i.name, ' ')
+    FROM recipes_recipeingredient ri
+    JOIN recipes_ingredient i ON i.id = ri.ingredient_id
+    WHERE ri.recipe_id = {recipe_id}), '')"""
+
+CREATE_SQL = [
+    f"""CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        title, description, instruction, ingredients
+    )""",
+    f"""CREATE TRIGGER {FTS_TABLE}_recipe_ai AFTER INSERT ON recipes_recipe BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, description, instruction, ingredients)
+        VALUES (new.id, new.title, new.description, new.instruction, '');
+    END""",
+    f"""CREATE TRIGGER {FTS_TABLE}_recipe_au
+    AFTER UPDATE OF title, description, instruction ON recipes_recipe BEGIN
+        UPDATE {FTS_TABLE}
+        SET title = new.title, description = new.description, instruction = new.instruction
+        WHERE rowid = new.id;
+    END""",
+    f"""CREATE TRIGGER {FTS_TABLE}_recipe_ad AFTER DELETE ON recipes_recipe BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+    END""",
+    f"""CREATE TRIGGER {FTS_TABLE}_ri_ai AFTER INSERT ON recipes_recipeingredient BEGIN
+        UPDATE {FTS_TABLE} SET ingredients = {INGREDIENT_NAMES.format(recipe_id="new.recipe_id")}
+        WHERE rowid = new.recipe_id;
+    END""",
+    f"""CREATE TRIGGER {FTS_TABLE}_ri_au AFTER UPDATE OF ingredient_id, recipe_id
+    ON recipes_recipeingredient BEGIN
+        UPDATE {FTS_TABLE} SET ingredients = {INGREDIENT_NAMES.format(recipe_id="old.recipe_id")}
+        WHERE rowid = old.recipe_id;
+        UPDATE {FTS_TABLE} SET ingredients = {INGREDIENT_NAMES.format(recipe_id="new.recipe_id")}
+        WHERE rowid = new.recipe_id;
+    END""",
+    f"""CREATE TRIGGER {FTS_TABLE}_ri_ad AFTER DELETE ON recipes_recipeingredient BEGIN
+        UPDATE {FTS_TABLE} SET ingredients = {INGREDIENT_NAMES.format(recipe_id="old.recipe_id")}
+        WHERE rowid = old.recipe_id;
+    END""",
+    f"""CREATE TRIGGER {FTS_TABLE}_ingredient_au AFTER UPDATE OF name ON recipes_ingredient BEGIN
+        UPDATE {FTS_TABLE} SET ingredients = {INGREDIENT_NAMES.format(recipe_id=f"{FTS_TABLE}.rowid")}
+        WHERE rowid IN (
+            SELECT recipe_id FROM recipes_recipeingredient WHERE ingredient_id = new.id
+        );
+    END""",
+    f"""INSERT INTO {FTS_TABLE}(rowid, title, description, instruction, ingredients)
+    SELECT r.id, r.title, r.description, r.instruction, {INGREDIENT_NAMES.format(recipe_id="r.id")}
+    FROM recipes_recipe r""",
+]
+
+DROP_SQL = [
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_recipe_ai",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_recipe_au",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_recipe_ad",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ri_ai",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ri_au",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ri_ad",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ingredient_au",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+
+def create_fts(apps, schema_editor):
+    """FTS5 есть только в SQLite, да и там может быть не собран — тогда пропускаем."""
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    with schema_editor.connection.cursor() as cursor:
+        try:
+            cursor.execute("CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(x)")
+            cursor.execute("DROP TABLE temp.fts5_probe")
+        except OperationalError:
+            return
+        for statement in CREATE_SQL:
+            cursor.execute(statement)
+
+
+def drop_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for statement in DROP_SQL:
+            cursor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_merge_20261018_0614'),
+        ('search', '0003_searchindex'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts, drop_fts),
+    ]
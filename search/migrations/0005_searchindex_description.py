@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-18 03:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search', '0004_recipe_fts'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='searchindex',
+            name='field',
+            field=models.CharField(choices=[('title', 'Название'), ('ingredient', 'Ингредиент'), ('description', 'Описание'), ('author', 'Автор')], max_length=16, verbose_name='Поле'),
+        ),
+    ]
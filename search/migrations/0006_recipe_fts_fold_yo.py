@@ -0,0 +1,93 @@
+from django.db import migrations
+
+
+FTS_TABLE = "search_recipe_fts"
+
+
+def fold(expression):
+    """«ё» → «е» в SQL, как в search.analysis.normalize (unicode61 её не сворачивает)."""
+    return f"replace(replace({expression}, 'ё', 'е'), 'Ё', 'Е')"
+
+
+INGREDIENT_NAMES = fold("""coalesce((SELECT group_concat(i.name, ' ')
+    FROM recipes_recipeingredient ri
+    JOIN recipes_ingredient i ON i.id = ri.ingredient_id
+    WHERE ri.recipe_id = {recipe_id}), '')""")
+
+TRIGGERS = [
+    "recipe_ai", "recipe_au", "recipe_ad", "ri_ai", "ri_au", "ri_ad", "ingredient_au",
+]
+
+CREATE_SQL = [
+    f"""CREATE TRIGGER {FTS_TABLE}_recipe_ai AFTER INSERT ON recipes_recipe BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, description, instruction, ingredients)
+        VALUES (new.id, {fold("new.title")}, {fold("new.description")}, {fold("new.instruction")}, '');
+    END""",
+    f"""CREATE TRIGGER {FTS_TABLE}_recipe_au
+    AFTER UPDATE OF title, description, instruction ON recipes_recipe BEGIN
+        UPDATE {FTS_TABLE}
+        SET title = {fold("new.title")},
+            description = {fold("new.description")},
+            instruction = {fold("new.instruction")}
+        WHERE rowid = new.id;
+    END""",
+    f"""CREATE TRIGGER {FTS_TABLE}_recipe_ad AFTER DELETE ON recipes_recipe BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+    END""",
+    f"""CREATE TRIGGER {FTS_TABLE}_ri_ai AFTER INSERT ON recipes_recipeingredient BEGIN
+        UPDATE {FTS_TABLE} SET ingredients = {INGREDIENT_NAMES.format(recipe_id="new.recipe_id")}
+        WHERE rowid = new.recipe_id;
+    END""",
+    f"""CREATE TRIGGER {FTS_TABLE}_ri_au AFTER UPDATE OF ingredient_id, recipe_id
+    ON recipes_recipeingredient BEGIN
+        UPDATE {FTS_TABLE} SET ingredients = {INGREDIENT_NAMES.format(recipe_id="old.recipe_id")}
+        WHERE rowid = old.recipe_id;
+        UPDATE {FTS_TABLE} SET ingredients = {INGREDIENT_NAMES.format(recipe_id="new.recipe_id")}
+        WHERE rowid = new.recipe_id;
+    END""",
+    f"""CREATE TRIGGER {FTS_TABLE}_ri_ad AFTER DELETE ON recipes_recipeingredient BEGIN
+        UPDATE {FTS_TABLE} SET ingredients = {INGREDIENT_NAMES.format(recipe_id="old.recipe_id")}
+        WHERE rowid = old.recipe_id;
+    END""",
+    f"""CREATE TRIGGER {FTS_TABLE}_ingredient_au AFTER UPDATE OF name ON recipes_ingredient BEGIN
+        UPDATE {FTS_TABLE} SET ingredients = {INGREDIENT_NAMES.format(recipe_id=f"{FTS_TABLE}.rowid")}
+        WHERE rowid IN (
+            SELECT recipe_id FROM recipes_recipeingredient WHERE ingredient_id = new.id
+        );
+    END""",
+    f"DELETE FROM {FTS_TABLE}",
+    f"""INSERT INTO {FTS_TABLE}(rowid, title, description, instruction, ingredients)
+    SELECT r.id, {fold("r.title")}, {fold("r.description")}, {fold("r.instruction")},
+           {INGREDIENT_NAMES.format(recipe_id="r.id")}
+    FROM recipes_recipe r""",
+]
+
+
+def fts_exists(connection):
+    if connection.vendor != "sqlite":
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+        return cursor.fetchone() is not None
+
+
+def recreate_triggers(apps, schema_editor):
+    if not fts_exists(schema_editor.connection):
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for trigger in TRIGGERS:
+            cursor.execute(f"DROP TRIGGER IF EXISTS {FTS_TABLE}_{trigger}")
+        for statement in CREATE_SQL:
+            cursor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search', '0005_searchindex_description'),
+    ]
+
+    operations = [
+        # Обратная миграция оставляет триггеры со свёрткой — они совместимы с 0004
+        migrations.RunPython(recreate_triggers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.1.1 on 2026-10-18 03:32
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum
+
+
+def fill_lengths(apps, schema_editor):
+    """Длина поля — сумма частот всех термов этого поля рецепта."""
+    SearchIndex = apps.get_model('search', 'SearchIndex')
+    totals = (
+        SearchIndex.objects
+        .filter(recipe_id=OuterRef('recipe_id'), field=OuterRef('field'))
+        .order_by()
+        .values('recipe_id', 'field')
+        .annotate(total=Sum('frequency'))
+        .values('total')
+    )
+    SearchIndex.objects.update(length=Subquery(totals))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search', '0006_recipe_fts_fold_yo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='searchindex',
+            name='length',
+            field=models.PositiveIntegerField(default=1, verbose_name='Длина поля'),
+        ),
+        migrations.RunPython(fill_lengths, migrations.RunPython.noop),
+    ]
@@ -2,18 +2,53 @@ from django.db import models
 from recipes.models import Recipe
 
 
-# Временно отключено для исправления ошибки удаления рецептов
-# class SearchIndex(models.Model):
-#     recipe = models.OneToOneField(
-#         Recipe, on_delete=models.CASCADE, related_name="search_index", verbose_name="Рецепт"
-#     )
-#     title = models.CharField("Заголовок", max_length=255)
-#     content = models.TextField("Текст для поиска")
-#     updated_at = models.DateTimeField("Обновлено", auto_now=True)
-
-#     class Meta:
-#         verbose_name = "Поисковый индекс"
-#         verbose_name_plural = "Поисковые индексы"
-
-#     def __str__(self):
-#         return f"Индекс: {self.recipe}"
+class SearchIndex(models.Model):
+    """Инвертированный индекс: терм → рецепты (posting list)."""
+
+    FIELD_TITLE = "title"
+    FIELD_INGREDIENT = "ingredient"
+    FIELD_DESCRIPTION = "description"
+    FIELD_AUTHOR = "author"
+    FIELD_CHOICES = [
+        (FIELD_TITLE, "Название"),
+        (FIELD_INGREDIENT, "Ингредиент"),
+        (FIELD_DESCRIPTION, "Описание"),
+        (FIELD_AUTHOR, "Автор"),
+    ]
+
+    token = models.CharField("Терм", max_length=64)
+    field = models.CharField("Поле", max_length=16, choices=FIELD_CHOICES)
+    recipe = models.ForeignKey(
+        Recipe, on_delete=models.CASCADE, related_name="search_index", verbose_name="Рецепт"
+    )
+    frequency = models.PositiveIntegerField("Частота", default=1)
+    # Число термов в этом поле рецепта — нормировка длины в BM25
+    length = models.PositiveIntegerField("Длина поля", default=1)
+
+    class Meta:
+        verbose_name = "Поисковый индекс"
+        verbose_name_plural = "Поисковые индексы"
+        # Уникальный индекс (token, field, recipe) служит и posting list'ом:
+        # выборка рецептов по терму идёт по нему без обращения к таблице
+        unique_together = ("token", "field", "recipe")
+
+    def __str__(self):
+        return f"{self.token} → {self.recipe_id} ({self.field})"
+
+
+class RecipeSignature(models.Model):
+    """MinHash-сигнатура набора ингредиентов рецепта (см. search.similar)."""
+
+    recipe = models.OneToOneField(
+        Recipe, on_delete=models.CASCADE, primary_key=True,
+        related_name="signature", verbose_name="Рецепт",
+    )
+    # Упакованный массив uint32 — по значению на каждую хеш-функцию
+    signature = models.BinaryField("Сигнатура")
+
+    class Meta:
+        verbose_name = "Сигнатура рецепта"
+        verbose_name_plural = "Сигнатуры рецептов"
+
+    def __str__(self):
+        return f"Сигнатура рецепта {self.recipe_id}"
@@ -0,0 +1,109 @@
+"""Поиск «Что приготовить»: рецепты по ингредиентам, которые есть под рукой.
+
+Рецепт оценивается долей его ингредиентов, которые есть у пользователя.
+Вместо JOIN'а с RecipeIngredient для каждого кандидата в памяти процесса
+лежат два отображения:
+
+* ``recipes`` — рецепт → множество id его ингредиентов;
+* ``postings`` — ингредиент → кортеж id рецептов, где он встречается.
+
+Запрос обходит posting list'ы только имеющихся ингредиентов и считает
+совпадения счётчиком, поэтому стоимость зависит от числа найденных пар
+(рецепт, ингредиент), а не от числа всех рецептов.
+"""
+import heapq
+from collections import Counter
+
+from recipes.models import RecipeIngredient
+from .local_index import LocalIndex
+
+
+class PantryIndex(LocalIndex):
+    generation_name = "recipe_ingredients"
+
+    def __init__(self):
+        super().__init__()
+        # (recipes, postings) — заменяется целиком, как в IngredientIndex
+        self._state = ({}, {})
+
+    def load(self):
+        recipes = {}
+        for recipe_id, ingredient_id in RecipeIngredient.objects.values_list("recipe_id", "ingredient_id"):
+            recipes.setdefault(recipe_id, set()).add(ingredient_id)
+        postings = {}
+        for recipe_id, ingredient_ids in recipes.items():
+            for ingredient_id in ingredient_ids:
+                postings.setdefault(ingredient_id, []).append(recipe_id)
+        self._state = (
+            {recipe_id: frozenset(ids) for recipe_id, ids in recipes.items()},
+            {ingredient_id: tuple(ids) for ingredient_id, ids in postings.items()},
+        )
+
+    def _replace(self, changes):
+        """Заменить ингредиенты рецептов ({recipe_id: ingredient_ids}; пустой набор — удалить).
+
+        Снимок копируется один раз на всю пачку, а не на каждый рецепт.
+        """
+        recipes, postings = self._state
+        changes = {
+            recipe_id: frozenset(ingredient_ids) for recipe_id, ingredient_ids in changes.items()
+            if recipes.get(recipe_id, frozenset()) != frozenset(ingredient_ids)
+        }
+        if not changes:
+            return
+        recipes, postings = dict(recipes), dict(postings)
+        for recipe_id, new in changes.items():
+            old = recipes.get(recipe_id, frozenset())
+            if new:
+                recipes[recipe_id] = new
+            else:
+                recipes.pop(recipe_id, None)
+            for ingredient_id in old - new:
+                remaining = tuple(pk for pk in postings[ingredient_id] if pk != recipe_id)
+                if remaining:
+                    postings[ingredient_id] = remaining
+                else:
+                    del postings[ingredient_id]
+            for ingredient_id in new - old:
+                postings[ingredient_id] = postings.get(ingredient_id, ()) + (recipe_id,)
+        self._state = (recipes, postings)
+
+    def refresh(self, recipe_ids):
+        """Перечитать ингредиенты рецептов одним запросом после изменения их RecipeIngredient."""
+        changes = {recipe_id: set() for recipe_id in recipe_ids}
+        rows = RecipeIngredient.objects.filter(recipe_id__in=changes).values_list("recipe_id", "ingredient_id")
+        for recipe_id, ingredient_id in rows:
+            changes[recipe_id].add(ingredient_id)
+        self.changed(lambda: self._replace(changes))
+
+    def remove(self, recipe_id):
+        self.changed(lambda: self._replace({recipe_id: ()}))
+
+    def search(self, ingredient_ids, limit=20):
+        """Рецепты, которые можно приготовить из ``ingredient_ids``, лучшие первыми.
+
+        Возвращает не более ``limit`` кортежей (recipe_id, coverage, missing_ids):
+        coverage — доля ингредиентов рецепта, которые есть в наличии,
+        missing_ids — отсортированные id недостающих ингредиентов. При равной
+        доле выше рецепт, где совпало больше ингредиентов, затем более новый.
+        """
+        self.ensure_loaded()
+        recipes, postings = self._state
+        pantry = frozenset(ingredient_ids)
+
+        covered = Counter()
+        for ingredient_id in pantry:
+            covered.update(postings.get(ingredient_id, ()))
+
+        best = heapq.nlargest(
+            limit,
+            covered.items(),
+            key=lambda item: (item[1] / len(recipes[item[0]]), item[1], item[0]),
+        )
+        return [
+            (recipe_id, count / len(recipes[recipe_id]), sorted(recipes[recipe_id] - pantry))
+            for recipe_id, count in best
+        ]
+
+
+pantry_index = PantryIndex()
@@ -0,0 +1,95 @@
+"""Кеш результатов поиска.
+
+Для популярных запросов и комбинаций фильтров в кеше хранится готовый
+упорядоченный список id рецептов; страница выдаётся срезом этого списка,
+и из базы загружаются только рецепты этой страницы. Для больших выборок
+(весь каталог, широкий запрос) кешируются только первые ``MAX_CACHED_IDS``
+id и общее число, а более дальние страницы читаются срезом запроса
+(см. ``ResultIds``).
+
+Ключ строится из нормализованных параметров, поэтому «Борщ » и «борщ»
+попадают в одну запись. В ключ входит поколение «recipes»: любое изменение
+рецептов, их ингредиентов, изображений или категорий сменяет поколение,
+и старые записи просто перестают читаться (см. search.signals).
+"""
+import hashlib
+import json
+
+from django.core.cache import cache
+
+from recipes.cache import get_generation
+from .analysis import normalize
+from .backends import use_fts
+from .facets import GENERATION
+
+# Сколько секунд держать список; актуальность обеспечивает поколение,
+# таймаут лишь освобождает место от записей, которые больше не читают
+RESULTS_TIMEOUT = 60 * 60
+
+# Слишком длинные списки не кешируем — их дешевле посчитать заново;
+# у страницы поиска кешируется только начало списка такой длины
+MAX_CACHED_IDS = 5000
+
+
+def cache_key(scope, params):
+    """Канонический ключ для параметров поиска ``params`` в разделе ``scope``."""
+    canonical = {
+        name: normalize(value) if name in ('q', 'query') else value
+        for name, value in params.items()
+    }
+    # Бэкенд тоже влияет на результат: FTS5 ищет и по префиксам слов
+    raw = json.dumps([scope, use_fts(), canonical], sort_keys=True, ensure_ascii=False, default=str)
+    digest = hashlib.md5(raw.encode()).hexdigest()
+    return f"search:results:{get_generation(GENERATION)}:{digest}"
+
+
+def cached_ids(scope, params, compute):
+    """Упорядоченный список id рецептов из кеша; при промахе — ``compute()``."""
+    key = cache_key(scope, params)
+    ids = cache.get(key)
+    if ids is None:
+        ids = list(compute())
+        if len(ids) <= MAX_CACHED_IDS:
+            cache.set(key, ids, RESULTS_TIMEOUT)
+    return ids
+
+
+class ResultIds:
+    """Упорядоченные id результатов для Paginator без загрузки всего списка.
+
+    В кеше лежат первые ``MAX_CACHED_IDS`` id и общее число результатов.
+    При промахе читается не больше ``MAX_CACHED_IDS + 1`` id, а COUNT
+    выполняется, только если результатов больше. Страницы за пределами
+    закешированного начала берутся срезом ``queryset`` (LIMIT/OFFSET).
+    """
+
+    def __init__(self, scope, params, queryset):
+        self.queryset = queryset.values_list('pk', flat=True)
+        key = cache_key(scope, params)
+        cached = cache.get(key)
+        if cached is None:
+            prefix = list(self.queryset[:MAX_CACHED_IDS + 1])
+            total = len(prefix) if len(prefix) <= MAX_CACHED_IDS else self.queryset.count()
+            cached = (prefix[:MAX_CACHED_IDS], total)
+            cache.set(key, cached, RESULTS_TIMEOUT)
+        self.prefix, self.total = cached
+
+    def count(self):
+        return self.total
+
+    def __len__(self):
+        return self.total
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            raise TypeError("ResultIds поддерживает только срезы")
+        start, stop, _ = index.indices(self.total)
+        if stop <= len(self.prefix):
+            return self.prefix[start:stop]
+        return list(self.queryset[start:stop])
+
+
+def hydrate(queryset, ids):
+    """Рецепты с id из ``ids`` в том же порядке (удалённые пропускаются)."""
+    recipes = queryset.in_bulk(ids)
+    return [recipes[pk] for pk in ids if pk in recipes]
@@ -0,0 +1,142 @@
+"""Поддержание поисковых индексов в актуальном состоянии."""
+import threading
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from recipes.cache import bump_generation
+from collections_app.models import CollectionItem
+from recipes.models import Category, Comment, Rating, Recipe, RecipeImage, RecipeIngredient, Ingredient
+from . import facets
+from .indexing import index_recipe
+from .ingredients import ingredient_index
+from .pantry import pantry_index
+from .similar import similar_index
+from .suggestions import vocabulary_index
+
+# Поля рецепта, от которых зависит индекс
+INDEXED_RECIPE_FIELDS = {"title", "description", "author"}
+
+# Рецепты, которые сейчас удаляются каскадом: их ингредиенты удаляются раньше
+# самого рецепта, и переиндексация в этот момент создала бы висячие записи
+_deleting = threading.local()
+
+# Рецепты, чьи ингредиенты изменились в текущей транзакции. Формсет рецепта
+# сохраняет строки по одной; индексы обновляются один раз после фиксации,
+# а не на каждую строку (см. _refresh_pending)
+_pending = threading.local()
+
+
+def _deleting_ids():
+    if not hasattr(_deleting, "ids"):
+        _deleting.ids = set()
+    return _deleting.ids
+
+
+def _touches(update_fields, fields):
+    return update_fields is None or bool(fields & set(update_fields))
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance, update_fields=None, **kwargs):
+    if _touches(update_fields, INDEXED_RECIPE_FIELDS):
+        index_recipe(instance.pk)
+    # Рейтинг, счётчики и прочие save() название не меняют — словарь не трогаем,
+    # иначе каждое сохранение заставляло бы другие процессы перестраивать его
+    if _touches(update_fields, {"title"}) and instance.title != getattr(instance, "_saved_title", None):
+        vocabulary_index.add_text(instance.title)
+        instance._saved_title = instance.title
+
+
+@receiver(pre_delete, sender=Recipe)
+def recipe_deleting(sender, instance, **kwargs):
+    _deleting_ids().add(instance.pk)
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    _deleting_ids().discard(instance.pk)
+    pantry_index.remove(instance.pk)
+    similar_index.remove(instance.pk)
+
+
+def _pending_ids():
+    if not hasattr(_pending, "ids"):
+        _pending.ids = set()
+    return _pending.ids
+
+
+def _refresh_pending():
+    """Переиндексировать рецепты, чьи ингредиенты менялись, — по разу на рецепт."""
+    recipe_ids = sorted(_pending_ids())
+    _pending_ids().clear()
+    if not recipe_ids:
+        return
+    for recipe_id in recipe_ids:
+        index_recipe(recipe_id)
+    pantry_index.refresh(recipe_ids)
+    similar_index.refresh(recipe_ids)
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+def recipe_ingredient_changed(sender, instance, **kwargs):
+    if instance.recipe_id in _deleting_ids():
+        return
+    _pending_ids().add(instance.recipe_id)
+    # Колбэк ставится на каждую строку, но работу делает только первый: если
+    # транзакцию откатят, набор не потеряется и уйдёт со следующей фиксацией
+    transaction.on_commit(_refresh_pending)
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_saved(sender, instance, created=False, **kwargs):
+    ingredient_index.update(instance)
+    vocabulary_index.add_text(instance.name)
+    if created:
+        return
+    recipe_ids = RecipeIngredient.objects.filter(ingredient=instance).values_list("recipe_id", flat=True)
+    for recipe_id in recipe_ids:
+        index_recipe(recipe_id)
+    bump_generation(facets.GENERATION)
+
+
+@receiver(post_delete, sender=Ingredient)
+def ingredient_deleted(sender, instance, **kwargs):
+    ingredient_index.remove(instance.pk)
+
+
+@receiver(post_save, sender=get_user_model())
+def author_saved(sender, instance, created=False, update_fields=None, **kwargs):
+    saved_username = getattr(instance, "_saved_username", None)
+    instance._saved_username = instance.username
+    # Вход, смена аватара и прочие save() имя не меняют — рецепты не переиндексируем
+    if created or not _touches(update_fields, {"username"}) or instance.username == saved_username:
+        return
+    vocabulary_index.add_text(instance.username)
+    for recipe_id in instance.recipes.values_list("pk", flat=True):
+        index_recipe(recipe_id)
+    bump_generation(facets.GENERATION)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+@receiver(post_save, sender=RecipeImage)
+@receiver(post_delete, sender=RecipeImage)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Rating)
+@receiver(post_delete, sender=Rating)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+@receiver(post_save, sender=CollectionItem)
+@receiver(post_delete, sender=CollectionItem)
+def recipes_changed(sender, **kwargs):
+    # Закешированные фасеты и результаты поиска (поколение «recipes») устаревают;
+    # рейтинг и счётчики меняются через UPDATE без post_save рецепта, поэтому
+    # слушаем и оценки, комментарии и элементы коллекций (сортировка «popular»)
+    bump_generation(facets.GENERATION)
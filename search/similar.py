@@ -0,0 +1,201 @@
+"""Похожие рецепты по ингредиентам: MinHash и LSH.
+
+Близость двух рецептов — коэффициент Жаккара их наборов ингредиентов.
+Сравнивать рецепт со всеми остальными на каждый просмотр страницы дорого,
+поэтому каждому рецепту сопоставлена MinHash-сигнатура: ``NUM_HASHES``
+минимумов хеш-функций по id его ингредиентов. Доля совпавших позиций двух
+сигнатур — оценка коэффициента Жаккара.
+
+Сигнатуры хранятся в ``RecipeSignature`` упакованным массивом uint32
+(256 байт на рецепт) и пересчитываются при изменении ингредиентов рецепта.
+В памяти процесса по ним строятся LSH-таблицы: сигнатура режется на
+``BANDS`` полос по ``ROWS`` значений, рецепты с одинаковой полосой попадают
+в одну корзину. Кандидаты — соседи по корзинам (не больше ``MAX_BUCKET``
+из каждой), так что поиск не зависит от числа рецептов. Пара с
+коэффициентом Жаккара ``s`` становится кандидатами с вероятностью
+``1 - (1 - s ** ROWS) ** BANDS``: около 0.64 при ``s`` = 0.5 и 0.12 при 0.3.
+"""
+import heapq
+import operator
+import random
+from array import array
+from collections import Counter
+from functools import lru_cache
+from itertools import groupby
+
+from django.db import transaction
+
+from recipes.cache import bump_generation
+from recipes.models import RecipeIngredient
+from .local_index import LocalIndex
+from .models import RecipeSignature
+
+NUM_HASHES = 64
+BANDS = 16
+ROWS = NUM_HASHES // BANDS
+
+# Из одной корзины берём не больше стольких соседей (рецепты «соль + лук» слишком похожи)
+MAX_BUCKET = 200
+
+# Скольких лучших по числу общих полос кандидатов сравнивать по полной сигнатуре
+CANDIDATES = 50
+
+# Хеш-функции h(x) = (a·x + b) mod P, младшие 32 бита. Коэффициенты фиксированы:
+# сигнатуры лежат в базе, и при их смене нужен manage.py rebuild_similar_recipes
+_PRIME = (1 << 61) - 1
+_MASK = (1 << 32) - 1
+_SEED = 20241018
+_random = random.Random(_SEED)
+_COEFFICIENTS = [(_random.randrange(1, _PRIME), _random.randrange(_PRIME)) for _ in range(NUM_HASHES)]
+
+_ITEM = "I"  # uint32
+_BAND_BYTES = ROWS * array(_ITEM).itemsize
+
+
+@lru_cache(maxsize=100_000)
+def _ingredient_hashes(ingredient_id):
+    """Значения всех хеш-функций для одного ингредиента — их мало, считаем один раз."""
+    return array(_ITEM, (((a * ingredient_id + b) % _PRIME) & _MASK for a, b in _COEFFICIENTS))
+
+
+def signature(ingredient_ids):
+    """MinHash-сигнатура набора ингредиентов (bytes); пустой набор — пустая сигнатура."""
+    vectors = [_ingredient_hashes(pk) for pk in set(ingredient_ids)]
+    if not vectors:
+        return b""
+    if len(vectors) == 1:
+        return vectors[0].tobytes()
+    return array(_ITEM, map(min, *vectors)).tobytes()
+
+
+def similarity(first, second):
+    """Оценка коэффициента Жаккара по двум сигнатурам: доля совпавших значений."""
+    return sum(map(operator.eq, memoryview(first).cast(_ITEM), memoryview(second).cast(_ITEM))) / NUM_HASHES
+
+
+def _band_keys(value):
+    # Номер полосы в первом байте ключа: одинаковые значения разных полос не смешиваются
+    return [
+        bytes((band,)) + value[band * _BAND_BYTES:(band + 1) * _BAND_BYTES]
+        for band in range(BANDS)
+    ]
+
+
+class SimilarRecipeIndex(LocalIndex):
+    generation_name = "recipe_signatures"
+
+    def __init__(self):
+        super().__init__()
+        # (signatures, buckets) — заменяется целиком, как в PantryIndex
+        self._state = ({}, {})
+
+    def load(self):
+        signatures = {}
+        buckets = {}
+        rows = RecipeSignature.objects.values_list("recipe_id", "signature")
+        for recipe_id, value in rows.iterator(chunk_size=5000):
+            value = bytes(value)
+            signatures[recipe_id] = value
+            for key in _band_keys(value):
+                buckets.setdefault(key, []).append(recipe_id)
+        self._state = (signatures, {key: tuple(ids) for key, ids in buckets.items()})
+
+    def _replace(self, changes):
+        """Заменить сигнатуры рецептов ({recipe_id: signature}; пустая — удалить).
+
+        Словари снимка копируются один раз на всю пачку, а не на каждый рецепт.
+        """
+        signatures, buckets = self._state
+        changes = {
+            recipe_id: value for recipe_id, value in changes.items()
+            if signatures.get(recipe_id, b"") != value
+        }
+        if not changes:
+            return
+        signatures, buckets = dict(signatures), dict(buckets)
+        for recipe_id, value in changes.items():
+            old = signatures.get(recipe_id, b"")
+            if value:
+                signatures[recipe_id] = value
+            else:
+                signatures.pop(recipe_id, None)
+            old_keys = set(_band_keys(old)) if old else set()
+            new_keys = set(_band_keys(value)) if value else set()
+            for key in old_keys - new_keys:
+                remaining = tuple(pk for pk in buckets[key] if pk != recipe_id)
+                if remaining:
+                    buckets[key] = remaining
+                else:
+                    del buckets[key]
+            for key in new_keys - old_keys:
+                buckets[key] = buckets.get(key, ()) + (recipe_id,)
+        self._state = (signatures, buckets)
+
+    def refresh(self, recipe_ids):
+        """Пересчитать и сохранить сигнатуры рецептов после изменения их ингредиентов.
+
+        Ингредиенты всех рецептов читаются одним запросом, сигнатуры
+        перезаписываются одним DELETE и одним INSERT.
+        """
+        ingredients = {recipe_id: [] for recipe_id in recipe_ids}
+        rows = RecipeIngredient.objects.filter(recipe_id__in=ingredients).values_list("recipe_id", "ingredient_id")
+        for recipe_id, ingredient_id in rows:
+            ingredients[recipe_id].append(ingredient_id)
+        changes = {recipe_id: signature(ids) for recipe_id, ids in ingredients.items()}
+        with transaction.atomic():
+            RecipeSignature.objects.filter(recipe_id__in=changes).delete()
+            RecipeSignature.objects.bulk_create(
+                RecipeSignature(recipe_id=recipe_id, signature=value)
+                for recipe_id, value in changes.items() if value
+            )
+        self.changed(lambda: self._replace(changes))
+
+    def remove(self, recipe_id):
+        # Строка RecipeSignature удаляется каскадом вместе с рецептом
+        self.changed(lambda: self._replace({recipe_id: b""}))
+
+    def similar(self, recipe_id, limit=6):
+        """Самые похожие по ингредиентам рецепты: не более ``limit`` пар (recipe_id, similarity)."""
+        self.ensure_loaded()
+        signatures, buckets = self._state
+        value = signatures.get(recipe_id)
+        if value is None:
+            return []
+
+        shared = Counter()
+        for key in _band_keys(value):
+            shared.update(buckets[key][:MAX_BUCKET])
+        del shared[recipe_id]
+
+        candidates = heapq.nlargest(CANDIDATES, shared.items(), key=lambda item: (item[1], item[0]))
+        scored = [(similarity(value, signatures[pk]), pk) for pk, _ in candidates]
+        return [(pk, score) for score, pk in heapq.nlargest(limit, scored)]
+
+
+similar_index = SimilarRecipeIndex()
+
+
+def rebuild_signatures(batch_size=1000):
+    """Пересчитать сигнатуры всех рецептов. Возвращает число рецептов с сигнатурой."""
+    rows = (
+        RecipeIngredient.objects.order_by("recipe_id")
+        .values_list("recipe_id", "ingredient_id")
+        .iterator(chunk_size=5000)
+    )
+    count = 0
+    batch = []
+    with transaction.atomic():
+        RecipeSignature.objects.all().delete()
+        for recipe_id, group in groupby(rows, key=operator.itemgetter(0)):
+            batch.append(RecipeSignature(
+                recipe_id=recipe_id, signature=signature(pk for _, pk in group),
+            ))
+            count += 1
+            if len(batch) >= batch_size:
+                RecipeSignature.objects.bulk_create(batch)
+                batch = []
+        RecipeSignature.objects.bulk_create(batch)
+    # Записи шли мимо refresh — LSH-таблицы перестроятся при следующем обращении
+    bump_generation(similar_index.generation_name)
+    similar_index.invalidate()
+    return count
@@ -0,0 +1,118 @@
+"""Поиск похожих строк: триграммный индекс и расстояние Левенштейна.
+
+Кандидаты берутся из posting list'ов триграмм запроса (как pg_trgm),
+поэтому поиск не перебирает весь словарь; точная оценка — расстояние
+Левенштейна только для лучших кандидатов.
+"""
+from collections import Counter
+
+from .analysis import normalize
+
+
+def trigrams(text):
+    """Множество триграмм строки; каждое слово дополняется пробелами по краям."""
+    result = set()
+    for word in normalize(text).split():
+        padded = f"  {word} "
+        result.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return result
+
+
+def levenshtein(a, b, max_distance=None):
+    """Расстояние Левенштейна; при ``max_distance`` счёт обрывается, как только его превысили."""
+    if len(a) < len(b):
+        a, b = b, a
+    if max_distance is not None and len(a) - len(b) > max_distance:
+        return max_distance + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (char_a != char_b),
+            ))
+        if max_distance is not None and min(current) > max_distance:
+            return max_distance + 1
+        previous = current
+    return previous[-1]
+
+
+class TrigramIndex:
+    """Неизменяемый триграммный индекс: ключ → строка.
+
+    Изменения (``with_item``/``without_item``) возвращают новый индекс, копируя
+    только затронутые posting list'ы, — читатели работают со старой копией без блокировок.
+    """
+
+    def __init__(self, items=()):
+        self._texts = {}
+        self._trigrams = {}
+        self._postings = {}
+        for key, text in items:
+            grams = trigrams(text)
+            self._texts[key] = text
+            self._trigrams[key] = grams
+            for gram in grams:
+                self._postings.setdefault(gram, set()).add(key)
+
+    def __len__(self):
+        return len(self._texts)
+
+    def _copy(self):
+        index = TrigramIndex()
+        index._texts = dict(self._texts)
+        index._trigrams = dict(self._trigrams)
+        index._postings = dict(self._postings)
+        return index
+
+    def without_item(self, key):
+        if key not in self._texts:
+            return self
+        index = self._copy()
+        del index._texts[key]
+        for gram in index._trigrams.pop(key):
+            postings = index._postings[gram] - {key}
+            if postings:
+                index._postings[gram] = postings
+            else:
+                del index._postings[gram]
+        return index
+
+    def with_item(self, key, text):
+        index = self.without_item(key)
+        if index is self:
+            index = self._copy()
+        grams = trigrams(text)
+        index._texts[key] = text
+        index._trigrams[key] = grams
+        for gram in grams:
+            index._postings[gram] = index._postings.get(gram, frozenset()) | {key}
+        return index
+
+    def text(self, key):
+        return self._texts[key]
+
+    def search(self, text, limit=10, min_similarity=0.2, max_postings=None):
+        """Ключи, похожие на ``text``: список пар (key, similarity) по убыванию сходства.
+
+        Сходство — коэффициент Жаккара по триграммам. Триграммы с posting list'ом
+        длиннее ``max_postings`` пропускаются: они почти ничего не различают,
+        а обход стоил бы дорого.
+        """
+        grams = trigrams(text)
+        if not grams:
+            return []
+        shared = Counter()
+        for gram in grams:
+            postings = self._postings.get(gram)
+            if postings and (max_postings is None or len(postings) <= max_postings):
+                shared.update(postings)
+        scored = []
+        for key, count in shared.items():
+            similarity = count / (len(grams) + len(self._trigrams[key]) - count)
+            if similarity >= min_similarity:
+                scored.append((key, similarity))
+        scored.sort(key=lambda item: (-item[1], self._texts[item[0]]))
+        return scored[:limit]
@@ -0,0 +1,124 @@
+"""Исправление опечаток в запросе: «Возможно, вы имели в виду…».
+
+Словарь поиска — слова из названий рецептов, названия ингредиентов и
+имена авторов — лежит в памяти процесса вместе с триграммным индексом
+(см. search.similarity). Для неизвестного слова кандидаты берутся из
+posting list'ов его триграмм, лучшие проверяются расстоянием Левенштейна:
+число обращений ограничено длиной слова, словарь целиком не перебирается.
+
+Словарь пополняется при сохранении рецептов, ингредиентов и пользователей.
+Слова удалённых записей остаются в нём до перестроения — подсказка с таким
+словом безвредна: поиск по ней просто ничего не найдёт.
+"""
+from collections import Counter
+
+from django.contrib.auth import get_user_model
+
+from recipes.models import Ingredient, Recipe
+from .analysis import STOP_WORDS, WORD_RE, normalize, stem
+from .local_index import LocalIndex
+from .similarity import TrigramIndex, levenshtein
+
+# Слова короче не исправляем: у них слишком много «похожих»
+MIN_WORD_LENGTH = 3
+
+# Сколько кандидатов из триграммного индекса проверять Левенштейном
+CANDIDATES = 20
+
+# Триграммы, встречающиеся в большем числе слов, не обходим (см. TrigramIndex.search)
+MAX_POSTINGS = 5000
+
+
+def vocabulary_words(text):
+    """Слова текста для словаря подсказок (нормализованные, без стоп-слов и чисел)."""
+    return [
+        word for word in WORD_RE.findall(normalize(text))
+        if len(word) >= MIN_WORD_LENGTH and word not in STOP_WORDS and not word.isdigit()
+    ]
+
+
+def _max_distance(word):
+    return 1 if len(word) <= 4 else 2
+
+
+class VocabularyIndex(LocalIndex):
+    generation_name = "vocabulary"
+
+    def __init__(self):
+        super().__init__()
+        # (frequencies, stems, trigrams) — заменяется целиком, как в IngredientIndex
+        self._state = (Counter(), frozenset(), TrigramIndex())
+
+    def load(self):
+        frequencies = Counter()
+        texts = [
+            Recipe.objects.values_list("title", flat=True),
+            Ingredient.objects.values_list("name", flat=True),
+            get_user_model().objects.filter(recipes__isnull=False).distinct().values_list("username", flat=True),
+        ]
+        for values in texts:
+            for text in values.iterator(chunk_size=2000):
+                frequencies.update(vocabulary_words(text))
+        self._state = (
+            frequencies,
+            frozenset(stem(word) for word in frequencies),
+            TrigramIndex((word, word) for word in frequencies),
+        )
+
+    def _add(self, words):
+        frequencies, stems, trigram_index = self._state
+        frequencies = frequencies.copy()
+        new_words = [word for word in words if word not in frequencies]
+        frequencies.update(words)
+        for word in dict.fromkeys(new_words):
+            trigram_index = trigram_index.with_item(word, word)
+        self._state = (frequencies, stems | {stem(word) for word in new_words}, trigram_index)
+
+    def add_text(self, text):
+        """Добавить в словарь слова нового или изменённого текста."""
+        words = vocabulary_words(text)
+        if words:
+            self.changed(lambda: self._add(words))
+
+    def is_known(self, word):
+        """Есть ли в словаре слово с той же основой (словоформы не считаются опечаткой)."""
+        self.ensure_loaded()
+        return stem(word) in self._state[1]
+
+    def corrections(self, word, limit=3):
+        """Похожие слова словаря: не более ``limit`` пар (word, distance), лучшие первыми.
+
+        При равном расстоянии выше слово, которое чаще встречается.
+        """
+        self.ensure_loaded()
+        frequencies, _, trigram_index = self._state
+        max_distance = _max_distance(word)
+        matches = []
+        for candidate, similarity in trigram_index.search(
+            word, limit=CANDIDATES, min_similarity=0.1, max_postings=MAX_POSTINGS,
+        ):
+            distance = levenshtein(word, candidate, max_distance)
+            if distance <= max_distance:
+                matches.append((distance, -frequencies[candidate], -similarity, candidate))
+        matches.sort()
+        return [(candidate, distance) for distance, _, _, candidate in matches[:limit]]
+
+    def did_you_mean(self, query):
+        """Запрос с исправленными опечатками или None, если исправлять нечего."""
+        words = WORD_RE.findall(normalize(query))
+        corrected = []
+        changed = False
+        for word in words:
+            if len(word) < MIN_WORD_LENGTH or word in STOP_WORDS or word.isdigit() or self.is_known(word):
+                corrected.append(word)
+                continue
+            best = self.corrections(word, limit=1)
+            if best:
+                corrected.append(best[0][0])
+                changed = True
+            else:
+                corrected.append(word)
+        return " ".join(corrected) if changed else None
+
+
+vocabulary_index = VocabularyIndex()
@@ -1,3 +1,689 @@
-from django.test import TestCase
+import os
+import tempfile
+import time
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.management import CommandError, call_command
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from recipes.cache import bump_generation, get_generation
+from recipes.models import Category, Ingredient, Rating, Recipe, RecipeImage, RecipeIngredient
+from recipes.ratings import find_drift
+from users.models import User
+from .benchmark import (
+    API, PAGE, STREAM, compare_reports, generate_corpus, parse_size, percentile, query_shapes,
+    run_benchmark,
+)
+from . import backends, fts, indexing, result_cache, signals
+from .analysis import analyze, normalize, stem
+from .ingredients import IngredientIndex, ingredient_index
+from .facets import compute_facets
+from .filters import parse_params
+from .indexing import API_SEARCH_FIELDS, RELEVANCE, filter_recipes, index_recipe
+from .models import RecipeSignature, SearchIndex
+from .pantry import pantry_index
+from .similar import signature, similar_index, similarity
+from .suggestions import vocabulary_index
+
+# База откатывается между тестами, а индексы в памяти общие на процесс —
+# они должны сверять поколение на каждом обращении
+_index_settings = override_settings(SEARCH_INDEX_CHECK_INTERVAL=0)
+
+
+def setUpModule():
+    _index_settings.enable()
+
+
+def tearDownModule():
+    _index_settings.disable()
+
+
+CORPUS_SIZE = 300
+
+# Страница поиска рендерит шаблон — для замеров хватает минимального, перебирающего рецепты
+RESULTS_TEMPLATE = (
+    "{% for recipe in recipes %}{{ recipe.title }} {{ recipe.author }} {{ recipe.category }}"
+    "{{ recipe.cover_url|default:'' }}{% endfor %}"
+)
+BENCHMARK_TEMPLATES = [{
+    "BACKEND": "django.template.backends.django.DjangoTemplates",
+    "OPTIONS": {
+        "loaders": [("django.template.loaders.locmem.Loader", {"search/results.html": RESULTS_TEMPLATE})],
+    },
+}]
+
+# Потолок SQL-запросов на повторный запрос — от размера корпуса зависеть не должен
+QUERY_BUDGET = {PAGE: 9, API: 4, STREAM: 3}
+
+
+def _create_recipe(author, title, ingredients=(), description=""):
+    """Рецепт с ингредиентами по названиям; индексы обновляются как после сохранения формы."""
+    with TestCase.captureOnCommitCallbacks(execute=True):
+        recipe = Recipe.objects.create(
+            author=author, title=title, description=description, instruction="Готовить", cook_time=30,
+        )
+        for name in ingredients:
+            ingredient, _ = Ingredient.objects.get_or_create(name=name)
+            RecipeIngredient.objects.create(recipe=recipe, ingredient=ingredient, amount=1, unit="г")
+    return recipe
+
+
+def _found(query, fields=None):
+    recipes = filter_recipes(Recipe.objects.all(), query, *([fields] if fields else []))
+    return sorted(recipes.values_list("pk", flat=True))
+
+
+def _corpus_rows():
+    return list(Recipe.objects.order_by("pk").values_list(
+        "title", "description", "cook_time", "difficulty", "category__slug", "rating_sum", "rating_count",
+        "cover_image", "image_count",
+    ))
+
+
+class CorpusTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.counts = generate_corpus(CORPUS_SIZE, seed=7)
+
+    def test_counts(self):
+        self.assertEqual(self.counts["recipes"], CORPUS_SIZE)
+        self.assertEqual(Recipe.objects.count(), CORPUS_SIZE)
+        self.assertEqual(RecipeIngredient.objects.count(), self.counts["recipe_ingredients"])
+        self.assertEqual(Rating.objects.count(), self.counts["ratings"])
+        self.assertEqual(RecipeImage.objects.count(), self.counts["images"])
+        self.assertGreaterEqual(self.counts["recipe_ingredients"], 3 * CORPUS_SIZE)
+        self.assertTrue(SearchIndex.objects.exists())
+
+    def test_rating_aggregates_match_ratings(self):
+        checked, drifted = find_drift()
+        self.assertEqual(checked, CORPUS_SIZE)
+        self.assertEqual(drifted, [])
+
+    def test_same_seed_gives_same_corpus(self):
+        rows = _corpus_rows()
+        Recipe.objects.all().delete()
+        for model in (Ingredient, Category, User):
+            model.objects.all().delete()
+        generate_corpus(CORPUS_SIZE, seed=7)
+        self.assertEqual(_corpus_rows(), rows)
+
+    def test_parse_size(self):
+        self.assertEqual(parse_size("10k"), 10_000)
+        self.assertEqual(parse_size("1M"), 1_000_000)
+        self.assertEqual(parse_size("2500"), 2500)
+        with self.assertRaises(ValueError):
+            parse_size("0")
+
+
+@override_settings(TEMPLATES=BENCHMARK_TEMPLATES)
+class BenchmarkTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        generate_corpus(CORPUS_SIZE, seed=7)
+
+    def test_report(self):
+        report = run_benchmark(repeat=3)
+        names = [name for name, _, _ in query_shapes(CORPUS_SIZE)]
+        self.assertEqual(list(report["results"]), names)
+        self.assertEqual(report["meta"]["recipes"], CORPUS_SIZE)
+        for name, result in report["results"].items():
+            with self.subTest(name):
+                self.assertLessEqual(result["p50_ms"], result["p95_ms"])
+                self.assertGreater(result["queries_cold"], 0)
+                self.assertLessEqual(result["queries"], QUERY_BUDGET[result["view"]])
+
+    def test_compare_reports(self):
+        shapes = [shape for shape in query_shapes(CORPUS_SIZE) if shape[0] == "page:single_word"]
+        report = run_benchmark(repeat=1, shapes=shapes)
+        previous = {"results": {"page:single_word": dict(report["results"]["page:single_word"], p50_ms=0.5)}}
+        (row,) = compare_reports(previous, report)
+        self.assertEqual(row[0], "page:single_word")
+        self.assertEqual(row[1], 0.5)
+
+
+class BenchmarkCommandTests(TestCase):
+    def test_db_file_is_not_overwritten(self):
+        with tempfile.NamedTemporaryFile(suffix=".sqlite3") as file:
+            file.write(b"data")
+            file.flush()
+            with self.assertRaisesMessage(CommandError, "--force"):
+                call_command("benchmark_search", "--size", "10", "--db-file", file.name)
+            with open(file.name, "rb") as copy:
+                self.assertEqual(copy.read(), b"data")
+
+    def test_db_file_is_not_the_working_database(self):
+        with tempfile.NamedTemporaryFile(suffix=".sqlite3") as file:
+            with mock.patch.dict(connection.settings_dict, {"NAME": file.name}):
+                relative = os.path.relpath(file.name)
+                with self.assertRaisesMessage(CommandError, "рабочая база"):
+                    call_command("benchmark_search", "--size", "10", "--db-file", relative, "--force")
+            self.assertTrue(os.path.exists(file.name))
+
+
+class PercentileTests(TestCase):
+    def test_nearest_rank(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 0.5), 50)
+        self.assertEqual(percentile(values, 0.95), 95)
+        self.assertEqual(percentile([3.0], 0.95), 3.0)
+
+
+class IndexMaintenanceTests(TestCase):
+    """Индексы обновляются один раз на рецепт после фиксации, а не на каждую строку ингредиентов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user("author", password="pass")
+        cls.pie = Recipe.objects.create(author=author, title="Пирог", instruction="Печь", cook_time=40)
+        cls.cake = Recipe.objects.create(author=author, title="Торт", instruction="Печь", cook_time=90)
+        cls.ingredients = [Ingredient.objects.create(name=f"Ингредиент {number}") for number in range(10)]
+
+    def setUp(self):
+        # Транзакции других тестов откатывались — их отложенные рецепты здесь не нужны
+        signals._pending_ids().clear()
+
+    def add(self, recipe, ingredients):
+        for ingredient in ingredients:
+            RecipeIngredient.objects.create(recipe=recipe, ingredient=ingredient, amount=1, unit="г")
+
+    def test_one_refresh_per_transaction(self):
+        # Строки поколений уже есть — дальше считаем только смены
+        pantry_before = bump_generation(pantry_index.generation_name)
+        similar_before = bump_generation(similar_index.generation_name)
+        with mock.patch.object(signals, "index_recipe", wraps=signals.index_recipe) as index_recipe:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.add(self.pie, self.ingredients)
+                self.add(self.cake, self.ingredients[:8])
+                RecipeIngredient.objects.filter(recipe=self.cake).first().delete()
+        self.assertEqual(sorted(call.args for call in index_recipe.call_args_list), [(self.pie.pk,), (self.cake.pk,)])
+        self.assertEqual(get_generation(pantry_index.generation_name), pantry_before + 1)
+        self.assertEqual(get_generation(similar_index.generation_name), similar_before + 1)
+
+        self.assertEqual(SearchIndex.objects.filter(recipe=self.pie, field=SearchIndex.FIELD_INGREDIENT).count(), 11)
+        self.assertEqual(RecipeSignature.objects.count(), 2)
+        pantry = [ingredient.pk for ingredient in self.ingredients]
+        self.assertEqual([recipe_id for recipe_id, _, _ in pantry_index.search(pantry)], [self.pie.pk, self.cake.pk])
+        self.assertEqual([recipe_id for recipe_id, _ in similar_index.similar(self.pie.pk)], [self.cake.pk])
+
+    def test_rolled_back_changes_are_picked_up_later(self):
+        with self.assertRaises(ValueError), transaction.atomic():
+            self.add(self.pie, self.ingredients[:1])
+            raise ValueError
+        with mock.patch.object(signals, "index_recipe") as index_recipe:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.add(self.cake, self.ingredients[:1])
+        # пирог переиндексирован ещё раз — по данным базы, без откатившейся строки
+        self.assertEqual(sorted(call.args for call in index_recipe.call_args_list), [(self.pie.pk,), (self.cake.pk,)])
+        self.assertEqual([recipe_id for recipe_id, _, _ in pantry_index.search([self.ingredients[0].pk])], [self.cake.pk])
+
+
+class SearchIndexTests(TestCase):
+    """Инвертированный индекс: термы по полям и поиск всех слов запроса по posting list'ам."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user("marina", password="pass")
+        cls.borscht = _create_recipe(cls.author, "Борщ украинский", ["Свёкла", "Капуста"], "Наваристый суп")
+        cls.pie = _create_recipe(cls.author, "Пирог с капустой", ["Капуста", "Мука"])
+
+    def test_postings(self):
+        postings = set(SearchIndex.objects.filter(recipe=self.borscht).values_list("token", "field", "frequency"))
+        self.assertLessEqual({
+            ("борщ", SearchIndex.FIELD_TITLE, 1),
+            ("свекл", SearchIndex.FIELD_INGREDIENT, 1),
+            ("капуст", SearchIndex.FIELD_INGREDIENT, 1),
+            ("наварист", SearchIndex.FIELD_DESCRIPTION, 1),
+            ("marina", SearchIndex.FIELD_AUTHOR, 1),
+        }, postings)
+
+    def test_all_words_required(self):
+        self.assertEqual(_found("капуста"), [self.borscht.pk, self.pie.pk])
+        self.assertEqual(_found("борщ с капустой"), [self.borscht.pk])
+        self.assertEqual(_found("пирог борщ"), [])
+        self.assertEqual(_found("и с на"), [])  # одни стоп-слова
+        # Описание ищет только API
+        self.assertEqual(_found("наваристый"), [])
+        self.assertEqual(_found("наваристый", API_SEARCH_FIELDS), [self.borscht.pk])
+
+    def test_signals_keep_index_current(self):
+        self.borscht.title = "Борщ зелёный"
+        self.borscht.save()
+        self.assertEqual(_found("зелёный"), [self.borscht.pk])
+        self.assertEqual(_found("украинский"), [])
+
+        cabbage = Ingredient.objects.get(name="Капуста")
+        cabbage.name = "Кольраби"
+        cabbage.save()
+        self.assertEqual(_found("кольраби"), [self.borscht.pk, self.pie.pk])
+
+        self.author.username = "chef"
+        self.author.save()
+        self.assertEqual(_found("chef"), [self.borscht.pk, self.pie.pk])
+
+        self.pie.delete()
+        self.assertFalse(SearchIndex.objects.filter(recipe_id=self.pie.pk).exists())
+
+    def test_rebuild_command(self):
+        SearchIndex.objects.all().delete()
+        out = StringIO()
+        call_command("rebuild_search_index", stdout=out)
+        self.assertIn("Проиндексировано рецептов: 2", out.getvalue())
+        self.assertEqual(_found("капуста"), [self.borscht.pk, self.pie.pk])
+        index_recipe(self.pie.pk)  # повторная индексация не дублирует записи
+        self.assertEqual(_found("пирог"), [self.pie.pk])
+
+    @override_settings(TEMPLATES=BENCHMARK_TEMPLATES)
+    def test_search_page(self):
+        response = self.client.get(reverse("search"), {"q": "капустой"})
+        self.assertEqual(sorted(recipe.pk for recipe in response.context["recipes"]), [self.borscht.pk, self.pie.pk])
+
+
+@override_settings(SEARCH_BACKEND="fts5")
+class FtsBackendTests(TestCase):
+    """FTS5: таблица поддерживается триггерами, ранжирование — bm25 с весами колонок."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user("author", password="pass")
+        cls.potato = _create_recipe(author, "Картошка по-деревенски", ["Картофель", "Укроп"])
+        cls.cabbage = _create_recipe(author, "Тушёная капуста", ["Капуста"], "Гарнир к картошке")
+
+    def setUp(self):
+        if not fts.is_available():
+            self.skipTest("SQLite собран без FTS5")
+
+    def found(self, query):
+        recipes, ranked = backends.filter_recipes(Recipe.objects.all(), query)
+        self.assertTrue(ranked)
+        recipes = backends.rank_recipes(recipes, query, ranked)
+        return list(recipes.order_by(f"-{fts.RELEVANCE}", "pk").values_list("pk", flat=True))
+
+    def test_match(self):
+        # Основа ищется по префиксу: «картошкой» находит «картошка» и «картошке»
+        self.assertEqual(self.found("картошкой"), [self.potato.pk, self.cabbage.pk])
+        self.assertEqual(self.found("укроп"), [self.potato.pk])
+        for query in ("тушеная", "ТУШЁНАЯ"):
+            with self.subTest(query=query):
+                self.assertEqual(self.found(query), [self.cabbage.pk])
+        self.assertEqual(self.found("картошка капуста"), [self.cabbage.pk])
+        self.assertEqual(self.found('" OR *'), [])  # спецсимволы MATCH не пропускаются
+
+    def test_triggers(self):
+        self.potato.title = "Печёный картофель"
+        self.potato.save()
+        self.assertEqual(self.found("печеный"), [self.potato.pk])
+
+        dill = Ingredient.objects.get(name="Укроп")
+        dill.name = "Петрушка"
+        dill.save()
+        self.assertEqual(self.found("петрушка"), [self.potato.pk])
+        self.assertEqual(self.found("укроп"), [])
+
+        RecipeIngredient.objects.create(recipe=self.cabbage, ingredient=dill, amount=1, unit="г")
+        self.assertEqual(self.found("петрушка"), [self.potato.pk, self.cabbage.pk])
+        RecipeIngredient.objects.filter(recipe=self.potato, ingredient=dill).delete()
+        self.assertEqual(self.found("петрушка"), [self.cabbage.pk])
+
+        self.cabbage.delete()
+        self.assertEqual(self.found("петрушка"), [])
+
+    def test_rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {fts.FTS_TABLE}")
+        self.assertEqual(self.found("капуста"), [])
+        self.assertTrue(fts.rebuild())
+        self.assertEqual(self.found("капуста"), [self.cabbage.pk])
+
+
+class AnalysisTests(SimpleTestCase):
+    """Нормализация, стоп-слова и стеммер Snowball."""
+
+    def test_stem(self):
+        cases = {
+            "картошка": "картошк", "картошки": "картошк", "картошкой": "картошк",
+            "пирожки": "пирожк", "моркови": "морков", "морковь": "морков",
+            "жареный": "жарен", "вкуснейший": "вкусн", "свежесть": "свежест",
+        }
+        for word, expected in cases.items():
+            with self.subTest(word=word):
+                self.assertEqual(stem(word), expected)
+
+    def test_analyze(self):
+        self.assertEqual(normalize("ЁЖИК"), "ежик")
+        self.assertEqual(analyze("Борщ с ЧЁРНЫМ хлебом и сметаной"), ["борщ", "черн", "хлеб", "сметан"])
+        self.assertEqual(analyze("и, а — но"), [])
+        self.assertEqual(analyze(None), [])
+
+
+class IngredientIndexTests(TestCase):
+    """Подсказки ингредиентов из индекса в памяти и его согласованность с базой."""
+
+    @classmethod
+    def setUpTestData(cls):
+        names = ["Сметана", "Сахар", "Сахарная пудра", "Ванильный сахар", "Тёртый сыр", "Соль"]
+        with cls.captureOnCommitCallbacks(execute=True):
+            cls.ids = {name: Ingredient.objects.create(name=name).pk for name in names}
+
+    def names(self, pairs):
+        return [name for _, name in pairs]
+
+    def test_suggest(self):
+        # Сначала совпадения с начала названия, затем по вхождению — по алфавиту
+        self.assertEqual(
+            self.names(ingredient_index.suggest("сах")), ["Сахар", "Сахарная пудра", "Ванильный сахар"]
+        )
+        self.assertEqual(self.names(ingredient_index.suggest("сах", limit=2)), ["Сахар", "Сахарная пудра"])
+        self.assertEqual(self.names(ingredient_index.suggest("ТЕРТ")), ["Тёртый сыр"])
+        self.assertEqual(self.names(ingredient_index.suggest("ыр")), ["Тёртый сыр"])
+        self.assertEqual(ingredient_index.suggest("  "), [])
+
+    def test_lookup_and_similar(self):
+        self.assertEqual(ingredient_index.lookup(" тертый СЫР "), self.ids["Тёртый сыр"])
+        self.assertIsNone(ingredient_index.lookup("тёртый"))
+        self.assertEqual(ingredient_index.similar("Сметанна")[0][:2], (self.ids["Сметана"], "Сметана"))
+        self.assertEqual(ingredient_index.similar("Кефир"), [])
+
+    def test_follows_changes(self):
+        salt = Ingredient.objects.get(pk=self.ids["Соль"])
+        salt.name = "Соль морская"
+        with self.captureOnCommitCallbacks(execute=True):
+            salt.save()
+        self.assertEqual(self.names(ingredient_index.suggest("морск")), ["Соль морская"])
+        with self.captureOnCommitCallbacks(execute=True):
+            salt.delete()
+        self.assertEqual(ingredient_index.suggest("морск"), [])
+        self.assertNotIn(salt.pk, ingredient_index.names([salt.pk]))
+
+    def test_reloads_on_generation_change(self):
+        # Другой процесс видит изменение по смене поколения и перестраивает индекс
+        other = IngredientIndex()
+        self.assertEqual(self.names(other.suggest("сол")), ["Соль"])
+        with self.captureOnCommitCallbacks(execute=True):
+            Ingredient.objects.create(name="Солод")
+        self.assertEqual(self.names(other.suggest("сол")), ["Солод", "Соль"])
+        self.assertEqual([name for _, name in other.all()][:2], ["Ванильный сахар", "Сахар"])
+
+    def test_rolled_back_change_is_not_applied(self):
+        generation = get_generation(ingredient_index.generation_name)
+        with self.assertRaises(ValueError), transaction.atomic():
+            Ingredient.objects.create(name="Солод")
+            raise ValueError
+        # Ни фантомной записи в памяти, ни смены поколения
+        self.assertEqual(self.names(ingredient_index.suggest("сол")), ["Соль"])
+        self.assertEqual(get_generation(ingredient_index.generation_name), generation)
+
+    @override_settings(SEARCH_INDEX_CHECK_INTERVAL=60)
+    def test_generation_checked_once_per_interval(self):
+        other = IngredientIndex()
+        other.suggest("сол")
+        with self.assertNumQueries(0):
+            self.assertEqual(self.names(other.suggest("сол")), ["Соль"])
+        with self.captureOnCommitCallbacks(execute=True):
+            Ingredient.objects.create(name="Солод")
+        self.assertEqual(self.names(other.suggest("сол")), ["Соль"])
+        with mock.patch("search.local_index.time.monotonic", return_value=time.monotonic() + 60):
+            self.assertEqual(self.names(other.suggest("сол")), ["Солод", "Соль"])
+
+
+class FacetTests(TestCase):
+    """Счётчики фасетов одним запросом и их кеш для пустого запроса."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user("author", password="pass")
+        cls.soups = Category.objects.create(name="Супы", slug="soups")
+        cls.desserts = Category.objects.create(name="Десерты", slug="desserts")
+        rows = [
+            ("Борщ", cls.soups, "medium", 90, 1),
+            ("Щи", cls.soups, "easy", 15, 0),
+            ("Торт", cls.desserts, "hard", 60, 2),
+            ("Омлет", None, "easy", 16, 0),
+        ]
+        for title, category, difficulty, cook_time, image_count in rows:
+            Recipe.objects.create(
+                author=author, title=title, description="", instruction="Готовить",
+                category=category, difficulty=difficulty, cook_time=cook_time, image_count=image_count,
+            )
+
+    def counts(self, facets):
+        return (
+            facets["total"],
+            [item["count"] for item in facets["categories"]],
+            [item["count"] for item in facets["difficulty"]],
+            [item["count"] for item in facets["cook_time"]],
+            facets["has_image"],
+        )
+
+    def test_counts(self):
+        categories = [self.soups, self.desserts]
+        with self.assertNumQueries(1):
+            facets = compute_facets(Recipe.objects.all(), categories)
+        self.assertEqual(self.counts(facets), (4, [2, 1], [2, 1, 1], [1, 1, 1, 1], 2))
+        self.assertEqual(facets["categories"][0], {"slug": "soups", "name": "Супы", "count": 2})
+
+        # JOIN'ы фильтра не удваивают рецепты
+        recipes = Recipe.objects.filter(category__in=categories, author__recipes__isnull=False)
+        self.assertEqual(self.counts(compute_facets(recipes, categories)), (3, [2, 1], [1, 1, 1], [1, 0, 1, 1], 2))
+
+    def test_empty_query_cache(self):
+        facets = compute_facets(Recipe.objects.none(), [self.soups], cached=True)
+        self.assertEqual(facets["total"], 4)
+        with self.assertNumQueries(1):  # только поколение
+            self.assertEqual(compute_facets(Recipe.objects.none(), [self.soups], cached=True), facets)
+
+        Recipe.objects.filter(title="Щи").delete()
+        self.assertEqual(compute_facets(Recipe.objects.none(), [self.soups], cached=True)["total"], 3)
+
+
+class ResultCacheTests(TestCase):
+    """Кеш упорядоченных id результатов: ключи, поколение, порядок страницы."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user("author", password="pass")
+        cls.recipes = [_create_recipe(author, title) for title in ("Борщ", "Щи", "Уха")]
+
+    def test_key_normalizes_query(self):
+        key = result_cache.cache_key("page", {"q": "Борщ", "sort": "rating"})
+        self.assertEqual(result_cache.cache_key("page", {"sort": "rating", "q": "БОРЩ"}), key)
+        self.assertNotEqual(result_cache.cache_key("api", {"q": "борщ", "sort": "rating"}), key)
+        self.assertNotEqual(result_cache.cache_key("page", {"q": "борщ", "sort": "-rating"}), key)
+
+    def test_cached_until_generation_changes(self):
+        compute = mock.Mock(return_value=iter([3, 1, 2]))
+        self.assertEqual(result_cache.cached_ids("page", {"q": "суп"}, compute), [3, 1, 2])
+        self.assertEqual(result_cache.cached_ids("page", {"q": "Суп"}, compute), [3, 1, 2])
+        compute.assert_called_once()
+
+        _create_recipe(self.recipes[0].author, "Солянка")
+        compute.return_value = iter([4])
+        self.assertEqual(result_cache.cached_ids("page", {"q": "суп"}, compute), [4])
+
+    def test_long_lists_not_cached(self):
+        compute = mock.Mock(side_effect=lambda: range(result_cache.MAX_CACHED_IDS + 1))
+        for _ in range(2):
+            result_cache.cached_ids("page", {"q": "всё"}, compute)
+        self.assertEqual(compute.call_count, 2)
+
+    def test_hydrate(self):
+        borscht, shchi, ukha = self.recipes
+        ids = [ukha.pk, borscht.pk, shchi.pk]
+        shchi.delete()
+        with self.assertNumQueries(1):
+            self.assertEqual(result_cache.hydrate(Recipe.objects.all(), ids), [ukha, borscht])
+
+
+@override_settings(TEMPLATES=BENCHMARK_TEMPLATES)
+class LargeResultTests(TestCase):
+    """Большая выборка: в кеше только начало списка id, дальние страницы — срезом запроса."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user("author", password="pass")
+        cls.total = result_cache.MAX_CACHED_IDS + 15
+        Recipe.objects.bulk_create(
+            Recipe(author=author, title=f"Рецепт {i}", instruction="Готовить", cook_time=30)
+            for i in range(cls.total)
+        )
+        cls.newest_first = list(Recipe.objects.order_by("-created_at", "-id").values_list("pk", flat=True))
+
+    def page(self, number):
+        response = self.client.get(reverse("search"), {"sort_by": "newest", "page": number})
+        return [recipe.pk for recipe in response.context["recipes"]]
+
+    def test_full_list_not_loaded(self):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.page(1), self.newest_first[:10])
+        sql = " ".join(query["sql"] for query in queries)
+        self.assertIn(f"LIMIT {result_cache.MAX_CACHED_IDS + 1}", sql)
+        self.assertIn("COUNT(", sql)
+
+        results = result_cache.ResultIds("page", parse_params({"sort_by": "newest"}), Recipe.objects.none())
+        self.assertEqual((len(results.prefix), results.count()), (result_cache.MAX_CACHED_IDS, self.total))
+
+    def test_pages_past_cached_prefix(self):
+        last = (self.total + 9) // 10
+        self.assertEqual(self.page(last), self.newest_first[(last - 1) * 10:])
+        self.assertEqual(self.page(last - 1), self.newest_first[(last - 2) * 10:(last - 1) * 10])
+
+
+class RelevanceTests(TestCase):
+    """BM25F по инвертированному индексу: вес поля, частота терма, подмешивание рейтинга."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user("author", password="pass")
+        cls.title = _create_recipe(author, "Грибы жареные", ["Лук"])
+        cls.ingredient = _create_recipe(author, "Паста", ["Грибы", "Сливки"])
+        cls.description = _create_recipe(author, "Омлет", ["Яйцо"], "Можно подать с грибами")
+        cls.other = _create_recipe(author, "Сырники", ["Творог"])
+
+    def setUp(self):
+        cache.clear()  # средние длины полей
+
+    def ranked(self, query, recipes=None):
+        # Поля API: описание тоже участвует
+        recipes, ranked = backends.filter_recipes(recipes or Recipe.objects.all(), query, API_SEARCH_FIELDS)
+        recipes = backends.rank_recipes(recipes, query, ranked, API_SEARCH_FIELDS)
+        return list(recipes.order_by(f"-{RELEVANCE}", "pk").values_list("pk", RELEVANCE))
+
+    def test_field_weights(self):
+        ranked = self.ranked("грибы")
+        self.assertEqual([pk for pk, _ in ranked], [self.title.pk, self.ingredient.pk, self.description.pk])
+        scores = [score for _, score in ranked]
+        self.assertTrue(all(score > 0 for score in scores))
+        self.assertGreater(scores[0], scores[1])
+
+    def test_rating_boost(self):
+        twin = _create_recipe(self.title.author, "Грибы жареные", ["Лук"])
+        Recipe.objects.filter(pk=twin.pk).update(rating=5)
+        recipes = Recipe.objects.filter(pk__in=[self.title.pk, twin.pk])
+        unboosted = self.ranked("грибы", recipes)
+        self.assertEqual(unboosted[0][1], unboosted[1][1])
+        with self.settings(SEARCH_RATING_BOOST=1.0):
+            boosted = self.ranked("грибы", recipes)
+        self.assertEqual([pk for pk, _ in boosted], [twin.pk, self.title.pk])
+        self.assertAlmostEqual(boosted[0][1], 2 * unboosted[0][1])
+
+    def test_no_terms(self):
+        recipes = indexing.rank_recipes(Recipe.objects.all(), "и в на")
+        self.assertEqual({score for score in recipes.values_list(RELEVANCE, flat=True)}, {0.0})
+
+
+class SuggestionTests(TestCase):
+    """«Возможно, вы имели в виду…»: исправление опечаток по словарю названий."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user("author", password="pass")
+        cls.borscht = _create_recipe(cls.author, "Борщ украинский", ["Говядина", "Свёкла"])
+        cls.dumplings = _create_recipe(cls.author, "Пельмени", ["Говядина", "Мука"])
+
+    def test_did_you_mean(self):
+        self.assertEqual(vocabulary_index.did_you_mean("пельмини"), "пельмени")
+        self.assertEqual(vocabulary_index.did_you_mean("Борщ с говядна"), "борщ с говядина")
+        self.assertIsNone(vocabulary_index.did_you_mean("борщи со свеклой"))  # словоформы — не опечатки
+        self.assertIsNone(vocabulary_index.did_you_mean("ратотуй"))
+
+    def test_vocabulary_follows_changes(self):
+        _create_recipe(self.author, "Рататуй")
+        self.assertEqual(vocabulary_index.did_you_mean("ратотуй"), "рататуй")
+
+    def test_unchanged_title_keeps_vocabulary(self):
+        generation = get_generation(vocabulary_index.generation_name)
+        recipe = Recipe.objects.get(pk=self.borscht.pk)
+        recipe.cook_time = 90
+        recipe.save()
+        Rating.objects.create(recipe=recipe, user=self.author, value=5)
+        author = User.objects.get(pk=self.author.pk)
+        author.first_name = "Марина"
+        author.save()
+        self.assertEqual(get_generation(vocabulary_index.generation_name), generation)
+
+        recipe.title = "Борщ зелёный"
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.save()
+        self.assertEqual(vocabulary_index.did_you_mean("зилёный"), "зеленый")
+
+    @override_settings(TEMPLATES=BENCHMARK_TEMPLATES)
+    def test_search_page(self):
+        response = self.client.get(reverse("search"), {"q": "пельмини"})
+        self.assertEqual(response.context["corrected_from"], "пельмини")
+        self.assertEqual(list(response.context["recipes"]), [self.dumplings])
+
+        # Исправленный запрос тоже пуст — результаты не подменяются, остаётся ссылка
+        response = self.client.get(reverse("search"), {"q": "борщ пельмини"})
+        self.assertIsNone(response.context["corrected_from"])
+        self.assertEqual(response.context["suggestion"], "борщ пельмени")
+
+
+class SimilarRecipeTests(TestCase):
+    """Похожие рецепты: MinHash-сигнатуры, LSH-кандидаты и их пересчёт."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user("author", password="pass")
+        soup = ["Говядина", "Свёкла", "Капуста", "Морковь", "Лук", "Картофель"]
+        cls.borscht = _create_recipe(cls.author, "Борщ", soup)
+        cls.twin = _create_recipe(cls.author, "Борщ по-домашнему", soup)
+        cls.close = _create_recipe(cls.author, "Щи", soup[:5] + ["Укроп"])
+        cls.cake = _create_recipe(cls.author, "Бисквит", ["Мука", "Сахар", "Яйцо"])
+
+    def test_signature(self):
+        self.assertEqual(signature([]), b"")
+        self.assertEqual(len(signature([1, 2, 3])), 256)
+        self.assertEqual(signature([3, 2, 1, 1]), signature([1, 2, 3]))
+        self.assertEqual(similarity(signature(range(10)), signature(range(10))), 1.0)
+        # Жаккар {0..9} и {5..14} — 1/3
+        self.assertAlmostEqual(similarity(signature(range(10)), signature(range(5, 15))), 1 / 3, delta=0.15)
+        self.assertLess(similarity(signature(range(10)), signature(range(100, 110))), 0.1)
+
+    def test_similar(self):
+        similar = similar_index.similar(self.borscht.pk)
+        self.assertEqual([pk for pk, _ in similar], [self.twin.pk, self.close.pk])
+        self.assertEqual(similar[0][1], 1.0)
+        self.assertAlmostEqual(similar[1][1], 5 / 7, delta=0.15)
+        self.assertEqual(similar_index.similar(self.cake.pk), [])
+
+    def test_follows_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            RecipeIngredient.objects.filter(recipe=self.twin).delete()
+        self.assertEqual([pk for pk, _ in similar_index.similar(self.borscht.pk)], [self.close.pk])
+        self.assertFalse(RecipeSignature.objects.filter(recipe=self.twin).exists())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.close.delete()
+        self.assertEqual(similar_index.similar(self.borscht.pk), [])
+
+    def test_rebuild_command(self):
+        RecipeSignature.objects.all().delete()
+        out = StringIO()
+        call_command("rebuild_similar_recipes", "--batch-size", "2", stdout=out)
+        self.assertIn("рецептов: 4", out.getvalue())
+        self.assertEqual(RecipeSignature.objects.count(), 4)
+        self.assertEqual(similar_index.similar(self.borscht.pk)[0], (self.twin.pk, 1.0))
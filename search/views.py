@@ -1,107 +1,87 @@
 from django.shortcuts import render, get_object_or_404
-from django.db.models import Q
 from django.core.paginator import Paginator
 from recipes.models import Recipe, Category
+from recipes.pagination import KeysetPaginator
+from . import result_cache
+from .facets import compute_facets
+from .filters import filter_recipes, is_empty, order_recipes, parse_params
+from .suggestions import vocabulary_index
+
+# Если результатов меньше, проверяем запрос на опечатки
+FEW_RESULTS = 3
+
+
+def _search(params, base):
+    """Отфильтрованные и отсортированные рецепты: (queryset, ordering для курсора)."""
+    recipes, ranked = filter_recipes(params, base)
+    return order_recipes(recipes, params, ranked)
+
+
+def _result_ids(params, recipes):
+    # Упорядоченные id — из кеша результатов; дальние страницы большой выборки — срезом запроса
+    return result_cache.ResultIds('page', params, recipes)
+
 
 def search_recipes(request):
-    query = request.GET.get('q', '').strip()
-    category_slug = request.GET.get('category', '')
-    difficulty = request.GET.get('difficulty', '')
-    min_cook_time = request.GET.get('min_cook_time', '').strip()
-    max_cook_time = request.GET.get('max_cook_time', '').strip()
-    has_image = request.GET.get('has_image', '')
-    sort_by = request.GET.get('sort_by', '')
-
-    # Базовый запрос рецептов
-    recipes = Recipe.objects.select_related('author', 'category').prefetch_related('ingredients', 'images')
+    params = parse_params(request.GET)
+
+    # Базовый запрос рецептов — поля карточки (см. RecipeQuerySet.for_cards)
+    base = Recipe.objects.for_cards()
     
     # Для гостей показываем все рецепты (поле is_public отсутствует)
     # Если нужно ограничить доступ, добавьте поле is_public в модель Recipe
 
-    # Поиск по тексту
-    if query:
-        words = query.split()
-        q_objects = Q()
-
-        # Ищем рецепты, которые содержат ВСЕ слова из запроса
-        for word in words:
-            # Используем регулярные выражения для поиска полных слов
-            # \b - граница слова, \w - буквенно-цифровые символы
-            word_pattern = r'\b' + word + r'\b'
-            q_objects &= (
-                    Q(title__iregex=word_pattern) |
-                    Q(ingredients__name__iregex=word_pattern) |
-                    Q(author__username__iregex=word_pattern)
-            )
-
-        recipes = recipes.filter(q_objects).distinct()
-
-    # Фильтр по категории
-    if category_slug:
-        recipes = recipes.filter(category__slug=category_slug)
-
-    # Фильтр по сложности
-    if difficulty:
-        recipes = recipes.filter(difficulty=difficulty)
-
-    # Фильтр по времени приготовления — ОТ
-    if min_cook_time:
-        try:
-            min_val = int(min_cook_time)
-            recipes = recipes.filter(cook_time__gte=min_val)
-        except ValueError:
-            pass  # Некорректный ввод — игнорируем
-
-    # Фильтр по времени приготовления — ДО
-    if max_cook_time:
-        try:
-            max_val = int(max_cook_time)
-            recipes = recipes.filter(cook_time__lte=max_val)
-        except ValueError:
-            pass  # Некорректный ввод — игнорируем
-
-    # Фильтр по наличию картинки
-    if has_image == 'on':
-        # Рецепты с дополнительными изображениями
-        recipes = recipes.filter(images__isnull=False).distinct()
-
+    # Фильтры: текст, категория, сложность, время, картинка (см. search.filters)
     # 🔥 СОРТИРОВКА — ключевой шаг!
-    sort_options = {
-        'newest': '-created_at',           # от новых к старым
-        'oldest': 'created_at',            # от старых к новым
-        'rating_high': '-rating',          # от высокого к низкому
-        'rating_low': 'rating',            # от низкого к высокому
-        'time_short': 'cook_time',         # от быстрых к долгим
-        'time_long': '-cook_time',         # от долгих к быстрым
-        'title_a_z': 'title',              # от А до Я
-        'title_z_a': '-title',             # от Я до А
-    }
-
-    # Применяем сортировку, если выбрана
-    if sort_by in sort_options:
-        recipes = recipes.order_by(sort_options[sort_by])
-    else:
-        # По умолчанию — сортировка по новизне
-        recipes = recipes.order_by('-created_at')
+    recipes, ordering = _search(params, base)
 
-    # ПАГИНАЦИЯ
-    paginator = Paginator(recipes, 10)  # 10 рецептов на страницу
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    suggestion = None
+    corrected_from = None
+
+    # ПАГИНАЦИЯ: с ?cursor= — по курсору (быстро на любой глубине), иначе по номеру
+    if 'cursor' in request.GET and ordering:
+        paginator = KeysetPaginator(recipes, 10, ordering)
+        page_obj = paginator.page(request.GET.get('cursor'))
+    else:
+        ids = _result_ids(params, recipes)
+
+        # Мало результатов — возможно, в запросе опечатка: «Возможно, вы имели в виду…»
+        if params['q'] and ids.count() < FEW_RESULTS:
+            suggestion = vocabulary_index.did_you_mean(params['q'])
+            if suggestion and not ids.count():
+                # Ничего не нашлось — сразу показываем результаты исправленного запроса
+                corrected = dict(params, q=suggestion)
+                corrected_recipes, _ = _search(corrected, base)
+                corrected_ids = _result_ids(corrected, corrected_recipes)
+                if corrected_ids.count():
+                    corrected_from, suggestion = params['q'], None
+                    params, recipes, ids = corrected, corrected_recipes, corrected_ids
+
+        paginator = Paginator(ids, 10)  # 10 рецептов на страницу
+        page_number = request.GET.get('page')
+        page_obj = paginator.get_page(page_number)
+        # Из базы загружаем только рецепты текущей страницы
+        page_obj.object_list = result_cache.hydrate(base, page_obj.object_list)
 
     # Получаем все категории для выпадающего списка
-    categories = Category.objects.all()
+    categories = list(Category.objects.all())
+
+    # Счётчики рядом с каждым значением фильтров — одним запросом
+    facets = compute_facets(recipes, categories, cached=is_empty(params))
 
     return render(request, 'search/results.html', {
         'recipes': page_obj,  # ← ВАЖНО: передаём page_obj, а не recipes
-        'query': query,
+        'query': params['q'],
+        'suggestion': suggestion,          # исправленный запрос для ссылки «Возможно, вы имели в виду…»
+        'corrected_from': corrected_from,  # исходный запрос, если показаны результаты исправленного
         'categories': categories,
-        'selected_category': category_slug,
-        'selected_difficulty': difficulty,
-        'min_cook_time': min_cook_time,
-        'max_cook_time': max_cook_time,
-        'sort_by': sort_by,
-        'has_image': has_image,
+        'facets': facets,
+        'selected_category': request.GET.get('category', ''),
+        'selected_difficulty': request.GET.get('difficulty', ''),
+        'min_cook_time': request.GET.get('min_cook_time', '').strip(),
+        'max_cook_time': request.GET.get('max_cook_time', '').strip(),
+        'sort_by': request.GET.get('sort_by', ''),
+        'has_image': request.GET.get('has_image', ''),
         'page_obj': page_obj,  # ← Передаём для пагинации
     })
 
@@ -1518,7 +1518,7 @@ function hideCreateNew() {
     document.getElementById('newIngredientName').value = '';
 }
 
-function createNewIngredient() {
+function createNewIngredient(force = false) {
     const name = document.getElementById('newIngredientName').value.trim();
     
     if (!name) {
@@ -1532,7 +1532,7 @@ function createNewIngredient() {
             'Content-Type': 'application/json',
             'X-CSRFToken': getCookie('csrftoken')
         },
-        body: JSON.stringify({ name: name })
+        body: JSON.stringify({ name: name, force: force === true })
     })
     .then(response => response.json())
     .then(data => {
@@ -1556,6 +1556,9 @@ function createNewIngredient() {
                     // Показываем похожие ингредиенты в результатах поиска
                     displayIngredientResults(data.similar.map(name => ({ id: 0, name: name })));
                     hideCreateNew();
+                } else if (data.can_force && confirm(`Создать «${name}» как новый ингредиент?`)) {
+                    // Похожее название — другой ингредиент («Сок» и «Соя»): создаём всё равно
+                    createNewIngredient(true);
                 }
             } else {
                 alert('Ошибка: ' + errorMessage);
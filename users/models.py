@@ -14,5 +14,13 @@ class User(AbstractUser):
         verbose_name = "Пользователь"
         verbose_name_plural = "Пользователи"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Запоминаем сохранённое имя: рецепты автора переиндексируются, только
+        # если оно сменилось (search.signals)
+        instance._saved_username = instance.__dict__.get("username")
+        return instance
+
     def __str__(self):
         return self.get_full_name() or self.username
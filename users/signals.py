@@ -0,0 +1,15 @@
+"""Копии аватара для карточек и шапки (см. recipes.derivatives)."""
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from recipes import derivatives
+from .models import User
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, update_fields=None, **kwargs):
+    # Вход сохраняет только last_login — аватар не менялся
+    if update_fields is not None and "avatar" not in update_fields:
+        return
+    if instance.avatar:
+        derivatives.schedule(instance.avatar.name, "avatar")